@@ -0,0 +1,225 @@
+import argparse
+import glob
+import os
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset, IterableDataset, get_worker_info
+
+from services.result_writer import ResultWriter, prediction_row, error_row
+from services.runtime_config import configure_torch_threads, onnx_session_options
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz')
+
+
+def expand_inputs(inputs):
+    """Split inputs into image file paths (dirs and globs expanded) and tar archives"""
+    paths, archives = [], []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(str(p) for p in path.rglob('*')
+                                if p.suffix.lower() in IMAGE_EXTENSIONS))
+        elif item.lower().endswith(TAR_SUFFIXES):
+            archives.append(item)
+        else:
+            paths.extend(sorted(p for p in glob.glob(item, recursive=True)
+                                if p.lower().endswith(IMAGE_EXTENSIONS)))
+    return paths, archives
+
+
+def decode(file, transform):
+    """(tensor, None) for a readable image, else (None, error)"""
+    try:
+        return transform(Image.open(file).convert('RGB')), None
+    except Exception as e:
+        return None, f"Could not decode image: {str(e)}"
+
+
+def collate_decoded(batch):
+    """Stack decodable images; keep ids of failures apart"""
+    ids = [image_id for image_id, tensor, _ in batch if tensor is not None]
+    tensors = [tensor for _, tensor, _ in batch if tensor is not None]
+    errors = [(image_id, error) for image_id, _, error in batch if error is not None]
+    return ids, torch.stack(tensors) if tensors else None, errors
+
+
+def limit_worker_threads(_):
+    """One intra-op thread per decode worker; the model gets the rest"""
+    torch.set_num_threads(1)
+
+
+class ImageFileDataset(Dataset):
+    """Image files decoded in DataLoader workers; yields (id, tensor, error)"""
+
+    def __init__(self, paths, transform):
+        self.paths = paths
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        return (self.paths[idx],) + decode(self.paths[idx], self.transform)
+
+
+class TarImageDataset(IterableDataset):
+    """Images streamed out of a tar archive without extracting it.
+
+    Every worker reads the archive sequentially and decodes only the members
+    whose index falls on it, so no member is decoded twice.
+    """
+
+    def __init__(self, archive, transform, skip):
+        self.archive = archive
+        self.transform = transform
+        self.skip = skip
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        with tarfile.open(self.archive, mode='r|*') as tar:
+            index = 0
+            for member in tar:
+                if not member.isfile() or not member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                image_id = f'{self.archive}:{member.name}'
+                mine = index % num_workers == worker_id
+                index += 1
+                if mine and image_id not in self.skip:
+                    yield (image_id,) + decode(tar.extractfile(member), self.transform)
+
+
+class PytorchBackend:
+    """The API's own model loading: TorchScript artifact or checkpoint, bf16 if configured"""
+
+    def __init__(self, service, crop):
+        service.models[crop] = service.load_model(crop)
+        service.crop_precision = service.resolve_precision()
+        self.service = service
+        self.crop = crop
+
+    def __call__(self, batch):
+        return self.service.forward(self.crop, batch, record=False)
+
+
+class OnnxBackend:
+    """onnxruntime over best_{crop}_model.onnx, or its dynamic int8 quantization"""
+
+    def __init__(self, service, crop, quantized=False):
+        import onnxruntime as ort
+
+        onnx_path, is_temporary = service.fetch_model_file(
+            service.model_file_stem(crop), '.onnx')
+        if quantized:
+            onnx_path = self.quantize(onnx_path, is_temporary)
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=onnx_session_options(),
+            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def quantize(self, onnx_path, is_temporary):
+        """int8 weights for the ONNX model, cached next to a local model file"""
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        if is_temporary:
+            with tempfile.NamedTemporaryFile(suffix='.int8.onnx', delete=False) as f:
+                quantized_path = f.name
+        else:
+            quantized_path = str(Path(onnx_path).with_suffix('.int8.onnx'))
+            if Path(quantized_path).exists():
+                return quantized_path
+        print(f"Quantizing {onnx_path} to int8")
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def __call__(self, batch):
+        return torch.from_numpy(self.session.run(None, {self.input_name: batch.numpy()})[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Classify a folder, glob or tar archive of images offline')
+    parser.add_argument('inputs', nargs='+',
+                        help='Image directories, glob patterns or .tar/.tar.gz archives')
+    parser.add_argument('--crop', required=True,
+                        choices=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--output', required=True,
+                        help='Results file (.parquet or .csv); resumed if it already exists')
+    parser.add_argument('--backend', default='pytorch',
+                        choices=['pytorch', 'onnx', 'quantized'])
+    parser.add_argument('--models-dir', default='../training/models',
+                        help='Local model directory (empty string: download from S3)')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--flush-rows', type=int, default=1024,
+                        help='Rows buffered between writes (the most lost on a crash)')
+    args = parser.parse_args()
+
+    if args.models_dir:
+        os.environ['MODEL_DIR'] = str(Path(args.models_dir).resolve())
+    if args.backend == 'pytorch':
+        configure_torch_threads()
+
+    from services.model_service import ModelService
+
+    service = ModelService()
+    transform = service.build_resized_transform(service.input_size)
+    class_names = service.class_mappings[args.crop]
+    if args.backend == 'pytorch':
+        backend = PytorchBackend(service, args.crop)
+    else:
+        backend = OnnxBackend(service, args.crop, quantized=args.backend == 'quantized')
+
+    writer = ResultWriter(args.output, args.top_k, flush_rows=args.flush_rows)
+    done = writer.completed_ids()
+    paths, archives = expand_inputs(args.inputs)
+    pending = [path for path in paths if path not in done]
+    print(f"{len(paths)} image files and {len(archives)} archives; "
+          f"{len(done)} images already in {args.output}")
+
+    datasets = [ImageFileDataset(pending, transform)] if pending else []
+    datasets += [TarImageDataset(archive, transform, done) for archive in archives]
+
+    images = errors = 0
+    forward_s = 0.0
+    started = time.perf_counter()
+    for dataset in datasets:
+        loader = DataLoader(
+            dataset, batch_size=args.batch_size, num_workers=args.workers,
+            collate_fn=collate_decoded, worker_init_fn=limit_worker_threads,
+            prefetch_factor=4 if args.workers else None)
+
+        for ids, batch, failures in loader:
+            rows = [error_row(image_id, args.crop, error) for image_id, error in failures]
+            if batch is not None:
+                t0 = time.perf_counter()
+                probabilities = F.softmax(backend(batch).float(), dim=1).tolist()
+                forward_s += time.perf_counter() - t0
+                rows.extend(prediction_row(image_id, args.crop, class_names, probs, args.top_k)
+                            for image_id, probs in zip(ids, probabilities))
+            writer.write(rows)
+
+            images += len(rows)
+            errors += len(failures)
+            elapsed = time.perf_counter() - started
+            print(f"\r{images} images, {errors} errors, {images / elapsed:.1f} images/s", end='')
+
+    output_path = writer.close()
+    elapsed = time.perf_counter() - started
+    print()
+    print(f"Classified {images} images ({errors} unreadable) with the {args.backend} backend "
+          f"in {elapsed:.1f}s: {images / max(elapsed, 1e-9):.1f} images/s, "
+          f"{forward_s / max(elapsed, 1e-9) * 100:.0f}% of wall time in the model")
+    print(f"Results: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,48 @@ from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
 from routes.classification import router as classification_router
+from routes.stream import router as stream_router
+from routes.similarity import router as similarity_router
+from routes.jobs import router as jobs_router
 from services.model_service import ModelService
 from services.llm_service import LLMService
+from services.upload_service import UploadService, UploadLimitMiddleware
+from services.stream_service import StreamService
+from services.job_service import JobService
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Crop Disease Classification API",
     description="AI-powered crop disease detection API for Cashew, Cassava, Maize, and Tomato",
     version="1.0.0"
 )
 
+upload_service = UploadService()
+stream_service = StreamService()
+
+# Cap upload bodies while they stream in, before multipart parsing finishes
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=upload_service.max_bytes,
+    paths=["/api/classify", "/api/embed", "/api/similar"],
+)
+# Bulk job submissions carry whole archives and get their own, larger cap
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=int(os.getenv('JOB_MAX_UPLOAD_BYTES', str(1024 ** 3))),
+    paths=["/api/jobs"],
+)
+
 # CORS middleware for web and mobile app access
 app.add_middleware(
     CORSMiddleware,
@@ -30,12 +56,28 @@ app.add_middleware(
 # Initialize services on startup
 model_service = ModelService()
 llm_service = LLMService()
+job_service = JobService(model_service, upload_service)
+
+
+# Background model loading task, started once the app is up
+model_loading_task = None
+
+
+async def load_models_in_background():
+    """Load models after the port is bound so liveness checks answer immediately"""
+    try:
+        await model_service.initialize_models()
+    except Exception as e:
+        logger.error(f"Background model initialization failed: {str(e)}")
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize models on startup"""
-    await model_service.initialize_models()
+    """Schedule model initialization without delaying server startup"""
+    global model_loading_task
+    model_loading_task = asyncio.create_task(load_models_in_background())
+    # Job workers wait for the models themselves, then resume unfinished jobs
+    await job_service.start()
 
 
 @app.get("/")
@@ -50,23 +92,59 @@ async def root():
         },
         "endpoints": {
             "classification": "/classify",
-            "health": "/health"
+            "classification_stream": "/api/classify/stream",
+            "jobs": "/api/jobs",
+            "health": "/health",
+            "ready": "/ready"
         }
     }
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check - answers as soon as the process is serving"""
     return {
         "status": "healthy",
         "models_loaded": model_service.models_loaded,
         "llm_available": llm_service.is_available()
     }
 
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check - 200 only once models are usable"""
+    content = {
+        "ready": model_service.models_loaded,
+        "loading": model_service.loading,
+        "error": model_service.load_error,
+        "threads": model_service.thread_settings,
+        "precision": model_service.crop_precision,
+        "serving_tiers": model_service.serving_tiers,
+        "startup_phases": {
+            phase: round(seconds, 3)
+            for phase, seconds in model_service.startup_phases.items()
+        }
+    }
+    return JSONResponse(status_code=200 if model_service.models_loaded else 503, content=content)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-crop warm-up, first-request and steady-state inference latency"""
+    return {
+        "ready_crops": sorted(model_service.ready_crops),
+        "inference_latency": model_service.metrics.snapshot(),
+        "cascade": model_service.cascade_metrics.snapshot() if model_service.cascade_enabled else None,
+        "early_exit": model_service.exit_metrics.snapshot() if model_service.early_exit_enabled else None,
+        "auto_mode": model_service.auto_mode_summary()
+    }
+
 # Include classification routes
 app.include_router(classification_router, prefix="/api",
                    tags=["classification"])
+app.include_router(stream_router, prefix="/api", tags=["classification"])
+app.include_router(similarity_router, prefix="/api", tags=["similarity"])
+app.include_router(jobs_router, prefix="/api", tags=["jobs"])
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent
+
+IMPORT_LINE = re.compile(
+    r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    """Turn `python -X importtime` output into a nested module tree.
+
+    Each node is {"module", "self_ms", "cumulative_ms", "children"}. Python
+    prints children before their parent. Top-level imports have one space
+    after the `|`, and each nesting level adds two more, so a stack of pending
+    children per depth rebuilds the tree.
+    """
+    pending = {}
+    roots = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        depth = (len(indent) - 1) // 2
+        node = {
+            "module": module,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "children": pending.pop(depth + 1, []),
+        }
+        if depth == 0:
+            roots.append(node)
+        else:
+            pending.setdefault(depth, []).append(node)
+    return roots
+
+
+def format_tree(nodes, min_ms, indent=0):
+    """Render nodes above min_ms, heaviest first"""
+    lines = []
+    for node in sorted(nodes, key=lambda n: n["cumulative_ms"], reverse=True):
+        if node["cumulative_ms"] < min_ms:
+            continue
+        lines.append(f"{'  ' * indent}{node['module']:<{50 - 2 * indent}} "
+                     f"{node['cumulative_ms']:9.1f} ms  (self {node['self_ms']:.1f} ms)")
+        lines.extend(format_tree(node["children"], min_ms, indent + 1))
+    return lines
+
+
+def profile_imports(target):
+    """Import `target` in a fresh interpreter and return its import tree"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=API_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return parse_importtime(completed.stderr)
+
+
+def profile_init_phases():
+    """Run model initialization in-process and return its phase timings"""
+    sys.path.insert(0, str(API_DIR))
+    from services.model_service import ModelService
+
+    service = ModelService()
+    started = time.perf_counter()
+    asyncio.run(service.initialize_models())
+    phases = dict(service.startup_phases)
+    phases["wall"] = time.perf_counter() - started
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report import-time tree and initialization phases of the API process')
+    parser.add_argument('--target', default='main',
+                        help='Module to import (default: the FastAPI app)')
+    parser.add_argument('--min-ms', type=float, default=5.0,
+                        help='Hide modules whose cumulative import time is below this')
+    parser.add_argument('--with-models', action='store_true',
+                        help='Also load all models and report init phases')
+    parser.add_argument('--json', help='Write the raw report to this JSON file')
+    args = parser.parse_args()
+
+    roots = profile_imports(args.target)
+    total_ms = sum(node["cumulative_ms"] for node in roots)
+
+    print(f"IMPORT TIME TREE for '{args.target}' (total {total_ms:.1f} ms)")
+    print("=" * 80)
+    print("\n".join(format_tree(roots, args.min_ms)))
+
+    report = {"target": args.target,
+              "import_total_ms": total_ms, "imports": roots}
+
+    if args.with_models:
+        phases = profile_init_phases()
+        report["init_phases_s"] = phases
+        print(f"\nINITIALIZATION PHASES")
+        print("=" * 80)
+        for phase, seconds in phases.items():
+            print(f"{phase:<30} {seconds:8.3f} s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
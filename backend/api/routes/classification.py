@@ -4,7 +4,7 @@ import logging
 from typing import Optional
 import asyncio
 
-from services.classification_service import ClassificationService
+from services.upload_service import UploadRejected
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +25,9 @@ def get_services():
         raise HTTPException(status_code=503, detail="Services not initialized")
 
     if classification_service is None:
+        # Imported here because it pulls in torch, which loads in the background
+        from services.classification_service import ClassificationService
+
         classification_service = ClassificationService(ms)
 
     # LLM service is optional
@@ -33,38 +36,71 @@ def get_services():
     return ms, classification_service, llm_service
 
 
+def get_upload_service():
+    """Upload validator shared with the request-size middleware"""
+    from main import upload_service
+
+    return upload_service
+
+
 @router.post("/classify")
 async def classify_image(
     image: UploadFile = File(...),
     crop_type: str = Form(...),
     notes: Optional[str] = Form(None),
     user_question: Optional[str] = Form(None),
-    enable_ai_advice: bool = Form(True)
+    enable_ai_advice: bool = Form(True),
+    tier: Optional[str] = Form(None),
+    input_format: str = Form("image"),
+    mode: str = Form("single")
 ):
     """
     Classify crop disease from uploaded image with optional AI-powered advice
 
     Parameters:
     - image: Image file (JPEG, PNG)
-    - crop_type: Type of crop (cashew, cassava, maize, tomato)
+    - crop_type: Type of crop (cashew, cassava, maize, tomato, or auto to detect it)
     - notes: Optional notes about the image/plant condition
     - user_question: Optional specific question about the disease/plant
     - enable_ai_advice: Whether to generate AI-powered advice (default: True)
+    - tier: Optional resolution tier (full=240, fast=192, fastest=160, or a pixel size);
+      lower tiers answer faster with slightly lower accuracy
+    - input_format: "image" (encoded file) or "rgb8" (raw uint8 RGB pixels already
+      resized to the tier's size, optionally after an 8-byte RGB8 header)
+    - mode: "single" (whole image resized once) or "tiled" (overlapping model-size tiles
+      over the photo, for large canopy shots; adds a per-tile disease map)
 
     Returns:
     - Classification results with disease prediction, confidence, and optional AI advice
     """
     try:
-        # Validate crop type
+        # Validate crop type ("auto" scores the image against every crop model)
         supported_crops = ["cashew", "cassava", "maize", "tomato"]
-        if crop_type.lower() not in supported_crops:
+        if crop_type.lower() not in supported_crops + ["auto"]:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unsupported crop type. Supported crops: {supported_crops}"
+                detail=f"Unsupported crop type. Supported crops: {supported_crops} or 'auto'"
+            )
+
+        if input_format not in ("image", "rgb8"):
+            raise HTTPException(
+                status_code=400,
+                detail="Unsupported input_format. Supported formats: ['image', 'rgb8']"
+            )
+
+        if mode not in ("single", "tiled"):
+            raise HTTPException(
+                status_code=400,
+                detail="Unsupported mode. Supported modes: ['single', 'tiled']"
+            )
+        if mode == "tiled" and (input_format != "image" or crop_type.lower() == "auto"):
+            raise HTTPException(
+                status_code=400,
+                detail="Tiled mode needs an encoded image and a specific crop_type"
             )
 
         # Validate image file
-        if not image.content_type.startswith('image/'):
+        if input_format == "image" and not image.content_type.startswith('image/'):
             raise HTTPException(
                 status_code=400,
                 detail="File must be an image (JPEG, PNG, etc.)"
@@ -80,20 +116,49 @@ async def classify_image(
                 detail="Models are still loading. Please try again in a moment."
             )
 
-        # Read image bytes
-        image_bytes = await image.read()
-
-        if len(image_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty image file")
+        # Resolve the resolution tier (default: full resolution)
+        try:
+            tier_size = model_service.resolve_tier(tier)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if crop_type.lower() == "auto" and tier_size != model_service.input_size:
+            raise HTTPException(
+                status_code=400,
+                detail="Resolution tiers are not supported with crop_type 'auto'")
+        if crop_type.lower() != "auto" and not model_service.has_tier(crop_type, tier_size):
+            raise HTTPException(
+                status_code=400,
+                detail=f"The {tier_size}px tier is not available for {crop_type.lower()}")
+
+        # Validate size and header from the spooled upload; pixels are
+        # decoded later straight from the spool
+        upload_service = get_upload_service()
+        try:
+            if input_format == "rgb8":
+                buffer = upload_service.ingest_rgb8(image, tier_size)
+                image_input = classification_service.rgb8_to_tensor(
+                    buffer, tier_size)
+            else:
+                image_input = upload_service.ingest(image).image
+        except UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
 
         # Run prediction
         logger.info(f"Classifying {crop_type} image...")
-        result = await classification_service.predict(image_bytes, crop_type.lower())
+        if crop_type.lower() == "auto":
+            result = await classification_service.predict_auto(image_input)
+        elif mode == "tiled":
+            result = await classification_service.predict_tiled(
+                image_input, crop_type.lower(), tier=tier_size if tier else None)
+        else:
+            result = await classification_service.predict(
+                image_input, crop_type.lower(), tier=tier_size if tier else None)
+        crop_type = result["crop_type"]
 
         # Add metadata
         result.update({
             "filename": image.filename,
-            "file_size": len(image_bytes),
+            "file_size": upload_service.spooled_size(image.file),
             "notes": notes,
             "user_question": user_question,
             "status": "success"
@@ -0,0 +1,125 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+import json
+import logging
+from typing import List, Optional
+
+from routes.classification import get_services
+from services.upload_service import UploadRejected
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+RESULT_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+
+
+def get_job_service():
+    """Bulk job queue and workers"""
+    from main import job_service
+
+    return job_service
+
+
+def get_job_or_404(job_id: str):
+    job = get_job_service().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+@router.post("/jobs")
+async def create_job(
+    crop_type: str = Form(...),
+    archive: Optional[UploadFile] = File(None),
+    images: Optional[List[UploadFile]] = File(None)
+):
+    """
+    Submit a bulk classification job
+
+    Parameters:
+    - crop_type: Type of crop (cashew, cassava, maize, tomato)
+    - archive: Optional zip archive of images (JPEG, PNG, WebP)
+    - images: Optional list of image files
+
+    Returns:
+    - The queued job; poll /jobs/{id} or subscribe to /jobs/{id}/events
+    """
+    model_service, _, _ = get_services()
+    crop_type = crop_type.lower()
+    if crop_type not in model_service.class_mappings:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported crop type. Supported crops: {list(model_service.class_mappings)}"
+        )
+    if archive is None and not images:
+        raise HTTPException(
+            status_code=400, detail="Provide a zip archive or at least one image")
+
+    job_service = get_job_service()
+    try:
+        # Extraction and copying are blocking file I/O
+        job = await run_in_threadpool(
+            job_service.create_job,
+            crop_type,
+            archive.file if archive is not None else None,
+            [(image.filename or "image", image.file) for image in images or []],
+        )
+        job_service.enqueue(job["id"])
+        return JSONResponse(status_code=202, content=job)
+
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Error creating job: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """All known jobs, newest first"""
+    return {"jobs": get_job_service().list_jobs()}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of one job"""
+    return get_job_or_404(job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent progress events until the job finishes"""
+    get_job_or_404(job_id)
+
+    async def events():
+        async for job in get_job_service().watch(job_id):
+            yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/jobs/{job_id}/results")
+async def job_results(job_id: str):
+    """Download a completed job's results (Parquet or CSV, one row per image)"""
+    job = get_job_or_404(job_id)
+    if job["status"] != "completed":
+        raise HTTPException(
+            status_code=409, detail=f"Job is {job['status']}; results are available once it completes")
+
+    path = get_job_service().results_path(job)
+    return FileResponse(path, media_type=RESULT_MEDIA_TYPES[job["result_format"]],
+                        filename=f"{job_id}{path.suffix}")
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    get_job_or_404(job_id)
+    return get_job_service().cancel(job_id)
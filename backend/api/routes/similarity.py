@@ -0,0 +1,109 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse
+import logging
+
+from routes.classification import get_services, get_upload_service
+from services.upload_service import UploadRejected
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_SIMILAR_CASES = 50
+
+
+def prepare_request(image: UploadFile, crop_type: str):
+    """Shared validation; returns (classification service, lazily opened image)"""
+    model_service, classification_service, _ = get_services()
+
+    if crop_type not in model_service.class_mappings:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported crop type. Supported crops: {list(model_service.class_mappings)}"
+        )
+    if not model_service.models_loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Models are still loading. Please try again in a moment."
+        )
+    # A serving artifact without embeddings is a deployment problem, not a bad request
+    if crop_type not in model_service.embedding_crops:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Embeddings are not available for {crop_type}; the served model "
+                   f"needs to be re-exported"
+        )
+
+    try:
+        return classification_service, get_upload_service().ingest(image).image
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.post("/embed")
+async def embed_image(
+    image: UploadFile = File(...),
+    crop_type: str = Form(...)
+):
+    """
+    Pooled EfficientNet features (the input of the classifier head) for an image
+
+    Parameters:
+    - image: Image file (JPEG, PNG, WebP)
+    - crop_type: Type of crop whose model computes the embedding
+    """
+    try:
+        classification_service, image_input = prepare_request(
+            image, crop_type.lower())
+        return JSONResponse(content=await classification_service.embed(image_input, crop_type.lower()))
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error during embedding: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/similar")
+async def similar_cases(
+    image: UploadFile = File(...),
+    crop_type: str = Form(...),
+    k: int = Form(5)
+):
+    """
+    Classify an image and return its most similar confirmed training cases
+
+    Parameters:
+    - image: Image file (JPEG, PNG, WebP)
+    - crop_type: Type of crop (cashew, cassava, maize, tomato)
+    - k: Number of similar cases to return (1-50)
+
+    Returns:
+    - The classification result plus similar_cases, and an ood score flagging
+      uploads unlike anything in the training set
+    """
+    if not 1 <= k <= MAX_SIMILAR_CASES:
+        raise HTTPException(
+            status_code=400, detail=f"k must be between 1 and {MAX_SIMILAR_CASES}")
+
+    try:
+        classification_service, image_input = prepare_request(
+            image, crop_type.lower())
+        result = await classification_service.find_similar(image_input, crop_type.lower(), k)
+        result["filename"] = image.filename
+        result["status"] = "success"
+        return JSONResponse(content=result)
+
+    except HTTPException:
+        raise
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error during similar-case search: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Internal server error: {str(e)}")
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, WebSocket, HTTPException
+import logging
+from typing import Optional
+
+from routes.classification import get_services, get_upload_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# WebSocket close code for "try again later"
+TRY_AGAIN_LATER = 1013
+
+
+def get_stream_service():
+    """Stream limits and the shared inference executor"""
+    from main import stream_service
+
+    return stream_service
+
+
+@router.websocket("/classify/stream")
+async def classify_stream(
+    websocket: WebSocket,
+    crop_type: str,
+    tier: Optional[str] = None,
+    input_format: str = "image"
+):
+    """
+    Classify a live stream of camera frames for one crop
+
+    Query parameters:
+    - crop_type: Type of crop (cashew, cassava, maize, tomato)
+    - tier: Optional resolution tier (full, fast, fastest, or a pixel size)
+    - input_format: "image" (encoded frames) or "rgb8" (raw pixels at the tier's size)
+
+    Send each frame as a binary message. Every processed frame is answered
+    with a "prediction" message holding the frame's own prediction and a
+    smoothed prediction over the stream; frames may instead be answered
+    with "throttled", "dropped" (stale) or "rejected".
+    """
+    crop_type = crop_type.lower()
+    stream_service = get_stream_service()
+
+    try:
+        model_service, classification_service, _ = get_services()
+    except HTTPException:
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Services not initialized")
+        return
+
+    if not model_service.models_loaded:
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Models are still loading")
+        return
+    if crop_type not in model_service.class_mappings:
+        await websocket.close(code=1008, reason=f"Unsupported crop type: {crop_type}")
+        return
+    if input_format not in ("image", "rgb8"):
+        await websocket.close(code=1008, reason=f"Unsupported input_format: {input_format}")
+        return
+    try:
+        tier_size = model_service.resolve_tier(tier)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)[:120])
+        return
+    if not model_service.has_tier(crop_type, tier_size):
+        await websocket.close(code=1008, reason=f"The {tier_size}px tier is not available for {crop_type}")
+        return
+    # Reserve the slot before the first await, so concurrent handshakes
+    # can't all pass the capacity check
+    if not stream_service.try_reserve():
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Too many active streams")
+        return
+
+    from services.stream_service import StreamSession
+
+    try:
+        await websocket.accept()
+        session = StreamSession(
+            stream_service, get_upload_service(), model_service, classification_service,
+            websocket, crop_type, tier=tier_size if tier else None, input_format=input_format)
+        await session.run()
+    except Exception as e:
+        logger.error(f"Error in {crop_type} frame stream: {str(e)}")
+    finally:
+        stream_service.release()
@@ -0,0 +1,262 @@
+import torch.nn as nn
+
+
+class EfficientNetClassifier(nn.Module):
+    """Wrapper class to match the training architecture exactly"""
+
+    def __init__(self, num_classes=5, model_name='efficientnet_b1'):
+        super(EfficientNetClassifier, self).__init__()
+        # timm is only needed when rebuilding from a raw checkpoint, so keep
+        # it out of the import path of the TorchScript serving route
+        import timm
+
+        # Load pretrained EfficientNet-B1
+        self.backbone = timm.create_model(model_name, pretrained=False)
+
+        # Replace classifier with the same architecture used in training
+        in_features = self.backbone.classifier.in_features
+        self.backbone.classifier = nn.Sequential(
+            nn.Dropout(0.3),
+            nn.Linear(in_features, 512),
+            nn.ReLU(),
+            nn.Dropout(0.2),
+            nn.Linear(512, num_classes)
+        )
+
+    def forward(self, x):
+        return self.backbone(x)
+
+    def embed(self, x):
+        """Pooled features that feed backbone.classifier"""
+        return self.backbone.forward_head(self.backbone.forward_features(x), pre_logits=True)
+
+    def forward_with_embedding(self, x):
+        """Logits and pooled features from a single pass"""
+        embedding = self.embed(x)
+        return self.backbone.classifier(embedding), embedding
+
+
+# Auto crop mode: the stem and leading blocks are frozen during training and
+# keep their pretrained BatchNorm statistics, so every crop model starts with
+# the same trunk. export_serving_models.py --shared-trunk writes that trunk
+# once plus a per-crop tail next to the full serving artifacts.
+SHARED_TRUNK_NAME = "auto"
+TRUNK_ARTIFACT_SUFFIX = ".trunk.torchscript.pt"
+TAIL_ARTIFACT_SUFFIX = ".tail.torchscript.pt"
+
+
+def shared_trunk_depth(backbones):
+    """Count leading stages (stem, then each block) bit-identical across backbones"""
+    import torch
+
+    def stage_tensors(backbone, stage):
+        modules = [backbone.conv_stem, backbone.bn1] if stage == 0 else [
+            backbone.blocks[stage - 1]]
+        return [t for module in modules for t in module.state_dict().values()]
+
+    depth = 0
+    for stage in range(len(backbones[0].blocks) + 1):
+        reference = stage_tensors(backbones[0], stage)
+        if not all(
+            all(torch.equal(a, b) for a, b in zip(reference, stage_tensors(other, stage)))
+            for other in backbones[1:]
+        ):
+            break
+        depth += 1
+    return depth
+
+
+class TrunkModule(nn.Module):
+    """The first `depth` stages of an EfficientNet backbone"""
+
+    def __init__(self, backbone, depth):
+        super(TrunkModule, self).__init__()
+        self.conv_stem = backbone.conv_stem
+        self.bn1 = backbone.bn1
+        self.blocks = nn.Sequential(*list(backbone.blocks[:depth - 1]))
+
+    def forward(self, x):
+        return self.blocks(self.bn1(self.conv_stem(x)))
+
+
+class TailModule(nn.Module):
+    """The remaining stages and head of a crop model, fed TrunkModule output"""
+
+    def __init__(self, backbone, depth):
+        super(TailModule, self).__init__()
+        self.blocks = nn.Sequential(*list(backbone.blocks[depth - 1:]))
+        self.conv_head = backbone.conv_head
+        self.bn2 = backbone.bn2
+        self.global_pool = backbone.global_pool
+        self.classifier = backbone.classifier
+
+    def forward(self, x):
+        # Same as timm's forward_head in eval mode
+        x = self.global_pool(self.bn2(self.conv_head(self.blocks(x))))
+        return self.classifier(x)
+
+
+# timm backbone of the distilled CPU-friendly student (training/distill.py)
+STUDENT_MODEL_NAME = 'mobilenetv3_large_100'
+
+
+def checkpoint_model_name(checkpoint, default):
+    """timm model name stored in a dict checkpoint, e.g. by distill.py --student"""
+    if isinstance(checkpoint, dict) and 'model_name' in checkpoint:
+        return checkpoint['model_name']
+    return default
+
+
+class StudentClassifier(nn.Module):
+    """Small student model distilled from the EfficientNet-B1 teacher"""
+
+    def __init__(self, num_classes=5, model_name=STUDENT_MODEL_NAME, pretrained=False):
+        super(StudentClassifier, self).__init__()
+        import timm
+
+        # timm builds the classifier head with the right input width
+        self.backbone = timm.create_model(
+            model_name, pretrained=pretrained, num_classes=num_classes, drop_rate=0.2)
+
+    def forward(self, x):
+        return self.backbone(x)
+
+    def embed(self, x):
+        """Pooled features that feed backbone.classifier"""
+        return self.backbone.forward_head(self.backbone.forward_features(x), pre_logits=True)
+
+    def forward_with_embedding(self, x):
+        """Logits and pooled features from a single pass"""
+        embedding = self.embed(x)
+        return self.backbone.classifier(embedding), embedding
+
+
+# EfficientNet blocks followed by an auxiliary early-exit head. blocks.5,
+# blocks.6 and the classifier are fine-tuned, so exits sit on the frozen trunk.
+EXIT_BLOCKS = (3, 4)
+
+# Suffix of the early-exit head weights stored next to best_{crop}_model.pth
+EXIT_HEADS_SUFFIX = ".exits.pth"
+
+
+class ExitHead(nn.Module):
+    """Lightweight classifier on an intermediate feature map"""
+
+    def __init__(self, in_channels, num_classes, hidden_size=256):
+        super(ExitHead, self).__init__()
+        self.conv = nn.Sequential(
+            nn.Conv2d(in_channels, hidden_size, kernel_size=1, bias=False),
+            nn.BatchNorm2d(hidden_size),
+            nn.SiLU()
+        )
+        self.pool = nn.AdaptiveAvgPool2d(1)
+        self.fc = nn.Linear(hidden_size, num_classes)
+
+    def forward(self, x):
+        return self.fc(self.pool(self.conv(x)).flatten(1))
+
+
+def block_out_channels(backbone):
+    """Output channel count of every EfficientNet block"""
+    import torch
+
+    channels = []
+    # Probe on the backbone's device, in eval mode so BatchNorm running
+    # stats are not updated from the zero image
+    was_training = backbone.training
+    backbone.eval()
+    try:
+        with torch.no_grad():
+            probe = torch.zeros(1, 3, 64, 64, device=next(backbone.parameters()).device)
+            x = backbone.bn1(backbone.conv_stem(probe))
+            for block in backbone.blocks:
+                x = block(x)
+                channels.append(x.shape[1])
+    finally:
+        backbone.train(was_training)
+    return channels
+
+
+class EarlyExitClassifier(nn.Module):
+    """EfficientNet classifier with auxiliary heads after intermediate blocks"""
+
+    def __init__(self, base, num_classes, exit_blocks=EXIT_BLOCKS):
+        super(EarlyExitClassifier, self).__init__()
+        self.base = base
+        self.exit_blocks = tuple(exit_blocks)
+        channels = block_out_channels(base.backbone)
+        self.heads = nn.ModuleDict({
+            str(idx): ExitHead(channels[idx], num_classes) for idx in self.exit_blocks
+        })
+
+    def forward(self, x):
+        return self.base(x)
+
+    def embed(self, x):
+        return self.base.embed(x)
+
+    def forward_with_embedding(self, x):
+        return self.base.forward_with_embedding(x)
+
+    def exit_features(self, x):
+        """Feature maps at every exit block, stopping after the deepest one"""
+        backbone = self.base.backbone
+        features = {}
+        x = backbone.bn1(backbone.conv_stem(x))
+        for idx, block in enumerate(backbone.blocks):
+            x = block(x)
+            if idx in self.exit_blocks:
+                features[idx] = x
+                if idx == max(self.exit_blocks):
+                    break
+        return features
+
+    def forward_all(self, x):
+        """Logits of every exit head plus the final classifier"""
+        backbone = self.base.backbone
+        outputs = {}
+        x = backbone.bn1(backbone.conv_stem(x))
+        for idx, block in enumerate(backbone.blocks):
+            x = block(x)
+            if idx in self.exit_blocks:
+                outputs[f"blocks.{idx}"] = self.heads[str(idx)](x)
+        outputs["final"] = backbone.forward_head(
+            backbone.bn2(backbone.conv_head(x)))
+        return outputs
+
+    def forward_early_exit(self, x, threshold):
+        """Stop each sample at the first head whose confidence reaches threshold.
+
+        Returns (logits, exit point per sample).
+        """
+        import torch
+
+        backbone = self.base.backbone
+        batch_size = x.shape[0]
+        active = torch.arange(batch_size)
+        exits = ["final"] * batch_size
+        logits = None
+
+        x = backbone.bn1(backbone.conv_stem(x))
+        for idx, block in enumerate(backbone.blocks):
+            x = block(x)
+            if idx not in self.exit_blocks:
+                continue
+            head_logits = self.heads[str(idx)](x)
+            if logits is None:
+                logits = head_logits.new_zeros(
+                    batch_size, head_logits.shape[1])
+            done = head_logits.softmax(dim=1).max(dim=1).values >= threshold
+            if done.any():
+                logits[active[done]] = head_logits[done].to(logits.dtype)
+                for sample in active[done].tolist():
+                    exits[sample] = f"blocks.{idx}"
+                active, x = active[~done], x[~done]
+                if active.numel() == 0:
+                    return logits, exits
+
+        final = backbone.forward_head(backbone.bn2(backbone.conv_head(x)))
+        if logits is None:
+            return final, exits
+        logits[active] = final.to(logits.dtype)
+        return logits, exits
@@ -2,107 +2,328 @@ import torch
 import torch.nn.functional as F
 from PIL import Image
 import io
+import time
+import asyncio
 import numpy as np
-from typing import Dict, Tuple, Optional
+from typing import Dict, Tuple, Optional, Union
 import logging
 
+from services.tiling import TiledInference
+
 logger = logging.getLogger(__name__)
 
 
 class ClassificationService:
     def __init__(self, model_service):
         self.model_service = model_service
-
-    async def preprocess_image(self, image_bytes: bytes, crop_type: str) -> torch.Tensor:
+        # ImageNet normalization, as in the training transforms
+        self.mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+        self.std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+        self.tiler = TiledInference(model_service)
+
+    def decode_image(self, image_data: Union[bytes, Image.Image]) -> Image.Image:
+        """Decode uploaded bytes, or an image opened lazily on the upload, into RGB"""
+        if isinstance(image_data, Image.Image):
+            image = image_data
+        else:
+            image = Image.open(io.BytesIO(image_data))
+
+        # Convert to RGB if necessary - ensures consistency with training
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        return image
+
+    def transform_image(self, image: Image.Image, crop_type: str) -> torch.Tensor:
+        """Apply the crop's training transform and add a batch dimension"""
+        # Get transform for this crop type
+        transform = self.model_service.get_transform(crop_type)
+        if transform is None:
+            raise ValueError(
+                f"No transform found for crop type: {crop_type}")
+
+        # Apply transforms - identical to training transforms
+        image_tensor = transform(image)
+
+        # Add batch dimension
+        return image_tensor.unsqueeze(0)
+
+    def tier_tensor(self, image: Image.Image, crop_type: str, tier: Optional[int] = None) -> torch.Tensor:
+        """Batch of one image, resized for a resolution tier (default: full resolution)"""
+        if tier is None or tier == self.model_service.input_size:
+            return self.transform_image(image, crop_type)
+        return self.model_service.tier_transforms[tier](image).unsqueeze(0)
+
+    def rgb8_to_tensor(self, buffer: bytearray, size: int) -> torch.Tensor:
+        """Normalize a raw HWC uint8 RGB buffer into a [1, 3, size, size] batch.
+
+        Equivalent to the training transform for an image already at `size`,
+        without decode, RGB conversion or resize.
+        """
+        pixels = torch.frombuffer(buffer, dtype=torch.uint8).view(size, size, 3)
+        image_tensor = pixels.permute(2, 0, 1).unsqueeze(0).float().div_(255)
+        return image_tensor.sub_(self.mean).div_(self.std)
+
+    async def preprocess_image(self, image_data: Union[bytes, Image.Image], crop_type: str) -> torch.Tensor:
         """Preprocess image for model inference"""
         try:
-            # Open image from bytes
-            image = Image.open(io.BytesIO(image_bytes))
+            return self.transform_image(self.decode_image(image_data), crop_type)
 
-            # Convert to RGB if necessary - ensures consistency with training
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+        except Exception as e:
+            logger.error(f"Error preprocessing image: {str(e)}")
+            raise
+
+    async def predict(self, image_data: Union[bytes, Image.Image, torch.Tensor], crop_type: str,
+                      tier: Optional[int] = None) -> Dict:
+        """Predict disease for given image and crop type
 
-            # Get transform for this crop type
-            transform = self.model_service.get_transform(crop_type)
-            if transform is None:
+        `tier` is a served input size from ModelService.resolve_tier; lower
+        tiers use the matching lower-resolution model. A tensor input is an
+        already-normalized batch at the tier's size (see rgb8_to_tensor).
+        """
+        try:
+            # Validate crop type
+            if not self.model_service.is_model_loaded(crop_type):
                 raise ValueError(
-                    f"No transform found for crop type: {crop_type}")
+                    f"Model not loaded for crop type: {crop_type}")
 
-            # Apply transforms - identical to training transforms
-            image_tensor = transform(image)
+            if isinstance(image_data, torch.Tensor):
+                # Client-side preprocessed input: no decode, resize or cascade
+                outputs = self.model_service.run_inference(
+                    crop_type, image_data, tier=tier)
+                result = self.build_result(
+                    F.softmax(outputs.float(), dim=1)[0], crop_type)
+                if tier is not None:
+                    result["tier"] = tier
+                return result
+
+            if tier is not None and tier != self.model_service.input_size:
+                image_tensor = self.tier_tensor(
+                    self.decode_image(image_data), crop_type, tier)
+                outputs = self.model_service.run_inference(
+                    crop_type, image_tensor, tier=tier)
+                result = self.build_result(
+                    F.softmax(outputs.float(), dim=1)[0], crop_type)
+                result["tier"] = tier
+                return result
+
+            if self.model_service.cascade_enabled:
+                # Low-resolution screening pass, escalating only when unsure
+                image = self.decode_image(image_data)
+                probabilities, escalated = self.model_service.run_cascade(
+                    crop_type, image)
+                result = self.build_result(probabilities[0], crop_type)
+                result["cascade_escalated"] = escalated
+                return result
 
-            # Add batch dimension
-            image_tensor = image_tensor.unsqueeze(0)
+            # Preprocess image
+            image_tensor = await self.preprocess_image(image_data, crop_type)
+
+            # Run inference
+            outputs = self.model_service.run_inference(crop_type, image_tensor)
+            probabilities = F.softmax(outputs, dim=1)
 
-            return image_tensor
+            return self.build_result(probabilities[0], crop_type)
 
         except Exception as e:
-            logger.error(f"Error preprocessing image: {str(e)}")
+            logger.error(f"Error during prediction: {str(e)}")
             raise
 
-    async def predict(self, image_bytes: bytes, crop_type: str) -> Dict:
-        """Predict disease for given image and crop type"""
+    async def predict_tiled(self, image_data: Union[bytes, Image.Image], crop_type: str,
+                            tier: Optional[int] = None) -> Dict:
+        """Classify a large photo from overlapping tiles, with a coarse per-tile disease map"""
         try:
-            # Validate crop type
             if not self.model_service.is_model_loaded(crop_type):
                 raise ValueError(
                     f"Model not loaded for crop type: {crop_type}")
 
-            # Preprocess image
-            image_tensor = await self.preprocess_image(image_bytes, crop_type)
+            # Keep the image undecoded so JPEGs can be decoded at reduced scale
+            if isinstance(image_data, Image.Image):
+                image = image_data
+            else:
+                image = Image.open(io.BytesIO(image_data))
 
-            # Get model and class names
-            model = self.model_service.get_model(crop_type)
-            class_names = self.model_service.get_class_names(crop_type)
+            # Decoding and the tile batches take up to the latency budget;
+            # keep them off the event loop so health checks and streams stay live
+            probabilities, tile_probs, layout = await asyncio.to_thread(
+                self.tiler.classify, image, crop_type, tier)
+            result = self.build_result(probabilities, crop_type)
 
-            # Run inference
-            with torch.no_grad():
-                outputs = model(image_tensor)
-                probabilities = F.softmax(outputs, dim=1)
-                confidence, predicted_idx = torch.max(probabilities, 1)
-
-                predicted_class = class_names[predicted_idx.item()]
-                confidence_score = confidence.item()
-
-                # Get top 3 predictions
-                top_probs, top_indices = torch.topk(
-                    probabilities[0], k=min(3, len(class_names)))
-                top_predictions = [
-                    {
-                        "disease": class_names[idx.item()],
-                        "confidence": prob.item()
-                    }
-                    for prob, idx in zip(top_probs, top_indices)
-                ]
-
-                # Determine if plant is healthy
-                is_healthy = predicted_class.lower(
-                ) in ['healthy', 'cassava healthy']
-
-                # Get disease description
-                description = self.get_disease_description(
-                    predicted_class, crop_type)
-
-                return {
-                    "crop_type": crop_type,
-                    "predicted_disease": predicted_class,
-                    "confidence": round(confidence_score * 100, 2),
-                    "is_healthy": is_healthy,
-                    "description": description,
-                    "top_predictions": [
+            class_names = self.model_service.get_class_names(crop_type)
+            confidences, predicted = tile_probs.max(dim=1)
+            cols = layout["cols"]
+            result["tiling"] = {
+                "tiles": tile_probs.size(0),
+                "rows": layout["rows"],
+                "cols": cols,
+                "scale": layout["scale"],
+                "forward_ms": layout["forward_ms"],
+                # Row-major grid; boxes are in original image pixels
+                "tile_map": [
+                    [
                         {
-                            "disease": pred["disease"],
-                            "confidence": round(pred["confidence"] * 100, 2)
+                            "disease": class_names[predicted[row * cols + col].item()],
+                            "confidence": round(confidences[row * cols + col].item() * 100, 2)
                         }
-                        for pred in top_predictions
+                        for col in range(cols)
                     ]
+                    for row in range(layout["rows"])
+                ],
+                "boxes": layout["boxes"]
+            }
+            if tier is not None:
+                result["tier"] = tier
+            return result
+
+        except Exception as e:
+            logger.error(f"Error during tiled prediction: {str(e)}")
+            raise
+
+    async def predict_auto(self, image_data: Union[bytes, Image.Image, torch.Tensor]) -> Dict:
+        """Identify the crop and its disease by scoring the image with every crop model"""
+        try:
+            crop_types = list(self.model_service.class_mappings)
+            for crop_type in crop_types:
+                if not self.model_service.is_model_loaded(crop_type):
+                    raise ValueError(
+                        f"Model not loaded for crop type: {crop_type}")
+
+            # Decode and preprocess once - all crop models share the same transform
+            if isinstance(image_data, torch.Tensor):
+                image_tensor = image_data
+            else:
+                image_tensor = self.transform_image(
+                    self.decode_image(image_data), crop_types[0])
+
+            logits = self.model_service.run_auto(image_tensor)
+            detector = self.model_service.crop_detector
+
+            scaled = {
+                crop_type: F.softmax(
+                    logits[crop_type].float() / detector.temperature(crop_type), dim=1)[0].tolist()
+                for crop_type in crop_types
+            }
+            crop_scores = detector.score(scaled)
+            best_crop = max(crop_scores, key=crop_scores.get)
+
+            result = self.build_result(
+                F.softmax(logits[best_crop].float(), dim=1)[0], best_crop)
+            result["crop_detection"] = {
+                "mode": "auto",
+                "calibrated": detector.calibrated,
+                "crop_scores": {
+                    crop_type: round(score * 100, 2) for crop_type, score in crop_scores.items()
                 }
+            }
+            return result
 
         except Exception as e:
-            logger.error(f"Error during prediction: {str(e)}")
+            logger.error(f"Error during auto-crop prediction: {str(e)}")
             raise
 
+    async def embed(self, image_data: Union[bytes, Image.Image], crop_type: str) -> Dict:
+        """Pooled pre-classifier features of one image from a crop model"""
+        try:
+            if not self.model_service.is_model_loaded(crop_type):
+                raise ValueError(
+                    f"Model not loaded for crop type: {crop_type}")
+
+            image_tensor = await self.preprocess_image(image_data, crop_type)
+            _, embedding = self.model_service.forward_with_embedding(
+                crop_type, image_tensor)
+            return {
+                "crop_type": crop_type,
+                "model_variant": self.model_service.model_variant,
+                "dim": embedding.shape[1],
+                "embedding": embedding[0].float().tolist()
+            }
+
+        except Exception as e:
+            logger.error(f"Error during embedding: {str(e)}")
+            raise
+
+    async def find_similar(self, image_data: Union[bytes, Image.Image], crop_type: str,
+                           k: int = 5) -> Dict:
+        """Classify an image and find its nearest confirmed training cases"""
+        try:
+            if not self.model_service.is_model_loaded(crop_type):
+                raise ValueError(
+                    f"Model not loaded for crop type: {crop_type}")
+            index = self.model_service.vector_indexes.get(crop_type)
+            if index is None:
+                raise LookupError(
+                    f"No similar-case index loaded for crop type: {crop_type}")
+
+            # One forward pass gives both the prediction and the query vector
+            image_tensor = await self.preprocess_image(image_data, crop_type)
+            logits, embedding = self.model_service.forward_with_embedding(
+                crop_type, image_tensor)
+
+            started = time.perf_counter()
+            matches = index.search(embedding[0].float().numpy(), k)
+            search_ms = (time.perf_counter() - started) * 1000
+
+            class_names = self.model_service.get_class_names(crop_type)
+            result = self.build_result(
+                F.softmax(logits.float(), dim=1)[0], crop_type)
+            result["similar_cases"] = [
+                {
+                    "id": match["id"],
+                    "disease": class_names[match["label"]],
+                    "similarity": round(match["similarity"], 4)
+                }
+                for match in matches
+            ]
+            result["ood"] = index.ood_score(matches)
+            result["search_ms"] = round(search_ms, 3)
+            return result
+
+        except Exception as e:
+            logger.error(f"Error during similar-case search: {str(e)}")
+            raise
+
+    def build_result(self, probabilities: torch.Tensor, crop_type: str) -> Dict:
+        """Turn one image's class probabilities into the API response payload"""
+        class_names = self.model_service.get_class_names(crop_type)
+
+        confidence, predicted_idx = torch.max(probabilities, 0)
+        predicted_class = class_names[predicted_idx.item()]
+        confidence_score = confidence.item()
+
+        # Get top 3 predictions
+        top_probs, top_indices = torch.topk(
+            probabilities, k=min(3, len(class_names)))
+        top_predictions = [
+            {
+                "disease": class_names[idx.item()],
+                "confidence": prob.item()
+            }
+            for prob, idx in zip(top_probs, top_indices)
+        ]
+
+        # Determine if plant is healthy
+        is_healthy = predicted_class.lower(
+        ) in ['healthy', 'cassava healthy']
+
+        # Get disease description
+        description = self.get_disease_description(
+            predicted_class, crop_type)
+
+        return {
+            "crop_type": crop_type,
+            "predicted_disease": predicted_class,
+            "confidence": round(confidence_score * 100, 2),
+            "is_healthy": is_healthy,
+            "description": description,
+            "top_predictions": [
+                {
+                    "disease": pred["disease"],
+                    "confidence": round(pred["confidence"] * 100, 2)
+                }
+                for pred in top_predictions
+            ]
+        }
+
     def get_disease_description(self, disease_name: str, crop_type: str) -> str:
         """Get description for predicted disease"""
         # Disease names are lowercase with underscores in the training data
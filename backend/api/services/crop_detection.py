@@ -0,0 +1,78 @@
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Calibration written by testing/calibrate_auto_crop.py
+AUTO_CROP_CALIBRATION_PATH = Path(__file__).resolve().parent.parent / \
+    'auto_crop_calibration.json'
+
+
+class CropDetector:
+    """Scores which crop an image shows from every crop model's output.
+
+    Each crop model only knows its own diseases, so raw confidences are not
+    comparable across crops. The calibrated rule temperature-scales each
+    model's logits, summarises each model by (log max-probability, entropy)
+    and maps those features to crop probabilities with a multinomial
+    logistic regression fitted on the raw test sets of all crops.
+    """
+
+    def __init__(self, crops: List[str], calibration: Optional[Dict] = None):
+        self.crops = list(crops)
+        self.calibration = calibration
+        if calibration and calibration.get("crops") != self.crops:
+            logger.warning(
+                "Auto-crop calibration was fitted for a different crop list; ignoring it")
+            self.calibration = None
+
+    @classmethod
+    def load(cls, crops: List[str], path: Path = AUTO_CROP_CALIBRATION_PATH) -> "CropDetector":
+        calibration = None
+        if Path(path).exists():
+            with open(path, 'r') as f:
+                calibration = json.load(f)
+        return cls(crops, calibration)
+
+    @property
+    def calibrated(self) -> bool:
+        return self.calibration is not None
+
+    def temperature(self, crop_type: str) -> float:
+        if not self.calibration:
+            return 1.0
+        return float(self.calibration["temperatures"].get(crop_type, 1.0))
+
+    def features(self, probabilities: Dict[str, List[float]]) -> List[float]:
+        """(log max-probability, entropy) of every crop model, in crop order"""
+        features = []
+        for crop_type in self.crops:
+            probs = probabilities[crop_type]
+            features.append(math.log(max(max(probs), 1e-12)))
+            features.append(-sum(p * math.log(p) for p in probs if p > 0))
+        return features
+
+    def score(self, probabilities: Dict[str, List[float]]) -> Dict[str, float]:
+        """Probability that the image shows each crop.
+
+        `probabilities` must already be temperature-scaled per crop. Without a
+        calibration file this falls back to normalised max-probabilities.
+        """
+        if not self.calibrated:
+            raw = {crop_type: max(probabilities[crop_type])
+                   for crop_type in self.crops}
+            total = sum(raw.values())
+            return {crop_type: value / total for crop_type, value in raw.items()}
+
+        x = self.features(probabilities)
+        logits = [
+            sum(w * f for w, f in zip(weights, x)) + bias
+            for weights, bias in zip(self.calibration["weights"], self.calibration["bias"])
+        ]
+        peak = max(logits)
+        exp = [math.exp(value - peak) for value in logits]
+        total = sum(exp)
+        return {crop_type: value / total for crop_type, value in zip(self.crops, exp)}
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import zipfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+
+from services.result_writer import ResultWriter, prediction_row, error_row
+from services.upload_service import UploadRejected
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+ACTIVE_STATUSES = ('queued', 'running')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def lower_thread_priority():
+    """Executor initializer: run job batches at a lower scheduling priority.
+
+    On Linux, setpriority on a native thread id renices just that thread,
+    so interactive requests on other threads keep their CPU share.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Could not lower job worker priority: {str(e)}")
+
+
+class JobService:
+    def __init__(self, model_service, upload_service):
+        """Bulk classification jobs, configurable via env"""
+        self.model_service = model_service
+        self.upload_service = upload_service
+        self.jobs_dir = Path(os.getenv('JOBS_DIR', 'jobs'))
+        self.batch_size = int(os.getenv('JOB_BATCH_SIZE', '64'))
+        self.max_images = int(os.getenv('JOB_MAX_IMAGES', '20000'))
+        self.max_upload_bytes = int(os.getenv('JOB_MAX_UPLOAD_BYTES', str(1024 ** 3)))
+        self.max_extracted_bytes = int(os.getenv('JOB_MAX_EXTRACTED_BYTES', str(4 * 1024 ** 3)))
+        # Job batches wait until interactive traffic has been quiet this long
+        self.yield_seconds = float(os.getenv('JOB_YIELD_MS', '200')) / 1000
+        self.result_format = os.getenv('JOB_RESULT_FORMAT', 'parquet').lower()
+        self.top_k = int(os.getenv('JOB_TOP_K', '3'))
+        self.workers = int(os.getenv('JOB_WORKERS', '1'))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='job-inference',
+            initializer=lower_thread_priority)
+        self.jobs: Dict[str, Dict] = {}
+        self.updates: Dict[str, asyncio.Event] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker_tasks: List[asyncio.Task] = []
+
+    # Job state on disk: {jobs_dir}/{id}/job.json, manifest.json, inputs/, results
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def results_path(self, job: Dict) -> Path:
+        suffix = '.csv' if job["result_format"] == 'csv' else '.parquet'
+        return self.job_dir(job["id"]) / f'results{suffix}'
+
+    def save_state(self, job: Dict):
+        """Write job.json atomically so a crash never leaves it half-written"""
+        path = self.job_dir(job["id"]) / 'job.json'
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+        self.jobs[job["id"]] = job
+
+    def load_manifest(self, job_id: str) -> List[Dict]:
+        with open(self.job_dir(job_id) / 'manifest.json') as f:
+            return json.load(f)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        return sorted(self.jobs.values(), key=lambda job: job["created_at"], reverse=True)
+
+    # Submission
+
+    def create_job(self, crop_type: str, archive: Optional[BinaryIO] = None,
+                   images: Optional[List[Tuple[str, BinaryIO]]] = None) -> Dict:
+        """Store a submitted zip archive and/or image files as a new queued job"""
+        job_id = uuid.uuid4().hex
+        inputs_dir = self.job_dir(job_id) / 'inputs'
+        inputs_dir.mkdir(parents=True)
+
+        try:
+            manifest: List[Dict] = []
+            if archive is not None:
+                self.extract_archive(archive, inputs_dir, manifest)
+            for name, file in images or []:
+                self.store_input(file, name, inputs_dir, manifest)
+            if not manifest:
+                raise UploadRejected(400, f"No images found; supported extensions: {list(IMAGE_EXTENSIONS)}")
+        except Exception:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            raise
+
+        # Ids are the client's names, made unique within the job
+        seen = set()
+        for idx, entry in enumerate(manifest):
+            if entry["id"] in seen:
+                entry["id"] = f'{entry["id"]}#{idx}'
+            seen.add(entry["id"])
+
+        with open(self.job_dir(job_id) / 'manifest.json', 'w') as f:
+            json.dump(manifest, f)
+
+        job = {
+            "id": job_id,
+            "crop_type": crop_type,
+            "status": "queued",
+            "total": len(manifest),
+            "processed": 0,
+            "failed": 0,
+            "result_format": self.result_format,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        self.save_state(job)
+        logger.info(f"Created job {job_id} with {len(manifest)} {crop_type} images")
+        return job
+
+    def store_input(self, file: BinaryIO, name: str, inputs_dir: Path, manifest: List[Dict],
+                    limit: Optional[int] = None):
+        """Copy one image into the job, under a generated name (never the client's path)"""
+        if len(manifest) >= self.max_images:
+            raise UploadRejected(413, f"A job may contain at most {self.max_images} images")
+
+        stored = f'{len(manifest):06d}{Path(name).suffix.lower()}'
+        written = 0
+        with open(inputs_dir / stored, 'wb') as out:
+            while chunk := file.read(COPY_CHUNK_BYTES):
+                written += len(chunk)
+                if limit is not None and written > limit:
+                    raise UploadRejected(
+                        413, f"Archive expands past the {self.max_extracted_bytes // 1024 ** 2} MB limit")
+                out.write(chunk)
+
+        manifest.append({"id": name, "file": stored})
+        return written
+
+    def extract_archive(self, archive: BinaryIO, inputs_dir: Path, manifest: List[Dict]):
+        """Extract the images of a zip archive with count and size caps.
+
+        Sizes are enforced on the bytes actually decompressed, not on the
+        sizes the archive claims, so a zip bomb stops at the limit.
+        """
+        try:
+            zf = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            raise UploadRejected(400, "Archive is not a valid zip file")
+
+        with zf:
+            entries = [
+                info for info in zf.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                and not info.filename.startswith('__MACOSX/')
+                and not Path(info.filename).name.startswith('.')
+            ]
+            if len(entries) > self.max_images:
+                raise UploadRejected(413, f"A job may contain at most {self.max_images} images")
+
+            remaining = self.max_extracted_bytes
+            for info in entries:
+                if info.file_size > self.upload_service.max_bytes:
+                    raise UploadRejected(
+                        413, f"{info.filename} exceeds the {self.upload_service.max_bytes // 1024} KB image limit")
+                with zf.open(info) as file:
+                    remaining -= self.store_input(
+                        file, info.filename, inputs_dir, manifest, limit=remaining)
+
+    # Workers
+
+    async def start(self):
+        """Requeue unfinished jobs from disk and start the worker tasks"""
+        self.queue = asyncio.Queue()
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        for job in self.recover():
+            self.enqueue(job["id"])
+        self.worker_tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+        logger.info(f"Job workers started ({self.workers}), {self.queue.qsize()} jobs queued")
+
+    def recover(self) -> List[Dict]:
+        """Load every job from disk; interrupted jobs go back to the queue"""
+        pending = []
+        for state_path in sorted(self.jobs_dir.glob('*/job.json')):
+            try:
+                with open(state_path) as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable job state {state_path}: {str(e)}")
+                continue
+            self.jobs[job["id"]] = job
+            if job["status"] in ACTIVE_STATUSES:
+                job["status"] = "queued"
+                self.save_state(job)
+                pending.append(job)
+        return sorted(pending, key=lambda job: job["created_at"])
+
+    def enqueue(self, job_id: str):
+        self.queue.put_nowait(job_id)
+
+    def notify(self, job_id: str):
+        """Wake every progress subscriber of a job"""
+        event = self.updates.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def update(self, job: Dict, **changes):
+        job.update(changes)
+        self.save_state(job)
+        self.notify(job["id"])
+
+    async def watch(self, job_id: str, keepalive_s: float = 15.0) -> AsyncIterator[Dict]:
+        """Yield a job's state now and after every change until it finishes"""
+        while True:
+            job = self.jobs[job_id]
+            yield dict(job)
+            if job["status"] in FINISHED_STATUSES:
+                return
+            event = self.updates.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), keepalive_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def cancel(self, job_id: str) -> Dict:
+        """Cancel a queued or running job; a running job stops after its current batch"""
+        job = self.jobs[job_id]
+        if job["status"] in ACTIVE_STATUSES:
+            self.update(job, status="cancelled", finished_at=time.time())
+        return job
+
+    async def worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is not None and job["status"] == "queued":
+                    await self.process_job(job)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                self.update(self.jobs[job_id], status="failed", error=str(e),
+                            finished_at=time.time())
+            finally:
+                self.queue.task_done()
+
+    async def wait_for_idle(self):
+        """Hold job batches back while interactive requests are arriving"""
+        while self.model_service.metrics.seconds_since_inference() < self.yield_seconds:
+            await asyncio.sleep(self.yield_seconds)
+
+    async def process_job(self, job: Dict):
+        """Classify a job's remaining images batch by batch, persisting each batch"""
+        while not self.model_service.models_loaded:
+            await asyncio.sleep(1)
+
+        crop_type = job["crop_type"]
+        if not self.model_service.is_model_loaded(crop_type):
+            raise ValueError(f"No model loaded for crop type: {crop_type}")
+
+        writer = ResultWriter(self.results_path(job), self.top_k, job["result_format"],
+                              flush_rows=self.batch_size)
+        # Resume: images with a row on disk were finished before a restart
+        done = writer.completed_ids()
+        pending = [entry for entry in self.load_manifest(job["id"]) if entry["id"] not in done]
+        self.update(job, status="running", processed=len(done),
+                    started_at=job["started_at"] or time.time())
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        for start in range(0, len(pending), self.batch_size):
+            if job["status"] == "cancelled":
+                writer.close()
+                return
+            await self.wait_for_idle()
+
+            chunk = pending[start:start + self.batch_size]
+            rows = await loop.run_in_executor(self.executor, self.classify_chunk, job, chunk)
+            writer.write(rows)
+            writer.flush()
+            if job["status"] == "cancelled":
+                writer.close()
+                return
+            self.update(job, processed=job["processed"] + len(rows),
+                        failed=job["failed"] + sum(row["error"] is not None for row in rows))
+
+        writer.close()
+        elapsed = time.perf_counter() - started
+        self.update(job, status="completed", finished_at=time.time())
+        logger.info(f"Job {job['id']} completed: {len(pending)} images in {elapsed:.1f}s")
+
+    def classify_chunk(self, job: Dict, chunk: List[Dict]) -> List[Dict]:
+        """Decode and classify one batch of a job's images in a single forward pass"""
+        import torch
+        import torch.nn.functional as F
+
+        crop_type = job["crop_type"]
+        inputs_dir = self.job_dir(job["id"]) / 'inputs'
+        transform = self.model_service.get_transform(crop_type)
+        class_names = self.model_service.get_class_names(crop_type)
+
+        rows, tensors, ids = [], [], []
+        for entry in chunk:
+            try:
+                with open(inputs_dir / entry["file"], 'rb') as f:
+                    image = self.upload_service.ingest_file(f).image
+                    tensors.append(transform(image.convert('RGB')))
+                ids.append(entry["id"])
+            except UploadRejected as e:
+                rows.append(error_row(entry["id"], crop_type, e.detail))
+            except Exception as e:
+                rows.append(error_row(entry["id"], crop_type, f"Could not decode image: {str(e)}"))
+
+        if tensors:
+            # Not recorded as inference, so jobs never count as interactive traffic
+            logits = self.model_service.forward(crop_type, torch.stack(tensors), record=False)
+            probabilities = F.softmax(logits.float(), dim=1).tolist()
+            rows.extend(prediction_row(image_id, crop_type, class_names, probs, self.top_k)
+                        for image_id, probs in zip(ids, probabilities))
+        return rows
@@ -1,7 +1,6 @@
 import os
 import logging
 from typing import Dict, Optional
-from groq import Groq
 import json
 
 logger = logging.getLogger(__name__)
@@ -10,15 +9,23 @@ logger = logging.getLogger(__name__)
 class LLMService:
     def __init__(self):
         """Initialize LLM service with Groq API"""
-        self.client = Groq(
-            api_key=os.getenv("GROQ_API_KEY")
-        )
+        self.api_key = os.getenv("GROQ_API_KEY")
         self.model = "llama-3.3-70b-versatile"
+        # The Groq SDK is imported on first use to keep API startup fast
+        self._client = None
 
-        if not os.getenv("GROQ_API_KEY"):
+        if not self.api_key:
             logger.warning(
                 "GROQ_API_KEY not found in environment variables. LLM features will be disabled.")
-            self.client = None
+
+    @property
+    def client(self):
+        """Groq client, created on first use (None when no API key is set)"""
+        if self._client is None and self.api_key:
+            from groq import Groq
+
+            self._client = Groq(api_key=self.api_key)
+        return self._client
 
     async def generate_disease_advice(
         self,
@@ -219,4 +226,4 @@ class LLMService:
 
     def is_available(self) -> bool:
         """Check if LLM service is available"""
-        return self.client is not None
+        return bool(self.api_key)
@@ -0,0 +1,130 @@
+import threading
+import statistics
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class CropLatency:
+    """Latency record for one crop model"""
+
+    def __init__(self, window: int):
+        self.first_request_s: Optional[float] = None
+        self.recent: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.warmup_s: Optional[float] = None
+
+
+class InferenceMetrics:
+    """Tracks first-request vs steady-state inference latency per crop"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._crops: Dict[str, CropLatency] = {}
+        self._lock = threading.Lock()
+        self.last_inference_at: Optional[float] = None
+
+    def _get(self, crop_type: str) -> CropLatency:
+        if crop_type not in self._crops:
+            self._crops[crop_type] = CropLatency(self.window)
+        return self._crops[crop_type]
+
+    def record_warmup(self, crop_type: str, seconds: float):
+        """Record how long the warm-up stage took for a crop"""
+        with self._lock:
+            self._get(crop_type).warmup_s = seconds
+
+    def record_inference(self, crop_type: str, seconds: float):
+        """Record the latency of one real inference call"""
+        with self._lock:
+            self.last_inference_at = time.monotonic()
+            record = self._get(crop_type)
+            record.requests += 1
+            if record.first_request_s is None:
+                record.first_request_s = seconds
+            else:
+                record.recent.append(seconds)
+
+    def seconds_since_inference(self) -> float:
+        """Time since the last interactive inference (inf if none yet)"""
+        if self.last_inference_at is None:
+            return float('inf')
+        return time.monotonic() - self.last_inference_at
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-crop latency summary in milliseconds"""
+        with self._lock:
+            summary = {}
+            for crop_type, record in self._crops.items():
+                recent = list(record.recent)
+                summary[crop_type] = {
+                    "requests": record.requests,
+                    "warmup_ms": _ms(record.warmup_s),
+                    "first_request_ms": _ms(record.first_request_s),
+                    "steady_state_p50_ms": _ms(statistics.median(recent)) if recent else None,
+                    "steady_state_mean_ms": _ms(statistics.mean(recent)) if recent else None,
+                }
+            return summary
+
+
+class CascadeMetrics:
+    """Escalation rate and estimated compute saved by the two-stage cascade"""
+
+    def __init__(self, screen_cost_ratio: float):
+        # Cost of a screening pass relative to a full pass (FLOPs scale with
+        # the number of input pixels for a fully convolutional backbone)
+        self.screen_cost_ratio = screen_cost_ratio
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, crop_type: str, escalated: bool):
+        with self._lock:
+            counts = self._counts.setdefault(
+                crop_type, {"requests": 0, "escalations": 0})
+            counts["requests"] += 1
+            counts["escalations"] += int(escalated)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            summary = {}
+            for crop_type, counts in self._counts.items():
+                requests = counts["requests"]
+                escalation_rate = counts["escalations"] / requests if requests else 0.0
+                relative_cost = self.screen_cost_ratio + escalation_rate
+                summary[crop_type] = {
+                    "requests": requests,
+                    "escalations": counts["escalations"],
+                    "escalation_rate": round(escalation_rate, 4),
+                    # Clamped like calibrate_cascade: screening can cost more than it saves
+                    "compute_saved": round(max(0.0, 1.0 - relative_cost), 4),
+                }
+            return summary
+
+
+class ExitMetrics:
+    """Distribution of early-exit points per crop"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, crop_type: str, exits):
+        with self._lock:
+            counts = self._counts.setdefault(crop_type, {})
+            for exit_point in exits:
+                counts[exit_point] = counts.get(exit_point, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            summary = {}
+            for crop_type, counts in self._counts.items():
+                total = sum(counts.values())
+                summary[crop_type] = {
+                    exit_point: {"count": count, "share": round(count / total, 4)}
+                    for exit_point, count in sorted(counts.items())
+                }
+            return summary
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
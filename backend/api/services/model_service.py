@@ -1,53 +1,141 @@
-import boto3
-import torch
-import torch.nn as nn
-import torchvision.transforms as transforms
-import timm
+import asyncio
+import contextlib
 import os
 import logging
-from typing import Dict, Optional
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from pathlib import Path
 import tempfile
 import json
 
-logger = logging.getLogger(__name__)
+from services.crop_detection import CropDetector
+from services.metrics import CascadeMetrics, ExitMetrics, InferenceMetrics
+from services.runtime_config import configure_torch_threads, cpu_supports_bf16
+
+# torch, torchvision, timm and boto3 are imported lazily so that the API
+# process can bind its port and answer liveness checks before they load
+if TYPE_CHECKING:
+    import torch
+    import torchvision.transforms as transforms
+    from services.vector_index import VectorIndex
 
+logger = logging.getLogger(__name__)
 
-class EfficientNetClassifier(nn.Module):
-    """Wrapper class to match the training architecture exactly"""
+# Suffix of the pre-frozen TorchScript artifact written by
+# training/export_serving_models.py, stored next to best_{crop}_model.pth
+SERVING_ARTIFACT_SUFFIX = ".torchscript.pt"
 
-    def __init__(self, num_classes=5, model_name='efficientnet_b1'):
-        super(EfficientNetClassifier, self).__init__()
-        # Load pretrained EfficientNet-B1
-        self.backbone = timm.create_model(model_name, pretrained=False)
+# Named resolution tiers accepted by the classify endpoints
+TIER_NAMES = {"full": 240, "fast": 192, "fastest": 160}
 
-        # Replace classifier with the same architecture used in training
-        in_features = self.backbone.classifier.in_features
-        self.backbone.classifier = nn.Sequential(
-            nn.Dropout(0.3),
-            nn.Linear(in_features, 512),
-            nn.ReLU(),
-            nn.Dropout(0.2),
-            nn.Linear(512, num_classes)
-        )
+# Per-crop precision opt-ins written by testing/evaluate_precision.py
+PRECISION_SETTINGS_PATH = Path(__file__).resolve().parent.parent / \
+    'precision_settings.json'
 
-    def forward(self, x):
-        return self.backbone(x)
+# Per-crop screening confidence thresholds written by testing/calibrate_cascade.py
+CASCADE_THRESHOLDS_PATH = Path(__file__).resolve().parent.parent / \
+    'cascade_thresholds.json'
 
 
 class ModelService:
     def __init__(self):
-        self.models: Dict[str, torch.nn.Module] = {}
-        self.transforms: Dict[str, transforms.Compose] = {}
+        self.models: Dict[str, "torch.nn.Module"] = {}
+        self.transforms: Dict[str, "transforms.Compose"] = {}
         self.class_names: Dict[str, list] = {}
         self.models_loaded = False
-        self.s3_client = boto3.client(
-            's3',
-            region_name=os.getenv('AWS_DEFAULT_REGION'),
-        )
+        self.loading = False
+        self.load_error: Optional[str] = None
+        # Wall-clock duration (seconds) of each initialization phase
+        self.startup_phases: Dict[str, float] = {}
+        self._s3_client = None
         self.bucket_name = "ghana-ai-hackathon"
         self.model_prefix = "models/"
 
+        # Optional local directory holding best_{crop}_model.* files; when
+        # unset, models are downloaded from S3
+        self.model_dir = os.getenv('MODEL_DIR')
+
+        # "torchscript" loads the pre-frozen serving artifact and falls back to
+        # the raw checkpoint when it is missing; "pytorch" always rebuilds the
+        # timm architecture from the checkpoint
+        self.model_format = os.getenv('MODEL_FORMAT', 'torchscript').lower()
+        self.model_sources: Dict[str, str] = {}
+
+        # "b1" serves best_{crop}_model.*, "student" serves the distilled
+        # best_{crop}_student_model.* produced by training/distill.py
+        self.model_variant = os.getenv('MODEL_VARIANT', 'b1').lower()
+
+        # Warm-up runs synthetic batches through each model before the crop is
+        # marked ready, so the first real request doesn't pay for kernel
+        # selection, oneDNN primitive creation and allocator growth
+        self.input_size = 240
+        self.warmup_batch_sizes = [
+            int(size) for size in os.getenv('WARMUP_BATCH_SIZES', '1').split(',') if size.strip()
+        ]
+        self.warmup_iterations = int(os.getenv('WARMUP_ITERATIONS', '2'))
+        self.ready_crops = set()
+        self.metrics = InferenceMetrics()
+
+        # Resolution tiers: lower-resolution variants fine-tuned by the
+        # trainers (best_{crop}_model_{size}.*) served next to the 240px model
+        self.serving_tiers = sorted(
+            {self.input_size} | {int(size) for size in os.getenv(
+                'SERVING_TIERS', str(self.input_size)).split(',') if size.strip()},
+            reverse=True)
+        self.tier_models: Dict[str, Dict[int, "torch.nn.Module"]] = {}
+        self.tier_transforms: Dict[int, "transforms.Compose"] = {}
+        self.thread_settings: Dict[str, int] = {}
+
+        # Reduced-precision inference: INFERENCE_PRECISION=bf16 forces every
+        # crop, otherwise crops opt in through precision_settings.json. bf16 is
+        # only used when the CPU supports it natively.
+        self.precision_override = os.getenv('INFERENCE_PRECISION')
+        self.crop_precision: Dict[str, str] = {}
+
+        # Two-stage cascade: a low-resolution screening pass answers first and
+        # the request escalates to the full-resolution pass only when top-1
+        # confidence is at or below the crop's calibrated threshold
+        self.cascade_enabled = os.getenv(
+            'CASCADE_MODE', 'false').lower() in ('1', 'true', 'yes')
+        self.screen_size = int(os.getenv('CASCADE_SCREEN_SIZE', '160'))
+        self.default_cascade_threshold = float(
+            os.getenv('CASCADE_DEFAULT_THRESHOLD', '0.9'))
+        self.cascade_thresholds: Dict[str, float] = {}
+        if self.cascade_enabled and CASCADE_THRESHOLDS_PATH.exists():
+            with open(CASCADE_THRESHOLDS_PATH, 'r') as f:
+                self.cascade_thresholds = json.load(f)
+        self.screen_transforms: Dict[str, "transforms.Compose"] = {}
+        self.cascade_metrics = CascadeMetrics(
+            (self.screen_size / self.input_size) ** 2)
+
+        # Early exit: stop the forward pass at the first auxiliary head whose
+        # confidence reaches the threshold. Needs the eager checkpoint plus
+        # best_{crop}_model.exits.pth, so it bypasses the TorchScript artifact.
+        self.early_exit_enabled = os.getenv(
+            'EARLY_EXIT_MODE', 'false').lower() in ('1', 'true', 'yes')
+        self.early_exit_threshold = float(
+            os.getenv('EARLY_EXIT_THRESHOLD', '0.95'))
+        self.exit_metrics = ExitMetrics()
+
+        # Auto crop mode: number of leading EfficientNet stages (stem, then
+        # blocks) whose weights and BatchNorm statistics are identical across
+        # all crop models and can be computed once per image, run by
+        # auto_trunk before each crop's tail
+        self.shared_trunk_depth = 0
+        self.auto_trunk: Optional["torch.nn.Module"] = None
+        self.auto_tails: Dict[str, "torch.nn.Module"] = {}
+        self.auto_trunk_source: Optional[str] = None
+        self.crop_detector: Optional[CropDetector] = None
+
+        # Similar-case search: per-crop embedding indexes built by
+        # training/build_vector_index.py (best_{crop}_model.index.npz)
+        self.vector_index_enabled = os.getenv(
+            'VECTOR_INDEX_MODE', 'false').lower() in ('1', 'true', 'yes')
+        self.vector_indexes: Dict[str, "VectorIndex"] = {}
+        # Crops whose loaded model exposes forward_with_embedding; TorchScript
+        # artifacts exported before embeddings were added do not
+        self.embedding_crops = set()
+
         # Define hardcoded class mappings - these match exactly what's in tree.json
         # This ensures we don't rely on tree.json at runtime for the API service
         self.class_mappings = {
@@ -68,8 +156,34 @@ class ModelService:
 
         logger.info(f"Using hardcoded class mappings: {self.class_mappings}")
 
-        # Define image transforms for each crop - exactly matching training transforms
-        self.image_transforms = {
+    @property
+    def s3_client(self):
+        """boto3 S3 client, created on first use"""
+        if self._s3_client is None:
+            import boto3
+
+            self._s3_client = boto3.client(
+                's3',
+                region_name=os.getenv('AWS_DEFAULT_REGION'),
+            )
+        return self._s3_client
+
+    def build_resized_transform(self, size: int) -> "transforms.Compose":
+        """Training-style transform at a different input resolution"""
+        import torchvision.transforms as transforms
+
+        return transforms.Compose([
+            transforms.Resize((size, size)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[
+                                 0.229, 0.224, 0.225])
+        ])
+
+    def build_image_transforms(self) -> Dict[str, "transforms.Compose"]:
+        """Build image transforms for each crop - exactly matching training transforms"""
+        import torchvision.transforms as transforms
+
+        return {
             "cashew": transforms.Compose([
                 transforms.Resize((240, 240)),  # EfficientNet-B1 input size
                 transforms.ToTensor(),
@@ -96,13 +210,13 @@ class ModelService:
             ])
         }
 
-    async def download_model_from_s3(self, model_name: str) -> str:
+    def download_model_from_s3(self, model_name: str, suffix: str = ".pth") -> str:
         """Download model from S3 and return local path"""
         try:
             # Create temporary directory for models
             temp_dir = tempfile.mkdtemp()
-            local_path = os.path.join(temp_dir, f"{model_name}.pth")
-            s3_key = f"{self.model_prefix}best_{model_name}_model.pth"
+            local_path = os.path.join(temp_dir, f"{model_name}{suffix}")
+            s3_key = f"{self.model_prefix}best_{model_name}_model{suffix}"
 
             logger.info(f"Downloading {s3_key} from S3...")
             self.s3_client.download_file(self.bucket_name, s3_key, local_path)
@@ -113,15 +227,51 @@ class ModelService:
             logger.error(f"Error downloading {model_name} model: {str(e)}")
             raise
 
-    def create_model_architecture(self, crop_type: str, num_classes: int) -> torch.nn.Module:
+    def fetch_model_file(self, model_name: str, suffix: str = ".pth") -> Tuple[str, bool]:
+        """Return (path, is_temporary) for a model file from MODEL_DIR or S3"""
+        if self.model_dir:
+            local_path = Path(self.model_dir) / \
+                f"best_{model_name}_model{suffix}"
+            if not local_path.exists():
+                raise FileNotFoundError(f"Model file not found: {local_path}")
+            return str(local_path), False
+
+        return self.download_model_from_s3(model_name, suffix), True
+
+    def model_file_stem(self, crop_type: str) -> str:
+        """Name used in best_{stem}_model.* for the configured model variant"""
+        if self.model_variant == 'b1':
+            return crop_type
+        return f"{crop_type}_{self.model_variant}"
+
+    def load_serving_artifact(self, crop_type: str, artifact_path: str) -> "torch.nn.Module":
+        """Load a pre-frozen TorchScript serving artifact (no timm required)"""
+        import torch
+
+        model = torch.jit.load(artifact_path, map_location='cpu')
+        model.eval()
+        logger.info(f"Loaded {crop_type} TorchScript serving artifact")
+        return model
+
+    def create_model_architecture(self, crop_type: str, num_classes: int,
+                                  checkpoint=None) -> "torch.nn.Module":
         """Create model architecture based on crop type"""
+        from services.architectures import (
+            EfficientNetClassifier, StudentClassifier, STUDENT_MODEL_NAME, checkpoint_model_name)
+
         try:
-            # Use the same EfficientNetClassifier wrapper as in training
-            model = EfficientNetClassifier(
-                num_classes=num_classes, model_name='efficientnet_b1')
+            if self.model_variant == 'student':
+                # Students may use any timm backbone; distill.py stores its name
+                model = StudentClassifier(
+                    num_classes=num_classes,
+                    model_name=checkpoint_model_name(checkpoint, STUDENT_MODEL_NAME))
+            else:
+                # Use the same EfficientNetClassifier wrapper as in training
+                model = EfficientNetClassifier(
+                    num_classes=num_classes, model_name='efficientnet_b1')
 
             logger.info(
-                f"Created EfficientNetClassifier for {crop_type} with {num_classes} classes")
+                f"Created {type(model).__name__} for {crop_type} with {num_classes} classes")
             return model
 
         except Exception as e:
@@ -129,20 +279,51 @@ class ModelService:
                 f"Error creating model architecture for {crop_type}: {str(e)}")
             raise
 
-    async def load_model(self, crop_type: str) -> torch.nn.Module:
-        """Load a specific crop model"""
+    def load_model(self, crop_type: str, tier: Optional[int] = None) -> "torch.nn.Module":
+        """Load a specific crop model (blocking; run off the event loop)
+
+        `tier` selects a lower-resolution variant saved as best_{crop}_model_{tier}.*
+        """
+        import torch
+
+        is_default_tier = tier is None or tier == self.input_size
+        tier_suffix = "" if is_default_tier else f"_{tier}"
+        source_key = crop_type if is_default_tier else f"{crop_type}@{tier}"
+
+        if self.model_format == 'torchscript' and not (self.early_exit_enabled and is_default_tier):
+            try:
+                artifact_path, is_temporary = self.fetch_model_file(
+                    self.model_file_stem(crop_type), tier_suffix + SERVING_ARTIFACT_SUFFIX)
+                try:
+                    model = self.load_serving_artifact(crop_type, artifact_path)
+                finally:
+                    # Clean up temporary file, even if the artifact is unusable
+                    if is_temporary:
+                        os.remove(artifact_path)
+                self.model_sources[source_key] = 'torchscript'
+                return model
+            except Exception as e:
+                logger.warning(
+                    f"No usable serving artifact for {crop_type} ({str(e)}), falling back to checkpoint")
+
         try:
             # Download model from S3
-            model_path = await self.download_model_from_s3(crop_type)
+            model_path, is_temporary = self.fetch_model_file(
+                self.model_file_stem(crop_type), tier_suffix + ".pth")
 
             # Get number of classes for this crop
             num_classes = len(self.class_mappings[crop_type])
 
-            # Create model architecture
-            model = self.create_model_architecture(crop_type, num_classes)
-
             # Load model weights
-            checkpoint = torch.load(model_path, map_location='cpu')
+            try:
+                checkpoint = torch.load(model_path, map_location='cpu')
+            finally:
+                # Clean up temporary file
+                if is_temporary:
+                    os.remove(model_path)
+
+            # Create model architecture
+            model = self.create_model_architecture(crop_type, num_classes, checkpoint)
 
             # Handle different checkpoint formats
             if 'model_state_dict' in checkpoint:
@@ -155,40 +336,422 @@ class ModelService:
             model.eval()
             logger.info(f"Loaded {crop_type} model successfully")
 
-            # Clean up temporary file
-            os.remove(model_path)
+            if self.early_exit_enabled and is_default_tier:
+                model = self.attach_exit_heads(crop_type, model, num_classes)
 
+            self.model_sources[source_key] = 'pytorch'
             return model
 
         except Exception as e:
             logger.error(f"Error loading {crop_type} model: {str(e)}")
             raise
 
+    def attach_exit_heads(self, crop_type: str, model: "torch.nn.Module", num_classes: int) -> "torch.nn.Module":
+        """Wrap a loaded model with its trained early-exit heads, if available"""
+        import torch
+        from services.architectures import EarlyExitClassifier, EXIT_HEADS_SUFFIX
+
+        try:
+            heads_path, is_temporary = self.fetch_model_file(
+                self.model_file_stem(crop_type), EXIT_HEADS_SUFFIX)
+        except Exception as e:
+            logger.warning(
+                f"No early-exit heads for {crop_type} ({str(e)}); serving full depth")
+            return model
+
+        try:
+            checkpoint = torch.load(heads_path, map_location='cpu')
+            wrapped = EarlyExitClassifier(
+                model, num_classes, exit_blocks=checkpoint['exit_blocks'])
+            wrapped.heads.load_state_dict(checkpoint['heads'])
+            wrapped.eval()
+        except Exception as e:
+            logger.warning(
+                f"Could not load early-exit heads for {crop_type} ({str(e)}); serving full depth")
+            return model
+        finally:
+            if is_temporary:
+                os.remove(heads_path)
+
+        logger.info(
+            f"Attached early-exit heads after blocks {list(wrapped.exit_blocks)} for {crop_type}")
+        return wrapped
+
+    def resolve_precision(self) -> Dict[str, str]:
+        """Decide fp32/bf16 per crop from config and CPU capabilities"""
+        requested = {}
+        if PRECISION_SETTINGS_PATH.exists():
+            with open(PRECISION_SETTINGS_PATH, 'r') as f:
+                requested = json.load(f)
+        if self.precision_override:
+            requested = {crop_type: self.precision_override.lower()
+                         for crop_type in self.class_mappings}
+
+        bf16_supported = None
+        precision = {}
+        for crop_type in self.class_mappings:
+            mode = requested.get(crop_type, 'fp32')
+            if mode == 'bf16':
+                if bf16_supported is None:
+                    bf16_supported = cpu_supports_bf16()
+                if not bf16_supported:
+                    logger.warning(
+                        f"bf16 requested for {crop_type} but CPU lacks native bf16 support; using fp32")
+                    mode = 'fp32'
+            precision[crop_type] = mode
+        return precision
+
+    def resolve_tier(self, tier: Optional[str]) -> int:
+        """Map a tier name ("full", "fast", "fastest") or pixel size to a served size"""
+        if tier is None or str(tier).strip() == "":
+            return self.input_size
+        tier = str(tier).strip().lower()
+        if tier in TIER_NAMES:
+            size = TIER_NAMES[tier]
+        else:
+            size = int(tier) if tier.isdigit() else None
+        if size not in self.serving_tiers:
+            raise ValueError(
+                f"Unsupported tier '{tier}'. Served tiers: {self.serving_tiers} "
+                f"({', '.join(f'{name}={px}' for name, px in TIER_NAMES.items())})")
+        return size
+
+    def has_tier(self, crop_type: str, tier: int) -> bool:
+        """True when a crop can be served at a resolution tier"""
+        return tier == self.input_size or tier in self.tier_models.get(crop_type.lower(), {})
+
+    def get_tier_model(self, crop_type: str, tier: Optional[int] = None) -> "torch.nn.Module":
+        """Model serving a crop at a resolution tier (default: full resolution)"""
+        if tier is None or tier == self.input_size:
+            return self.models[crop_type]
+        return self.tier_models[crop_type][tier]
+
+    def forward(self, crop_type: str, image_tensor: "torch.Tensor", record: bool = True,
+                tier: Optional[int] = None) -> "torch.Tensor":
+        """Forward a batch through a crop model at its configured precision"""
+        import torch
+
+        model = self.get_tier_model(crop_type, tier)
+        if self.early_exit_enabled and hasattr(model, 'forward_early_exit'):
+            def run(x):
+                logits, exits = model.forward_early_exit(
+                    x, self.early_exit_threshold)
+                if record:
+                    self.exit_metrics.record(crop_type, exits)
+                return logits
+        else:
+            run = model
+
+        with torch.no_grad():
+            if self.crop_precision.get(crop_type) == 'bf16':
+                with torch.autocast('cpu', dtype=torch.bfloat16):
+                    return run(image_tensor).float()
+            return run(image_tensor)
+
+    def forward_with_embedding(self, crop_type: str, image_tensor: "torch.Tensor"
+                               ) -> Tuple["torch.Tensor", "torch.Tensor"]:
+        """Logits and pooled pre-classifier features from a single forward pass"""
+        import torch
+
+        model = self.models[crop_type]
+        if not hasattr(model, 'forward_with_embedding'):
+            raise ValueError(
+                f"The {crop_type} model does not expose embeddings; re-export its serving artifact")
+
+        with torch.no_grad():
+            if self.crop_precision.get(crop_type) == 'bf16':
+                with torch.autocast('cpu', dtype=torch.bfloat16):
+                    logits, embedding = model.forward_with_embedding(image_tensor)
+                return logits.float(), embedding.float()
+            return model.forward_with_embedding(image_tensor)
+
+    def load_vector_index(self, crop_type: str) -> "VectorIndex":
+        """Load a crop's similar-case index (blocking; run off the event loop)"""
+        from services.vector_index import VectorIndex, VECTOR_INDEX_SUFFIX
+
+        index_path, is_temporary = self.fetch_model_file(
+            self.model_file_stem(crop_type), VECTOR_INDEX_SUFFIX)
+        try:
+            return VectorIndex.load(index_path)
+        finally:
+            if is_temporary:
+                os.remove(index_path)
+
+    def warmup_model(self, crop_type: str) -> float:
+        """Run synthetic batches at every configured batch size; returns seconds"""
+        import torch
+
+        # (input size, tier) pairs to warm up
+        runs = [(self.input_size, None)]
+        if self.cascade_enabled:
+            runs.append((self.screen_size, None))
+        runs.extend((tier, tier)
+                    for tier in self.tier_models.get(crop_type, {}))
+
+        started = time.perf_counter()
+        for size, tier in runs:
+            for batch_size in self.warmup_batch_sizes:
+                dummy = torch.zeros(batch_size, 3, size, size)
+                for _ in range(self.warmup_iterations):
+                    self.forward(crop_type, dummy, record=False, tier=tier)
+        duration = time.perf_counter() - started
+
+        self.metrics.record_warmup(crop_type, duration)
+        logger.info(
+            f"Warmed up {crop_type} model in {duration:.2f}s (batch sizes {self.warmup_batch_sizes})")
+        return duration
+
+    def run_inference(self, crop_type: str, image_tensor: "torch.Tensor",
+                      tier: Optional[int] = None) -> "torch.Tensor":
+        """Forward a preprocessed batch through a crop model and record its latency"""
+        crop_type = crop_type.lower()
+        started = time.perf_counter()
+        outputs = self.forward(crop_type, image_tensor, tier=tier)
+        metric_key = crop_type if tier in (
+            None, self.input_size) else f"{crop_type}@{tier}"
+        self.metrics.record_inference(
+            metric_key, time.perf_counter() - started)
+        return outputs
+
+    def get_cascade_threshold(self, crop_type: str) -> float:
+        """Screening confidence below which a request escalates"""
+        return float(self.cascade_thresholds.get(crop_type, self.default_cascade_threshold))
+
+    def run_cascade(self, crop_type: str, image) -> Tuple["torch.Tensor", bool]:
+        """Screen a PIL image at low resolution, escalating to full resolution if unsure.
+
+        Returns (probabilities of shape [1, num_classes], escalated).
+        """
+        import torch.nn.functional as F
+
+        crop_type = crop_type.lower()
+        started = time.perf_counter()
+
+        screen_tensor = self.screen_transforms[crop_type](image).unsqueeze(0)
+        probabilities = F.softmax(
+            self.forward(crop_type, screen_tensor), dim=1)
+        escalated = probabilities.max().item() <= self.get_cascade_threshold(crop_type)
+
+        if escalated:
+            full_tensor = self.transforms[crop_type](image).unsqueeze(0)
+            probabilities = F.softmax(
+                self.forward(crop_type, full_tensor), dim=1)
+
+        self.metrics.record_inference(
+            crop_type, time.perf_counter() - started)
+        self.cascade_metrics.record(crop_type, escalated)
+        return probabilities, escalated
+
+    def get_backbone(self, crop_type: str):
+        """Eager timm backbone of a crop model, or None for TorchScript artifacts"""
+        model = self.models[crop_type]
+        model = getattr(model, 'base', model)  # unwrap early-exit wrapper
+        backbone = getattr(model, 'backbone', None)
+        if backbone is None or not hasattr(backbone, 'blocks'):
+            return None
+        return backbone
+
+    def load_shared_trunk_artifacts(self, crop_types: List[str]):
+        """(trunk, {crop: tail}, depth) from export_serving_models.py --shared-trunk"""
+        import torch
+        from services.architectures import (
+            SHARED_TRUNK_NAME, TAIL_ARTIFACT_SUFFIX, TRUNK_ARTIFACT_SUFFIX)
+
+        def load(model_name, suffix, extra_files=None):
+            path, is_temporary = self.fetch_model_file(model_name, suffix)
+            try:
+                module = torch.jit.load(path, map_location='cpu', _extra_files=extra_files or {})
+            finally:
+                if is_temporary:
+                    os.remove(path)
+            return module.eval()
+
+        extra_files = {'depth': ''}
+        trunk = load(SHARED_TRUNK_NAME, TRUNK_ARTIFACT_SUFFIX, extra_files)
+        tails = {crop_type: load(crop_type, TAIL_ARTIFACT_SUFFIX) for crop_type in crop_types}
+        return trunk, tails, int(extra_files['depth'])
+
+    def configure_auto_mode(self):
+        """Set up the shared trunk and per-crop tails used by run_auto.
+
+        TorchScript serving uses the trunk/tail artifacts exported with
+        --shared-trunk; eager checkpoints are compared stage by stage. Crops
+        served with early-exit heads always run their own forward pass.
+        """
+        from services.architectures import TailModule, TrunkModule, shared_trunk_depth
+
+        self.auto_trunk, self.auto_tails = None, {}
+        self.shared_trunk_depth, self.auto_trunk_source = 0, None
+        crop_types = [crop_type for crop_type in self.class_mappings
+                      if not (self.early_exit_enabled
+                              and hasattr(self.models[crop_type], 'forward_early_exit'))]
+
+        if len(crop_types) > 1:
+            backbones = [self.get_backbone(crop_type) for crop_type in crop_types]
+            if all(backbone is not None for backbone in backbones):
+                depth = shared_trunk_depth(backbones)
+                if depth > 0:
+                    self.auto_trunk = TrunkModule(backbones[0], depth).eval()
+                    self.auto_tails = {crop_type: TailModule(backbone, depth).eval()
+                                       for crop_type, backbone in zip(crop_types, backbones)}
+                    self.shared_trunk_depth, self.auto_trunk_source = depth, 'pytorch'
+            elif self.model_format == 'torchscript' and self.model_variant == 'b1':
+                try:
+                    self.auto_trunk, self.auto_tails, self.shared_trunk_depth = \
+                        self.load_shared_trunk_artifacts(crop_types)
+                    self.auto_trunk_source = 'torchscript'
+                except Exception as e:
+                    logger.warning(f"No shared-trunk artifacts for auto mode ({str(e)})")
+
+        if not self.auto_tails:
+            logger.warning(
+                f"Auto crop mode has no shared trunk; each auto request runs "
+                f"{len(self.class_mappings)} full forward passes")
+
+    def auto_mode_summary(self) -> Dict:
+        """How much of an auto request is shared, for /metrics"""
+        return {
+            "shared_trunk_stages": self.shared_trunk_depth,
+            "trunk_source": self.auto_trunk_source,
+            "shared_trunk_crops": sorted(self.auto_tails),
+            "full_forward_passes": len(self.class_mappings) - len(self.auto_tails),
+        }
+
+    def precision_autocast(self, bf16: bool):
+        """bf16 CPU autocast, or a no-op context for fp32"""
+        import torch
+
+        return torch.autocast('cpu', dtype=torch.bfloat16) if bf16 else contextlib.nullcontext()
+
+    def run_auto(self, image_tensor: "torch.Tensor") -> Dict[str, "torch.Tensor"]:
+        """Logits of every crop model for one preprocessed batch.
+
+        The shared trunk runs once and each crop continues with its own tail
+        at its configured precision. Crops without a tail (no shared trunk,
+        or early-exit heads) run their full forward pass on the same tensor.
+        """
+        import torch
+
+        started = time.perf_counter()
+        logits = {}
+        features = None
+        if self.auto_tails:
+            # bf16 trunk only when every crop sharing it is served in bf16
+            trunk_bf16 = all(self.crop_precision.get(crop_type) == 'bf16'
+                             for crop_type in self.auto_tails)
+            with torch.no_grad(), self.precision_autocast(trunk_bf16):
+                features = self.auto_trunk(image_tensor).float()
+
+        for crop_type in self.class_mappings:
+            tail = self.auto_tails.get(crop_type)
+            if tail is None:
+                logits[crop_type] = self.forward(crop_type, image_tensor, record=False)
+                continue
+            with torch.no_grad(), self.precision_autocast(
+                    self.crop_precision.get(crop_type) == 'bf16'):
+                logits[crop_type] = tail(features).float()
+
+        self.metrics.record_inference(
+            'auto', time.perf_counter() - started)
+        return logits
+
     async def initialize_models(self):
-        """Initialize all crop models"""
+        """Initialize all crop models without blocking the event loop"""
+        self.loading = True
+        self.load_error = None
+        started = time.perf_counter()
         try:
             logger.info("Initializing models...")
 
+            # Size torch/OpenMP thread pools to the cgroup CPU quota before
+            # torch is first imported
+            phase_start = time.perf_counter()
+            self.thread_settings = await asyncio.to_thread(configure_torch_threads)
+            self.startup_phases["configure_threads"] = time.perf_counter(
+            ) - phase_start
+
+            phase_start = time.perf_counter()
+            image_transforms = await asyncio.to_thread(self.build_image_transforms)
+            self.startup_phases["build_transforms"] = time.perf_counter() - \
+                phase_start
+            self.crop_precision = await asyncio.to_thread(self.resolve_precision)
+            self.tier_transforms = {
+                tier: self.build_resized_transform(tier) for tier in self.serving_tiers}
+            if self.cascade_enabled:
+                screen_transform = self.build_resized_transform(
+                    self.screen_size)
+                self.screen_transforms = {
+                    crop_type: screen_transform for crop_type in self.class_mappings}
+
             # Load all crop models
             for crop_type in self.class_mappings.keys():
                 logger.info(f"Loading {crop_type} model...")
-                self.models[crop_type] = await self.load_model(crop_type)
-                self.transforms[crop_type] = self.image_transforms[crop_type]
+                phase_start = time.perf_counter()
+                self.models[crop_type] = await asyncio.to_thread(self.load_model, crop_type)
+                self.transforms[crop_type] = image_transforms[crop_type]
                 self.class_names[crop_type] = self.class_mappings[crop_type]
 
+                # Lower-resolution tiers for this crop
+                self.tier_models[crop_type] = {}
+                for tier in self.serving_tiers:
+                    if tier == self.input_size:
+                        continue
+                    # Tiers are optional; serve the crop without a missing one
+                    try:
+                        self.tier_models[crop_type][tier] = await asyncio.to_thread(
+                            self.load_model, crop_type, tier)
+                    except Exception as e:
+                        logger.warning(
+                            f"No {tier}px tier for {crop_type}: {str(e)}")
+                self.startup_phases[f"load_{crop_type}"] = time.perf_counter(
+                ) - phase_start
+
+                self.startup_phases[f"warmup_{crop_type}"] = await asyncio.to_thread(
+                    self.warmup_model, crop_type)
+
+                if hasattr(self.models[crop_type], 'forward_with_embedding'):
+                    self.embedding_crops.add(crop_type)
+                else:
+                    logger.warning(
+                        f"The {crop_type} model has no embeddings; re-export its serving "
+                        f"artifact to enable /api/embed and /api/similar")
+
+                # Similar-case search is optional; serve classification without it
+                if self.vector_index_enabled and crop_type in self.embedding_crops:
+                    try:
+                        self.vector_indexes[crop_type] = await asyncio.to_thread(
+                            self.load_vector_index, crop_type)
+                    except Exception as e:
+                        logger.warning(
+                            f"No vector index for {crop_type}: {str(e)}")
+                self.ready_crops.add(crop_type)
+
+            await asyncio.to_thread(self.configure_auto_mode)
+            self.crop_detector = CropDetector.load(
+                list(self.class_mappings))
+            logger.info(
+                f"Auto crop mode: {self.shared_trunk_depth} shared trunk stages "
+                f"({self.auto_trunk_source or 'none'}), "
+                f"calibrated={self.crop_detector.calibrated}")
+
             self.models_loaded = True
             logger.info("All models loaded successfully!")
 
         except Exception as e:
             logger.error(f"Error initializing models: {str(e)}")
             self.models_loaded = False
+            self.load_error = str(e)
             raise
 
-    def get_model(self, crop_type: str) -> Optional[torch.nn.Module]:
+        finally:
+            self.loading = False
+            self.startup_phases["total"] = time.perf_counter() - started
+
+    def get_model(self, crop_type: str) -> Optional["torch.nn.Module"]:
         """Get model for specific crop"""
         return self.models.get(crop_type.lower())
 
-    def get_transform(self, crop_type: str) -> Optional[transforms.Compose]:
+    def get_transform(self, crop_type: str) -> Optional["transforms.Compose"]:
         """Get image transform for specific crop"""
         return self.transforms.get(crop_type.lower())
 
@@ -197,5 +760,5 @@ class ModelService:
         return self.class_names.get(crop_type.lower())
 
     def is_model_loaded(self, crop_type: str) -> bool:
-        """Check if model is loaded for specific crop"""
-        return crop_type.lower() in self.models
+        """Check if model is loaded and warmed up for specific crop"""
+        return crop_type.lower() in self.ready_crops
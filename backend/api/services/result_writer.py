@@ -0,0 +1,140 @@
+import csv
+import os
+import shutil
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+
+def result_columns(top_k: int) -> List[str]:
+    columns = ["id", "crop_type", "predicted_disease", "confidence"]
+    for rank in range(1, top_k + 1):
+        columns += [f"top{rank}_disease", f"top{rank}_confidence"]
+    return columns + ["error"]
+
+
+def prediction_row(image_id: str, crop_type: str, class_names: Sequence[str],
+                   probabilities: Sequence[float], top_k: int) -> Dict:
+    """One result row from an image's class probabilities"""
+    ranked = sorted(range(len(probabilities)), key=probabilities.__getitem__, reverse=True)
+    row = {
+        "id": image_id,
+        "crop_type": crop_type,
+        "predicted_disease": class_names[ranked[0]],
+        "confidence": float(probabilities[ranked[0]]),
+        "error": None,
+    }
+    for rank in range(top_k):
+        idx = ranked[rank] if rank < len(ranked) else None
+        row[f"top{rank + 1}_disease"] = class_names[idx] if idx is not None else None
+        row[f"top{rank + 1}_confidence"] = float(probabilities[idx]) if idx is not None else None
+    return row
+
+
+def error_row(image_id: str, crop_type: str, error: str) -> Dict:
+    return {"id": image_id, "crop_type": crop_type, "error": error}
+
+
+class ResultWriter:
+    """Incremental, resumable CSV or Parquet output for bulk predictions.
+
+    CSV rows are appended in place. Parquet rows are written as numbered
+    part files in `{name}.parts/`, which `close()` merges into the target.
+    After a restart `completed_ids()` reads back every row already written,
+    so the caller can skip those images.
+    """
+
+    def __init__(self, path, top_k: int = 3, output_format: Optional[str] = None,
+                 flush_rows: int = 1024):
+        self.path = Path(path)
+        self.top_k = top_k
+        self.format = output_format or ('csv' if self.path.suffix == '.csv' else 'parquet')
+        self.flush_rows = flush_rows
+        self.columns = result_columns(top_k)
+        self.parts_dir = self.path.with_name(self.path.name + '.parts')
+        self.buffer: List[Dict] = []
+
+    def schema(self):
+        import pyarrow as pa
+
+        return pa.schema([
+            (name, pa.float32() if name.endswith("confidence") else pa.string())
+            for name in self.columns
+        ])
+
+    def part_paths(self) -> List[Path]:
+        if not self.parts_dir.exists():
+            return []
+        return sorted(self.parts_dir.glob('part-*.parquet'))
+
+    def completed_ids(self) -> Set[str]:
+        """Ids of every row already on disk"""
+        if self.format == 'csv':
+            if not self.path.exists():
+                return set()
+            with open(self.path, newline='') as f:
+                return {row["id"] for row in csv.DictReader(f) if row.get("id")}
+
+        import pyarrow.parquet as pq
+
+        ids = set()
+        for path in ([self.path] if self.path.exists() else []) + self.part_paths():
+            ids.update(pq.read_table(path, columns=["id"]).column("id").to_pylist())
+        return ids
+
+    def write(self, rows: List[Dict]):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """Persist buffered rows; each flush is durable on its own"""
+        if not self.buffer:
+            return
+        rows = [{column: row.get(column) for column in self.columns} for row in self.buffer]
+
+        if self.format == 'csv':
+            new_file = not self.path.exists()
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.columns)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self.parts_dir.mkdir(parents=True, exist_ok=True)
+            part = self.parts_dir / f'part-{len(self.part_paths()):05d}.parquet'
+            tmp = part.with_suffix('.tmp')
+            pq.write_table(pa.Table.from_pylist(rows, schema=self.schema()), tmp)
+            os.replace(tmp, part)
+        self.buffer = []
+
+    def close(self) -> Path:
+        """Flush and, for Parquet, merge the parts into a single file"""
+        self.flush()
+        if self.format == 'parquet' and self.part_paths():
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            sources = ([self.path] if self.path.exists() else []) + self.part_paths()
+            table = pa.concat_tables([pq.read_table(path) for path in sources])
+            # A crash between the rename and the rmtree below leaves rows in
+            # both the merged file and the parts; keep the first copy of each id
+            seen = set()
+            keep = []
+            for idx, image_id in enumerate(table.column("id").to_pylist()):
+                if image_id not in seen:
+                    seen.add(image_id)
+                    keep.append(idx)
+            if len(keep) < table.num_rows:
+                logger.info(f"Dropping {table.num_rows - len(keep)} duplicate rows from {self.path}")
+                table = table.take(keep)
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            pq.write_table(table, tmp, compression='zstd')
+            os.replace(tmp, self.path)
+            shutil.rmtree(self.parts_dir)
+        return self.path
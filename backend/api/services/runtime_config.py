@@ -0,0 +1,134 @@
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Best thread counts per backend, written by api/tune_threads.py
+DEFAULT_SETTINGS_PATH = Path(__file__).resolve().parent.parent / \
+    'thread_settings.json'
+
+CGROUP_V2_CPU_MAX = Path('/sys/fs/cgroup/cpu.max')
+CGROUP_V1_QUOTA = Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+CGROUP_V1_PERIOD = Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+
+
+def read_cgroup_quota() -> Optional[float]:
+    """Return the cgroup CPU quota in cores, or None when unlimited/unknown"""
+    try:
+        if CGROUP_V2_CPU_MAX.exists():
+            quota, period = CGROUP_V2_CPU_MAX.read_text().split()[:2]
+            if quota != 'max':
+                return int(quota) / int(period)
+        elif CGROUP_V1_QUOTA.exists() and CGROUP_V1_PERIOD.exists():
+            quota = int(CGROUP_V1_QUOTA.read_text().strip())
+            period = int(CGROUP_V1_PERIOD.read_text().strip())
+            if quota > 0 and period > 0:
+                return quota / period
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read cgroup CPU quota: {str(e)}")
+    return None
+
+
+def effective_cpu_count() -> int:
+    """CPUs this process may actually use: affinity mask capped by cgroup quota"""
+    try:
+        visible = len(os.sched_getaffinity(0))
+    except AttributeError:
+        visible = os.cpu_count() or 1
+
+    quota = read_cgroup_quota()
+    if quota is not None:
+        visible = min(visible, max(1, math.ceil(quota)))
+    return max(1, visible)
+
+
+def load_tuned_settings(path: Optional[Path] = None) -> Dict[str, Dict[str, int]]:
+    """Read persisted per-backend thread settings, if any"""
+    path = Path(path or os.getenv('THREAD_SETTINGS_PATH', DEFAULT_SETTINGS_PATH))
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_tuned_settings(settings: Dict[str, Dict[str, int]], path: Optional[Path] = None):
+    """Persist per-backend thread settings for later API starts"""
+    path = Path(path or os.getenv('THREAD_SETTINGS_PATH', DEFAULT_SETTINGS_PATH))
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=2)
+
+
+def resolve_thread_settings(backend: str = 'pytorch') -> Dict[str, int]:
+    """Thread counts for a backend: env override > tuned file > cgroup quota"""
+    cpus = effective_cpu_count()
+    settings = {"intra_op": cpus, "inter_op": 1}
+    settings.update(load_tuned_settings().get(backend, {}))
+
+    if os.getenv('INFERENCE_THREADS'):
+        settings["intra_op"] = int(os.getenv('INFERENCE_THREADS'))
+    if os.getenv('INFERENCE_INTEROP_THREADS'):
+        settings["inter_op"] = int(os.getenv('INFERENCE_INTEROP_THREADS'))
+
+    settings["effective_cpus"] = cpus
+    return settings
+
+
+def configure_torch_threads() -> Dict[str, int]:
+    """Apply thread settings to OpenMP/MKL and torch.
+
+    OMP_NUM_THREADS and MKL_NUM_THREADS are only honoured if set before torch
+    is imported, so this must run before the first `import torch`.
+    """
+    settings = resolve_thread_settings('pytorch')
+    os.environ.setdefault('OMP_NUM_THREADS', str(settings["intra_op"]))
+    os.environ.setdefault('MKL_NUM_THREADS', str(settings["intra_op"]))
+
+    import torch
+
+    torch.set_num_threads(settings["intra_op"])
+    try:
+        torch.set_num_interop_threads(settings["inter_op"])
+    except RuntimeError:
+        # Inter-op pool size can only be set once, before any parallel work
+        logger.warning("torch inter-op threads already initialized; keeping current value")
+
+    logger.info(
+        f"torch threads: intra_op={torch.get_num_threads()}, inter_op={torch.get_num_interop_threads()} "
+        f"(effective CPUs {settings['effective_cpus']})")
+    return settings
+
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bf16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        cpuinfo = Path('/proc/cpuinfo').read_text()
+    except OSError:
+        return False
+    flags = set()
+    for line in cpuinfo.splitlines():
+        if line.startswith('flags'):
+            flags.update(line.split(':', 1)[1].split())
+            break
+    if not flags & {'avx512_bf16', 'amx_bf16'}:
+        return False
+
+    import torch
+
+    return torch.backends.mkldnn.is_available()
+
+
+def onnx_session_options(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    """onnxruntime.SessionOptions sized to the container's CPU quota"""
+    import onnxruntime as ort
+
+    settings = resolve_thread_settings('onnxruntime')
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op or settings["intra_op"]
+    options.inter_op_num_threads = inter_op or settings["inter_op"]
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
@@ -0,0 +1,248 @@
+import os
+import io
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from services.upload_service import UploadRejected
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Frames-per-second limit with a short burst allowance"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class PredictionSmoother:
+    """Exponential moving average of class probabilities across frames"""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.average: Optional[List[float]] = None
+        self.frames = 0
+
+    def update(self, probabilities: List[float]) -> List[float]:
+        if self.average is None:
+            self.average = list(probabilities)
+        else:
+            self.average = [self.alpha * p + (1 - self.alpha) * avg
+                            for p, avg in zip(probabilities, self.average)]
+        self.frames += 1
+        return self.average
+
+
+class StreamService:
+    def __init__(self):
+        """Limits for WebSocket frame streams, configurable via env"""
+        self.max_fps = float(os.getenv('STREAM_MAX_FPS', '10'))
+        self.burst = int(os.getenv('STREAM_BURST', '5'))
+        self.max_batch = int(os.getenv('STREAM_MAX_BATCH', '4'))
+        self.max_frame_age = float(os.getenv('STREAM_MAX_FRAME_AGE_MS', '500')) / 1000
+        self.smoothing = float(os.getenv('STREAM_SMOOTHING', '0.3'))
+        self.max_connections = int(os.getenv('STREAM_MAX_CONNECTIONS', '8'))
+        # One executor shared by every stream keeps model work off the event
+        # loop and bounds how many batches run at once
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('STREAM_INFERENCE_WORKERS', '1')),
+            thread_name_prefix='stream-inference')
+        self.active_connections = 0
+
+    def try_reserve(self) -> bool:
+        """Claim a stream slot if one is free; synchronous, so handshakes can't interleave"""
+        if self.active_connections >= self.max_connections:
+            return False
+        self.active_connections += 1
+        return True
+
+    def release(self):
+        self.active_connections -= 1
+
+    async def run_in_executor(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+
+class StreamSession:
+    """One client's frame stream for a single crop.
+
+    Binary messages are frames (encoded images, or rgb8 payloads). Frames
+    over the rate limit are refused, frames waiting longer than the maximum
+    age are dropped, and frames that arrive together are classified as one
+    batch. Each processed frame is answered with its own prediction and the
+    smoothed prediction over the stream so far. A text message "reset"
+    clears the smoothed prediction.
+    """
+
+    def __init__(self, stream_service: StreamService, upload_service, model_service,
+                 classification_service, websocket, crop_type: str,
+                 tier: Optional[int] = None, input_format: str = "image"):
+        self.stream_service = stream_service
+        self.upload_service = upload_service
+        self.model_service = model_service
+        self.classification_service = classification_service
+        self.websocket = websocket
+        self.crop_type = crop_type
+        self.tier = tier
+        self.input_format = input_format
+
+        self.pending = deque(maxlen=stream_service.max_batch)
+        self.frame_ready = asyncio.Event()
+        self.send_lock = asyncio.Lock()
+        self.bucket = TokenBucket(stream_service.max_fps, stream_service.burst)
+        self.smoother = PredictionSmoother(stream_service.smoothing)
+        self.frame_id = 0
+        self.stats = {"received": 0, "processed": 0, "dropped_stale": 0,
+                      "throttled": 0, "rejected": 0}
+
+    async def send(self, message: Dict):
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    async def run(self):
+        """Receive frames until the client disconnects"""
+        worker = asyncio.create_task(self.process_frames())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+
+                data = message.get("bytes")
+                if data is None:
+                    if (message.get("text") or "").strip() == "reset":
+                        self.smoother.reset()
+                    continue
+
+                self.frame_id += 1
+                self.stats["received"] += 1
+                if not self.bucket.try_acquire():
+                    self.stats["throttled"] += 1
+                    await self.send({"type": "throttled", "frame": self.frame_id})
+                    continue
+
+                if len(self.pending) == self.pending.maxlen:
+                    # The oldest waiting frame is evicted by the append
+                    self.stats["dropped_stale"] += 1
+                    await self.send({"type": "dropped", "frames": [self.pending[0][0]]})
+                self.pending.append((self.frame_id, time.monotonic(), data))
+                self.frame_ready.set()
+        finally:
+            worker.cancel()
+            logger.info(f"Stream for {self.crop_type} closed: {self.stats}")
+
+    async def process_frames(self):
+        """Classify waiting frames in batches, dropping those that waited too long"""
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+
+            now = time.monotonic()
+            batch, dropped = [], []
+            while self.pending:
+                frame_id, arrived, data = self.pending.popleft()
+                if now - arrived > self.stream_service.max_frame_age:
+                    dropped.append(frame_id)
+                else:
+                    batch.append((frame_id, arrived, data))
+            if dropped:
+                self.stats["dropped_stale"] += len(dropped)
+                await self.send({"type": "dropped", "frames": dropped})
+            if not batch:
+                continue
+
+            try:
+                outcomes = await self.stream_service.run_in_executor(
+                    self.classify_batch, [data for _, _, data in batch])
+            except Exception as e:
+                logger.error(f"Stream inference failed: {str(e)}")
+                await self.send({"type": "error", "frames": [frame_id for frame_id, _, _ in batch],
+                                 "detail": "Inference failed"})
+                continue
+
+            for (frame_id, arrived, _), (probabilities, error) in zip(batch, outcomes):
+                if error is not None:
+                    self.stats["rejected"] += 1
+                    await self.send({"type": "rejected", "frame": frame_id, "detail": error})
+                    continue
+                self.stats["processed"] += 1
+                await self.send(self.build_message(frame_id, arrived, probabilities))
+
+    def frame_tensor(self, data: bytes):
+        """Validate and preprocess one frame into a batch of one"""
+        if self.input_format == "rgb8":
+            size = self.tier or self.model_service.input_size
+            buffer = self.upload_service.ingest_rgb8_file(io.BytesIO(data), size)
+            return self.classification_service.rgb8_to_tensor(buffer, size)
+
+        image = self.upload_service.ingest_file(io.BytesIO(data)).image
+        return self.classification_service.tier_tensor(
+            self.classification_service.decode_image(image), self.crop_type, self.tier)
+
+    def classify_batch(self, frames: List[bytes]) -> List[Tuple[Optional[List[float]], Optional[str]]]:
+        """Decode every frame and run one forward pass (executor thread)"""
+        import torch
+        import torch.nn.functional as F
+
+        tensors, outcomes = [], []
+        for data in frames:
+            try:
+                tensors.append(self.frame_tensor(data))
+                outcomes.append((None, None))
+            except UploadRejected as e:
+                outcomes.append((None, e.detail))
+            except Exception as e:
+                outcomes.append((None, f"Could not decode frame: {str(e)}"))
+
+        if tensors:
+            outputs = self.model_service.run_inference(
+                self.crop_type, torch.cat(tensors), tier=self.tier)
+            probabilities = iter(F.softmax(outputs.float(), dim=1).tolist())
+            outcomes = [(next(probabilities), None) if error is None else (None, error)
+                        for _, error in outcomes]
+        return outcomes
+
+    def build_message(self, frame_id: int, arrived: float, probabilities: List[float]) -> Dict:
+        class_names = self.model_service.get_class_names(self.crop_type)
+
+        def summary(probs: List[float]) -> Dict:
+            best = max(range(len(probs)), key=probs.__getitem__)
+            return {"predicted_disease": class_names[best],
+                    "confidence": round(probs[best] * 100, 2)}
+
+        ranked = sorted(range(len(probabilities)), key=probabilities.__getitem__, reverse=True)
+        smoothed = self.smoother.update(probabilities)
+        return {
+            "type": "prediction",
+            "frame": frame_id,
+            "latency_ms": round((time.monotonic() - arrived) * 1000, 1),
+            "prediction": {
+                **summary(probabilities),
+                "top_predictions": [
+                    {"disease": class_names[idx], "confidence": round(probabilities[idx] * 100, 2)}
+                    for idx in ranked[:3]
+                ]
+            },
+            "smoothed": {**summary(smoothed), "frames": self.smoother.frames},
+            "stats": dict(self.stats)
+        }
@@ -0,0 +1,166 @@
+import os
+import math
+import time
+import logging
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import torch
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HEALTHY_CLASSES = ['healthy', 'cassava healthy']
+
+
+def tile_positions(length: int, tile: int, count: int) -> List[int]:
+    """`count` tile offsets spread evenly so the last tile ends at the border"""
+    if length <= tile or count <= 1:
+        return [max(0, (length - tile) // 2)]
+    return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+
+def plan_tiles(width: int, height: int, tile: int, overlap: float,
+               max_tiles: int) -> Tuple[float, List[int], List[int]]:
+    """Pick a working scale and tile grid for an image.
+
+    Starts at full resolution and shrinks the image until the overlapping
+    grid fits in `max_tiles`, never below a short side of one tile. Returns
+    (scale, x offsets, y offsets) in scaled-image coordinates.
+    """
+    stride = max(1, int(tile * (1 - overlap)))
+    min_scale = tile / min(width, height)
+    scale = max(1.0, min_scale)
+
+    def counts(scale):
+        scaled_w, scaled_h = round(width * scale), round(height * scale)
+        cols = math.ceil(max(0, scaled_w - tile) / stride) + 1
+        rows = math.ceil(max(0, scaled_h - tile) / stride) + 1
+        return scaled_w, scaled_h, cols, rows
+
+    scaled_w, scaled_h, cols, rows = counts(scale)
+    while cols * rows > max_tiles and scale > min_scale:
+        scale = max(min_scale, scale * 0.85)
+        scaled_w, scaled_h, cols, rows = counts(scale)
+
+    # Extreme aspect ratios can still overflow at the smallest scale; thin
+    # out the long axis (tiles then overlap less or leave narrow gaps)
+    if cols * rows > max_tiles:
+        if cols >= rows:
+            cols = max(1, max_tiles // rows)
+        else:
+            rows = max(1, max_tiles // cols)
+
+    return (scale, tile_positions(scaled_w, tile, cols),
+            tile_positions(scaled_h, tile, rows))
+
+
+def aggregate_tiles(tile_probs: "torch.Tensor", healthy_idx: Optional[int],
+                    top_fraction: float = 0.25) -> "torch.Tensor":
+    """Image-level class probabilities from per-tile probabilities.
+
+    A lesion may show up in only a few tiles, so each disease is scored by
+    the mean of its top tiles, while healthy is scored over all tiles.
+    """
+    k = max(1, math.ceil(tile_probs.size(0) * top_fraction))
+    scores = tile_probs.topk(k, dim=0).values.mean(dim=0)
+    if healthy_idx is not None:
+        scores[healthy_idx] = tile_probs[:, healthy_idx].mean()
+    return scores / scores.sum()
+
+
+class TileBudget:
+    """Adaptive tile cap keeping tiled forward passes within a latency budget"""
+
+    def __init__(self, budget_ms: float, hard_cap: int, initial_tile_ms: float = 30.0):
+        self.budget = budget_ms / 1000
+        self.hard_cap = hard_cap
+        self.tile_seconds = initial_tile_ms / 1000
+        self.observed = False
+
+    def max_tiles(self) -> int:
+        return max(1, min(self.hard_cap, int(self.budget / self.tile_seconds)))
+
+    def observe(self, tiles: int, seconds: float):
+        per_tile = seconds / tiles
+        if self.observed:
+            self.tile_seconds = 0.8 * self.tile_seconds + 0.2 * per_tile
+        else:
+            self.tile_seconds = per_tile
+            self.observed = True
+
+
+class TiledInference:
+    def __init__(self, model_service):
+        """Tiled classification of large photos, configurable via env"""
+        self.model_service = model_service
+        self.overlap = float(os.getenv('TILE_OVERLAP', '0.25'))
+        self.batch_size = int(os.getenv('TILE_BATCH_SIZE', '16'))
+        self.budget = TileBudget(
+            float(os.getenv('TILE_LATENCY_BUDGET_MS', '1500')),
+            int(os.getenv('TILE_MAX_TILES', '64')))
+
+    def tile_batch(self, image: "Image.Image", tile: int) -> Tuple["torch.Tensor", Dict]:
+        """Normalized [N, 3, tile, tile] tiles of an image, plus the grid layout"""
+        import torch
+        import torchvision.transforms.functional as TF
+
+        width, height = image.size
+        scale, xs, ys = plan_tiles(
+            width, height, tile, self.overlap, self.budget.max_tiles())
+        scaled_size = (round(width * scale), round(height * scale))
+
+        # JPEG can decode straight at a reduced scale, far cheaper than a
+        # full decode followed by a resize
+        if scale < 1.0:
+            image.draft('RGB', scaled_size)
+        image = image.convert('RGB')
+        if image.size != scaled_size:
+            image = image.resize(scaled_size)
+
+        # Normalize once, then slice tiles out of the whole-image tensor
+        full = TF.normalize(TF.to_tensor(image), mean=[0.485, 0.456, 0.406],
+                            std=[0.229, 0.224, 0.225])
+        full = self.pad_to(full, tile)
+        tiles = [full[:, y:y + tile, x:x + tile] for y in ys for x in xs]
+
+        layout = {
+            "scale": round(scale, 4),
+            "rows": len(ys),
+            "cols": len(xs),
+            "boxes": [[round(x / scale), round(y / scale), round((x + tile) / scale),
+                       round((y + tile) / scale)] for y in ys for x in xs],
+        }
+        return torch.stack(tiles), layout
+
+    def pad_to(self, tensor: "torch.Tensor", tile: int) -> "torch.Tensor":
+        """Zero-pad (in normalized space) so both sides are at least one tile"""
+        import torch.nn.functional as F
+
+        _, height, width = tensor.shape
+        if height >= tile and width >= tile:
+            return tensor
+        return F.pad(tensor, (0, max(0, tile - width), 0, max(0, tile - height)))
+
+    def classify(self, image: "Image.Image", crop_type: str,
+                 tier: Optional[int] = None) -> Tuple["torch.Tensor", "torch.Tensor", Dict]:
+        """Classify every tile in batches; returns (image probs, tile probs, layout)"""
+        import torch
+        import torch.nn.functional as F
+
+        tile = tier or self.model_service.input_size
+        tiles, layout = self.tile_batch(image, tile)
+
+        started = time.perf_counter()
+        outputs = [self.model_service.forward(crop_type, batch, tier=tier)
+                   for batch in torch.split(tiles, self.batch_size)]
+        elapsed = time.perf_counter() - started
+        self.budget.observe(tiles.size(0), elapsed)
+        self.model_service.metrics.record_inference(f"{crop_type}:tiled", elapsed)
+
+        tile_probs = F.softmax(torch.cat(outputs).float(), dim=1)
+        class_names = self.model_service.get_class_names(crop_type)
+        healthy_idx = next((idx for idx, name in enumerate(class_names)
+                            if name.lower() in HEALTHY_CLASSES), None)
+        layout["forward_ms"] = round(elapsed * 1000, 1)
+        return aggregate_tiles(tile_probs, healthy_idx), tile_probs, layout
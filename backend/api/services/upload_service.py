@@ -0,0 +1,221 @@
+import os
+import logging
+import struct
+from typing import BinaryIO, Iterable, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from fastapi import UploadFile
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of each accepted container, checked before PIL sees the file
+MAGIC_NUMBERS = {
+    "JPEG": [b"\xff\xd8\xff"],
+    "PNG": [b"\x89PNG\r\n\x1a\n"],
+    "WEBP": [b"RIFF"],  # plus b"WEBP" at offset 8
+}
+HEADER_BYTES = 32
+
+# Client-preprocessed input: optional header (magic, height, width) followed
+# by height*width*3 uint8 RGB bytes in row-major HWC order
+RGB8_MAGIC = b"RGB8"
+RGB8_HEADER = struct.Struct("<4sHH")
+
+
+class UploadRejected(Exception):
+    """An upload refused before decoding, with the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class UploadLimitExceeded(Exception):
+    """Raised from the receive channel once a request body passes the byte limit"""
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Image container format from the first bytes of a file, if accepted"""
+    for image_format, signatures in MAGIC_NUMBERS.items():
+        if any(header.startswith(signature) for signature in signatures):
+            if image_format == "WEBP" and header[8:12] != b"WEBP":
+                continue
+            return image_format
+    return None
+
+
+def encode_rgb8(image: "Image.Image", size: int = 240) -> bytes:
+    """Reference client encoder for the rgb8 input format"""
+    image = image.convert('RGB').resize((size, size))
+    return RGB8_HEADER.pack(RGB8_MAGIC, size, size) + image.tobytes()
+
+
+class IngestedImage:
+    """A validated upload: header already parsed, pixels not yet decoded"""
+
+    def __init__(self, image: "Image.Image", image_format: str, size_bytes: int):
+        self.image = image
+        self.format = image_format
+        self.size_bytes = size_bytes
+
+    @property
+    def dimensions(self) -> Tuple[int, int]:
+        return self.image.size
+
+
+class UploadService:
+    def __init__(self):
+        """Upload limits for the classify endpoints, configurable via env"""
+        self.max_bytes = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+        # Decoded-size cap guarding against decompression bombs (~40 MP)
+        self.max_pixels = int(os.getenv('MAX_IMAGE_PIXELS', str(40_000_000)))
+        self.allowed_formats = [
+            image_format.strip().upper()
+            for image_format in os.getenv('ALLOWED_IMAGE_FORMATS', 'JPEG,PNG,WEBP').split(',')
+            if image_format.strip()
+        ]
+
+    def spooled_size(self, file: BinaryIO) -> int:
+        """Size of the spooled upload, measured without reading it"""
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+        return size
+
+    def ingest(self, upload: "UploadFile") -> IngestedImage:
+        """Validate an upload from its size and header only.
+
+        The returned image is opened lazily on the spooled file itself, so
+        decoding later reads straight from the spool without a bytes copy.
+        """
+        return self.ingest_file(upload.file)
+
+    def ingest_file(self, file: BinaryIO) -> IngestedImage:
+        """Validate an encoded image in a seekable file object (see ingest)"""
+        from PIL import Image
+
+        size_bytes = self.spooled_size(file)
+        if size_bytes == 0:
+            raise UploadRejected(400, "Empty image file")
+        if size_bytes > self.max_bytes:
+            raise UploadRejected(
+                413, f"Image exceeds the {self.max_bytes // 1024} KB upload limit")
+
+        header = file.read(HEADER_BYTES)
+        file.seek(0)
+        image_format = sniff_format(header)
+        if image_format is None or image_format not in self.allowed_formats:
+            raise UploadRejected(
+                415, f"Unsupported image format. Supported formats: {self.allowed_formats}")
+
+        try:
+            # Only parses the header; pixel data is decoded on first access
+            image = Image.open(file, formats=[image_format])
+        except Image.DecompressionBombError:
+            raise UploadRejected(413, "Image dimensions are too large")
+        except Exception as e:
+            raise UploadRejected(400, f"Could not read image header: {str(e)}")
+
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise UploadRejected(
+                413, f"Image is {width}x{height}; at most {self.max_pixels} pixels are accepted")
+
+        return IngestedImage(image, image_format, size_bytes)
+
+    def ingest_rgb8(self, upload: "UploadFile", size: int) -> bytearray:
+        """Validate a raw uint8 RGB payload of exactly size x size x 3 bytes.
+
+        Accepts the bare pixel buffer or one prefixed with an RGB8 header.
+        """
+        return self.ingest_rgb8_file(upload.file, size)
+
+    def ingest_rgb8_file(self, file: BinaryIO, size: int) -> bytearray:
+        """Validate an rgb8 payload in a seekable file object (see ingest_rgb8)"""
+        size_bytes = self.spooled_size(file)
+        pixel_bytes = size * size * 3
+
+        if size_bytes == RGB8_HEADER.size + pixel_bytes:
+            magic, height, width = RGB8_HEADER.unpack(file.read(RGB8_HEADER.size))
+            if magic != RGB8_MAGIC:
+                raise UploadRejected(400, "Invalid rgb8 header magic")
+            if (height, width) != (size, size):
+                raise UploadRejected(
+                    400, f"rgb8 payload is {width}x{height}; expected {size}x{size}")
+        elif size_bytes != pixel_bytes:
+            raise UploadRejected(
+                400, f"rgb8 payload must be {pixel_bytes} bytes ({size}x{size}x3 uint8 RGB), "
+                     f"optionally after a {RGB8_HEADER.size}-byte header; got {size_bytes} bytes")
+
+        # Becomes the backing storage of the input tensor (torch.frombuffer)
+        return bytearray(file.read(pixel_bytes))
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware capping request bodies while they stream in.
+
+    Requests announcing a larger Content-Length are refused before any body
+    is read; chunked uploads are cut off as soon as they pass the limit.
+    The limit adds `overhead_bytes` for multipart framing and form fields.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str], overhead_bytes: int = 64 * 1024):
+        self.app = app
+        self.limit = max_bytes + overhead_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or \
+                not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length", b"").decode()
+        if content_length.isdigit() and int(content_length) > self.limit:
+            await self.reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    exceeded = True
+                    raise UploadLimitExceeded()
+            return message
+
+        async def guarded_send(message):
+            # The framework may turn the aborted body parse into its own error
+            # response; answer 413 in its place
+            nonlocal rejected
+            if exceeded:
+                if message["type"] == "http.response.start" and not rejected:
+                    rejected = True
+                    await self.reject(send)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadLimitExceeded:
+            if not rejected:
+                await self.reject(send)
+        if exceeded:
+            logger.warning(
+                f"Rejected upload to {scope['path']} after {received} bytes")
+
+    async def reject(self, send):
+        from fastapi.responses import JSONResponse
+
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds the {self.limit // 1024} KB request limit"})
+        await response({"type": "http"}, None, send)
@@ -0,0 +1,195 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Index files are stored next to the checkpoints: best_{crop}_model{suffix}
+VECTOR_INDEX_SUFFIX = ".index.npz"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 20,
+                     seed: int = 0) -> np.ndarray:
+    """Unit-norm centroids of normalized vectors (cosine k-means)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = (vectors @ centroids.T).argmax(axis=1)
+        for idx in range(n_lists):
+            members = vectors[assignments == idx]
+            if len(members):
+                centroids[idx] = members.sum(axis=0)
+            else:
+                centroids[idx] = vectors[rng.integers(len(vectors))]
+        centroids = normalize(centroids)
+    return centroids
+
+
+class VectorIndex:
+    """In-process cosine-similarity index over one crop's embeddings.
+
+    Vectors are L2-normalized and stored as float16, or as int8 with a
+    per-vector scale. With `n_lists` > 1 the index is IVF-partitioned: a
+    k-means coarse quantizer assigns every vector to a list, and a query
+    scans only its `n_probe` closest lists. Each list is a contiguous
+    matrix, so a probe is one dequantize plus one matrix-vector product.
+    """
+
+    def __init__(self, dim: int, dtype: str = "float16", n_probe: int = 4,
+                 metadata: Optional[Dict] = None):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.n_probe = n_probe
+        self.metadata = metadata or {}
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = [self.empty_vectors()]
+        self.list_scales: List[np.ndarray] = [np.zeros(0, dtype=np.float32)]
+        self.list_rows: List[np.ndarray] = [np.zeros(0, dtype=np.int64)]
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.ids = np.zeros(0, dtype=str)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.lists)
+
+    def empty_vectors(self) -> np.ndarray:
+        return np.zeros((0, self.dim), dtype=np.int8 if self.dtype == "int8" else np.float16)
+
+    def quantize(self, vectors: np.ndarray):
+        """Stored form of normalized vectors: (values, per-vector scales)"""
+        if self.dtype == "int8":
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            values = np.round(vectors / scales[:, None]).astype(np.int8)
+            return values, scales.astype(np.float32)
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    def dequantize(self, list_idx: int) -> np.ndarray:
+        values = self.lists[list_idx].astype(np.float32)
+        if self.dtype == "int8":
+            values *= self.list_scales[list_idx][:, None]
+        return values
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return (vectors @ self.centroids.T).argmax(axis=1)
+
+    def add(self, embeddings: np.ndarray, labels: Sequence[int], ids: Sequence[str]):
+        """Append embeddings; existing lists are extended in place of a rebuild"""
+        vectors = normalize(np.atleast_2d(embeddings))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d embeddings, got {vectors.shape[1]}-d")
+        rows = np.arange(len(self), len(self) + len(vectors))
+        values, scales = self.quantize(vectors)
+
+        assignments = self.assign(vectors)
+        for list_idx in np.unique(assignments):
+            members = assignments == list_idx
+            self.lists[list_idx] = np.concatenate([self.lists[list_idx], values[members]])
+            self.list_scales[list_idx] = np.concatenate(
+                [self.list_scales[list_idx], scales[members]])
+            self.list_rows[list_idx] = np.concatenate([self.list_rows[list_idx], rows[members]])
+
+        self.labels = np.concatenate([self.labels, np.asarray(labels, dtype=np.int32)])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=str)])
+
+    def train_ivf(self, n_lists: int, seed: int = 0):
+        """Partition the current vectors into `n_lists` IVF lists"""
+        rows = np.concatenate(self.list_rows)
+        vectors = normalize(np.concatenate(
+            [self.dequantize(idx) for idx in range(self.n_lists)]))
+        order = np.argsort(rows)
+        rows, vectors = rows[order], vectors[order]
+        n_lists = min(n_lists, len(vectors))
+
+        self.centroids = spherical_kmeans(vectors, n_lists, seed=seed) if n_lists > 1 else None
+        values, scales = self.quantize(vectors)
+        assignments = self.assign(vectors)
+        self.lists, self.list_scales, self.list_rows = [], [], []
+        for list_idx in range(max(n_lists, 1)):
+            members = assignments == list_idx
+            self.lists.append(values[members])
+            self.list_scales.append(scales[members])
+            self.list_rows.append(rows[members])
+
+    def search(self, query: np.ndarray, k: int = 5) -> List[Dict]:
+        """Top-k most similar stored vectors for one embedding"""
+        query = normalize(np.asarray(query).reshape(-1))
+        if self.centroids is not None:
+            probe = np.argsort(self.centroids @ query)[::-1][:self.n_probe]
+        else:
+            probe = range(self.n_lists)
+
+        scores = np.concatenate([self.dequantize(idx) @ query for idx in probe])
+        rows = np.concatenate([self.list_rows[idx] for idx in probe])
+        if len(scores) == 0:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"row": int(rows[i]), "id": str(self.ids[rows[i]]),
+                 "label": int(self.labels[rows[i]]), "similarity": float(scores[i])}
+                for i in top]
+
+    def save(self, path):
+        """Persist as an uncompressed .npz (fast to load, no pickling)"""
+        offsets = np.cumsum([0] + [len(rows) for rows in self.list_rows])
+        metadata = dict(self.metadata, dim=self.dim, dtype=self.dtype, n_probe=self.n_probe)
+        np.savez(
+            path,
+            vectors=np.concatenate(self.lists),
+            scales=np.concatenate(self.list_scales),
+            rows=np.concatenate(self.list_rows),
+            offsets=offsets,
+            centroids=self.centroids if self.centroids is not None else np.zeros((0, self.dim)),
+            labels=self.labels,
+            ids=self.ids,
+            metadata=np.array(json.dumps(metadata)),
+        )
+
+    @classmethod
+    def load(cls, path) -> "VectorIndex":
+        with np.load(Path(path), allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            index = cls(metadata.pop("dim"), metadata.pop("dtype"),
+                        metadata.pop("n_probe"), metadata)
+            offsets = data["offsets"]
+            vectors, scales, rows = data["vectors"], data["scales"], data["rows"]
+            index.lists = [vectors[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            index.list_scales = [scales[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            index.list_rows = [rows[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            index.centroids = data["centroids"].astype(np.float32) if len(data["centroids"]) else None
+            index.labels = data["labels"]
+            index.ids = data["ids"]
+        logger.info(f"Loaded vector index with {len(index)} vectors in {index.n_lists} lists")
+        return index
+
+    def ood_score(self, matches: List[Dict]) -> Dict:
+        """Out-of-distribution score from a query's nearest neighbours.
+
+        Mean top-k similarity is compared with the threshold calibrated on
+        held-out images when the index was built.
+        """
+        similarity = float(np.mean([m["similarity"] for m in matches])) if matches else 0.0
+        threshold = self.metadata.get("ood_threshold")
+        return {
+            "score": round(1 - similarity, 4),
+            "similarity": round(similarity, 4),
+            "threshold": threshold,
+            "is_out_of_distribution": threshold is not None and similarity < threshold,
+        }
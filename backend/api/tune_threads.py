@@ -0,0 +1,130 @@
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from services.runtime_config import (
+    effective_cpu_count, load_tuned_settings, save_tuned_settings)
+
+
+def load_benchmark_batch(image_dir, transform, max_images):
+    """Preprocess up to max_images benchmark images into one tensor"""
+    import torch
+
+    paths = sorted(p for p in Path(image_dir).rglob('*')
+                   if p.suffix.lower() in ['.jpg', '.jpeg', '.png'])[:max_images]
+    if not paths:
+        raise SystemExit(f"No benchmark images found under {image_dir}")
+    return torch.stack([transform(Image.open(p).convert('RGB')) for p in paths])
+
+
+def time_runs(run, images, batch_size, repeats):
+    """Median seconds per image for run(batch) over the benchmark set"""
+    batches = [images[i:i + batch_size]
+               for i in range(0, len(images), batch_size)]
+    run(batches[0])  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for batch in batches:
+            run(batch)
+        timings.append((time.perf_counter() - started) / len(images))
+    return statistics.median(timings)
+
+
+def sweep_pytorch(model, images, candidates, batch_size, repeats):
+    import torch
+
+    results = {}
+    for threads in candidates:
+        torch.set_num_threads(threads)
+
+        def run(batch):
+            with torch.no_grad():
+                model(batch)
+
+        results[threads] = time_runs(run, images, batch_size, repeats)
+        print(f"  pytorch     threads={threads:<3} {results[threads] * 1000:8.2f} ms/image")
+    return results
+
+
+def sweep_onnxruntime(onnx_path, images, candidates, batch_size, repeats):
+    import onnxruntime as ort
+    from services.runtime_config import onnx_session_options
+
+    results = {}
+    array = images.numpy()
+    for threads in candidates:
+        session = ort.InferenceSession(
+            str(onnx_path), sess_options=onnx_session_options(threads, 1),
+            providers=['CPUExecutionProvider'])
+        input_name = session.get_inputs()[0].name
+        results[threads] = time_runs(
+            lambda batch: session.run(None, {input_name: batch}),
+            array, batch_size, repeats)
+        print(f"  onnxruntime threads={threads:<3} {results[threads] * 1000:8.2f} ms/image")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sweep inference thread counts and persist the best setting per backend')
+    parser.add_argument('--crop', default='maize',
+                        choices=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--images', help='Benchmark image directory '
+                        '(default: raw test set of the crop)')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--max-images', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-threads', type=int,
+                        help='Largest thread count to try (default: visible CPUs)')
+    args = parser.parse_args()
+
+    os.environ['MODEL_DIR'] = str(Path(args.models_dir).resolve())
+    from services.model_service import ModelService
+
+    service = ModelService()
+    transform = service.build_image_transforms()[args.crop]
+    image_dir = args.images or f'../data/Combined/Raw/CCMT/{args.crop.capitalize()}'
+    images = load_benchmark_batch(image_dir, transform, args.max_images)
+
+    max_threads = args.max_threads or os.cpu_count() or 1
+    candidates = sorted({1, 2, effective_cpu_count(), max_threads} |
+                        set(range(1, max_threads + 1, max(1, max_threads // 8))))
+    candidates = [c for c in candidates if c <= max_threads]
+    print(f"Effective CPUs (cgroup quota): {effective_cpu_count()}, "
+          f"trying {candidates} on {len(images)} images")
+
+    settings = load_tuned_settings()
+
+    model = service.load_model(args.crop)
+    results = sweep_pytorch(model, images, candidates,
+                            args.batch_size, args.repeats)
+    best = min(results, key=results.get)
+    settings['pytorch'] = {"intra_op": best, "inter_op": 1}
+
+    onnx_path = Path(args.models_dir) / f'best_{args.crop}_model.onnx'
+    try:
+        import onnxruntime  # noqa: F401
+        has_onnxruntime = True
+    except ImportError:
+        has_onnxruntime = False
+
+    if has_onnxruntime and onnx_path.exists():
+        results = sweep_onnxruntime(onnx_path, images, candidates,
+                                    args.batch_size, args.repeats)
+        best = min(results, key=results.get)
+        settings['onnxruntime'] = {"intra_op": best, "inter_op": 1}
+    else:
+        print("Skipping onnxruntime sweep (onnxruntime or ONNX model not available)")
+
+    save_tuned_settings(settings)
+    print(f"Saved thread settings: {settings}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+
+import torch
+from PIL import Image
+
+from raw_data import CROPS, RawCropDataset, create_model_service
+
+
+def cpu_ms(run, payloads, repeats):
+    """Median server-side CPU time per request, in milliseconds"""
+    per_request = []
+    for _ in range(repeats):
+        started = time.process_time()
+        for payload in payloads:
+            run(payload)
+        per_request.append((time.process_time() - started) / len(payloads))
+    return statistics.median(per_request) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Server-side preprocessing CPU per request: encoded uploads vs rgb8 payloads')
+    parser.add_argument('--crop', default=CROPS[0], choices=CROPS)
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    from services.classification_service import ClassificationService
+    from services.upload_service import encode_rgb8
+
+    torch.set_num_threads(1)
+    service = create_model_service('.')
+    service.transforms = service.build_image_transforms()
+    classifier = ClassificationService(service)
+    size = service.input_size
+
+    dataset = RawCropDataset(args.data_dir, args.crop)
+    paths = [path for path, _ in dataset.samples[:args.images]]
+
+    originals, resized_jpegs, rgb8_payloads = [], [], []
+    max_diff = 0.0
+    for path in paths:
+        with open(path, 'rb') as f:
+            originals.append(f.read())
+        image = Image.open(path).convert('RGB')
+        buffer = io.BytesIO()
+        image.resize((size, size)).save(buffer, format='JPEG', quality=90)
+        resized_jpegs.append(buffer.getvalue())
+        rgb8_payloads.append(encode_rgb8(image, size))
+
+        # The rgb8 path must match the training transform on the same pixels
+        reference = classifier.transform_image(image.resize((size, size)), args.crop)
+        candidate = classifier.rgb8_to_tensor(bytearray(rgb8_payloads[-1][8:]), size)
+        max_diff = max(max_diff, (reference - candidate).abs().max().item())
+
+    def decode_path(payload):
+        classifier.transform_image(classifier.decode_image(payload), args.crop)
+
+    def rgb8_path(payload):
+        classifier.rgb8_to_tensor(bytearray(payload[8:]), size)
+
+    rows = [
+        ('original upload (decode + resize)', originals, decode_path),
+        (f'client-resized {size}px JPEG', resized_jpegs, decode_path),
+        (f'rgb8 {size}x{size} payload', rgb8_payloads, rgb8_path),
+    ]
+    lines = [f"PREPROCESSING BENCHMARK - {args.crop.upper()} ({len(paths)} images, 1 thread)",
+             "=" * 60]
+    baseline = None
+    for name, payloads, run in rows:
+        run(payloads[0])
+        elapsed = cpu_ms(run, payloads, args.repeats)
+        baseline = baseline or elapsed
+        payload_kb = statistics.mean(len(p) for p in payloads) / 1024
+        lines.append(f"{name:<36} {elapsed:7.2f} ms CPU/request "
+                     f"({baseline - elapsed:+.2f} ms saved), ~{payload_kb:.0f} KB upload")
+    lines.append(f"\nMax |rgb8 - transform| difference: {max_diff:.2e}")
+
+    report = "\n".join(lines)
+    print(report)
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+    with open(results_dir / 'preprocessing_benchmark.txt', 'w') as f:
+        f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
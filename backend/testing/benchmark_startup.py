@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / 'api'
+
+# Runs in a fresh interpreter so import costs (torch, timm) are measured cold
+CHILD_SCRIPT = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+from services.model_service import ModelService
+t1 = time.perf_counter()
+service = ModelService()
+asyncio.run(service.initialize_models())
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "load_s": t2 - t1,
+    "total_s": t2 - t0,
+    "timm_imported": "timm" in sys.modules,
+    "sources": service.model_sources,
+}))
+"""
+
+
+def run_once(model_format, models_dir):
+    """Start one cold process and return its timing record"""
+    env = dict(os.environ, MODEL_DIR=str(models_dir), MODEL_FORMAT=model_format)
+    completed = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT],
+        cwd=API_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare cold-start time of checkpoint vs TorchScript model loading')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    models_dir = Path(args.models_dir).resolve()
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+
+    lines = ["STARTUP BENCHMARK (cold process, all crops)", "=" * 60]
+    for model_format in ['pytorch', 'torchscript']:
+        runs = [run_once(model_format, models_dir) for _ in range(args.runs)]
+        lines.append(f"\n{model_format}:")
+        for key in ['import_s', 'load_s', 'total_s']:
+            values = [r[key] for r in runs]
+            lines.append(
+                f"  {key:<9} median {statistics.median(values):.3f}s "
+                f"(min {min(values):.3f}s, max {max(values):.3f}s)")
+        lines.append(f"  timm imported: {runs[-1]['timm_imported']}")
+        lines.append(f"  model sources: {runs[-1]['sources']}")
+
+    report = "\n".join(lines)
+    print(report)
+    with open(results_dir / 'startup_benchmark.txt', 'w') as f:
+        f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
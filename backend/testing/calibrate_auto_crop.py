@@ -0,0 +1,185 @@
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from sklearn.linear_model import LogisticRegression
+from torch.utils.data import ConcatDataset, DataLoader, Dataset
+
+from raw_data import BACKEND_DIR, CROPS, RawCropDataset, create_model_service
+
+
+class CropLabelled(Dataset):
+    """Wraps one crop's raw dataset, adding the crop index to every sample"""
+
+    def __init__(self, dataset, crop_idx):
+        self.dataset = dataset
+        self.crop_idx = crop_idx
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        image, label = self.dataset[idx]
+        return image, self.crop_idx, label
+
+
+def fit_temperature(logits, targets):
+    """Temperature minimising NLL of a crop model on its own crop's images"""
+    log_t = torch.zeros(1, requires_grad=True)
+    optimizer = torch.optim.LBFGS([log_t], lr=0.1, max_iter=100)
+
+    def closure():
+        optimizer.zero_grad()
+        loss = F.cross_entropy(logits / log_t.exp(), targets)
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+    return float(log_t.exp().item())
+
+
+def benchmark_cost(service, sample_paths, transform, repeats=3):
+    """Seconds per image: four independent predict-style calls vs one auto pass"""
+    def independent(path):
+        for crop_name in CROPS:
+            image = Image.open(path).convert('RGB')
+            service.forward(crop_name, transform(image).unsqueeze(0), record=False)
+
+    def auto(path):
+        image = Image.open(path).convert('RGB')
+        service.run_auto(transform(image).unsqueeze(0))
+
+    timings = {}
+    for name, run in [('independent', independent), ('auto', auto)]:
+        run(sample_paths[0])
+        runs = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for path in sample_paths:
+                run(path)
+            runs.append((time.perf_counter() - started) / len(sample_paths))
+        timings[name] = statistics.median(runs)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Fit the auto-crop scoring rule on the raw test sets of all crops')
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-per-class', type=int, default=100)
+    parser.add_argument('--benchmark-images', type=int, default=20)
+    parser.add_argument('--write-settings', action='store_true',
+                        help='Write the calibration to api/auto_crop_calibration.json')
+    args = parser.parse_args()
+
+    from services.crop_detection import CropDetector
+
+    service = create_model_service(args.models_dir)
+    transform = service.build_image_transforms()[CROPS[0]]
+    for crop_name in CROPS:
+        service.models[crop_name] = service.load_model(crop_name)
+    service.configure_auto_mode()
+    print(f"Auto mode: {service.auto_mode_summary()}")
+
+    datasets = [CropLabelled(RawCropDataset(args.data_dir, crop_name, transform=transform,
+                                            max_per_class=args.max_per_class), crop_idx)
+                for crop_idx, crop_name in enumerate(CROPS)]
+    loader = DataLoader(ConcatDataset(datasets), batch_size=args.batch_size,
+                        shuffle=False, num_workers=4)
+
+    logits = {crop_name: [] for crop_name in CROPS}
+    crop_targets, disease_targets = [], []
+    for data, crop_idx, label in loader:
+        for crop_name, output in service.run_auto(data).items():
+            logits[crop_name].append(output.float())
+        crop_targets.append(crop_idx)
+        disease_targets.append(label)
+    logits = {crop_name: torch.cat(values) for crop_name, values in logits.items()}
+    crop_targets = torch.cat(crop_targets)
+    disease_targets = torch.cat(disease_targets)
+
+    # 1. Per-crop temperatures, fitted on each model's own crop
+    temperatures = {}
+    for crop_idx, crop_name in enumerate(CROPS):
+        own = crop_targets == crop_idx
+        temperatures[crop_name] = fit_temperature(
+            logits[crop_name][own], disease_targets[own])
+
+    # 2. Crop-identification rule on (log max-prob, entropy) features
+    detector = CropDetector(CROPS)
+    scaled = {crop_name: F.softmax(logits[crop_name] / temperatures[crop_name], dim=1)
+              for crop_name in CROPS}
+    features = np.array([
+        detector.features({crop_name: scaled[crop_name][i].tolist() for crop_name in CROPS})
+        for i in range(len(crop_targets))
+    ])
+    y = crop_targets.numpy()
+
+    def calibration_for(classifier):
+        return {
+            "crops": CROPS,
+            "temperatures": temperatures,
+            "weights": classifier.coef_.tolist(),
+            "bias": classifier.intercept_.tolist(),
+        }
+
+    def detect(calibration, indices):
+        # Score through CropDetector so the serving code path is what gets measured
+        scorer = CropDetector(CROPS, calibration)
+        predicted = []
+        for i in indices:
+            scores = scorer.score({crop_name: scaled[crop_name][i].tolist() for crop_name in CROPS})
+            predicted.append(CROPS.index(max(scores, key=scores.get)))
+        return np.array(predicted)
+
+    # Held-out estimate on alternating samples, then refit on everything
+    holdout = LogisticRegression(max_iter=2000).fit(features[::2], y[::2])
+    holdout_idx = range(1, len(y), 2)
+    holdout_acc = (detect(calibration_for(holdout), holdout_idx) == y[1::2]).mean() * 100
+    calibration = calibration_for(LogisticRegression(max_iter=2000).fit(features, y))
+    predicted_crop = detect(calibration, range(len(y)))
+    disease_pred = np.array([
+        logits[CROPS[c]][i].argmax().item() for i, c in enumerate(predicted_crop)])
+    joint_acc = ((predicted_crop == y) & (disease_pred == disease_targets.numpy())).mean() * 100
+
+    sample_paths = [path for dataset in datasets
+                    for path, _ in dataset.dataset.samples[:max(1, args.benchmark_images // len(CROPS))]]
+    with torch.no_grad():
+        timings = benchmark_cost(service, sample_paths, transform)
+
+    lines = [
+        "AUTO-CROP CALIBRATION ON RAW DATA",
+        "=" * 60,
+        f"Images: {len(y)}, shared trunk stages: {service.shared_trunk_depth}",
+        "Temperatures: " + ", ".join(f"{c} {t:.3f}" for c, t in temperatures.items()),
+        f"Crop identification accuracy (held-out half): {holdout_acc:.2f}%",
+        f"Crop + disease accuracy (refit on all): {joint_acc:.2f}%",
+        f"Cost per image: 4 independent predicts {timings['independent'] * 1000:.1f} ms, "
+        f"auto {timings['auto'] * 1000:.1f} ms "
+        f"({timings['auto'] / timings['independent'] * 100:.0f}% of independent)",
+    ]
+    report = "\n".join(lines)
+    print(report)
+
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+    with open(results_dir / 'auto_crop_calibration.txt', 'w') as f:
+        f.write(report + "\n")
+
+    if args.write_settings:
+        settings_path = BACKEND_DIR / 'api' / 'auto_crop_calibration.json'
+        with open(settings_path, 'w') as f:
+            json.dump(calibration, f, indent=2)
+        print(f"\nWrote auto-crop calibration to {settings_path}")
+
+
+if __name__ == "__main__":
+    main()
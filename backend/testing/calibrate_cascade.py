@@ -0,0 +1,136 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+from raw_data import BACKEND_DIR, CROPS, RawCropDataset, create_model_service
+
+
+class PairTransform:
+    """Produce the screening and full-resolution tensors from one decode"""
+
+    def __init__(self, screen_transform, full_transform):
+        self.screen_transform = screen_transform
+        self.full_transform = full_transform
+
+    def __call__(self, image):
+        return self.screen_transform(image), self.full_transform(image)
+
+
+def collect_predictions(service, crop_name, data_dir, batch_size, max_per_class):
+    """Screening confidence/prediction and full prediction for every raw image"""
+    transform = PairTransform(
+        service.build_resized_transform(service.screen_size),
+        service.build_image_transforms()[crop_name])
+    dataset = RawCropDataset(data_dir, crop_name, transform=transform,
+                             max_per_class=max_per_class)
+    loader = DataLoader(dataset, batch_size=batch_size,
+                        shuffle=False, num_workers=4)
+
+    screen_conf, screen_pred, full_pred, targets = [], [], [], []
+    for (screen, full), target in loader:
+        screen_probs = F.softmax(service.forward(crop_name, screen), dim=1)
+        conf, pred = screen_probs.max(dim=1)
+        screen_conf.append(conf)
+        screen_pred.append(pred)
+        full_pred.append(service.forward(crop_name, full).argmax(dim=1))
+        targets.append(target)
+
+    return (torch.cat(screen_conf).numpy(), torch.cat(screen_pred).numpy(),
+            torch.cat(full_pred).numpy(), torch.cat(targets).numpy())
+
+
+def pick_threshold(screen_conf, screen_pred, full_pred, targets, tolerance, screen_cost):
+    """Lowest threshold whose cascade accuracy stays within tolerance of full-res.
+
+    Escalation matches serving (confidence <= threshold), so threshold 1.0
+    escalates every image and always reaches full-resolution accuracy; None
+    is only returned for a negative tolerance.
+    """
+    full_acc = (full_pred == targets).mean() * 100
+    best = None
+    for threshold in np.linspace(0.0, 1.0, 1001):
+        escalate = screen_conf <= threshold
+        cascade_pred = np.where(escalate, full_pred, screen_pred)
+        acc = (cascade_pred == targets).mean() * 100
+        if acc >= full_acc - tolerance:
+            escalation_rate = escalate.mean()
+            best = {
+                "threshold": round(float(threshold), 3),
+                "cascade_accuracy": acc,
+                "full_accuracy": full_acc,
+                "screen_accuracy": (screen_pred == targets).mean() * 100,
+                "escalation_rate": escalation_rate,
+                # Screening every image can cost more than it saves
+                "compute_saved": max(0.0, 1.0 - (screen_cost + escalation_rate)),
+            }
+            break
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Calibrate per-crop cascade thresholds on the raw test sets')
+    parser.add_argument('--crops', nargs='+', default=CROPS, choices=CROPS)
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--screen-size', type=int, default=160)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-per-class', type=int)
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Accuracy loss (percentage points) accepted vs full resolution')
+    parser.add_argument('--write-settings', action='store_true',
+                        help='Write thresholds to api/cascade_thresholds.json')
+    args = parser.parse_args()
+
+    service = create_model_service(
+        args.models_dir, CASCADE_SCREEN_SIZE=args.screen_size)
+    screen_cost = (service.screen_size / service.input_size) ** 2
+
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+
+    lines = [
+        f"CASCADE CALIBRATION (screen {args.screen_size}px -> full {service.input_size}px)",
+        "=" * 60,
+        f"Accepted accuracy loss: {args.tolerance:.2f} pp, screening cost {screen_cost:.2f}x",
+        "",
+    ]
+    thresholds = {}
+    for crop_name in args.crops:
+        service.models[crop_name] = service.load_model(crop_name)
+        with torch.no_grad():
+            predictions = collect_predictions(
+                service, crop_name, args.data_dir, args.batch_size, args.max_per_class)
+        best = pick_threshold(*predictions, args.tolerance, screen_cost)
+        del service.models[crop_name]
+        if best is None:
+            lines.append(f"{crop_name:<10} no threshold within {args.tolerance:.2f} pp; "
+                         f"not written")
+            continue
+        thresholds[crop_name] = best["threshold"]
+        lines.append(
+            f"{crop_name:<10} threshold {best['threshold']:.3f} | "
+            f"screen {best['screen_accuracy']:.2f}% full {best['full_accuracy']:.2f}% "
+            f"cascade {best['cascade_accuracy']:.2f}% | "
+            f"escalation {best['escalation_rate'] * 100:.1f}% | "
+            f"compute saved {best['compute_saved'] * 100:.1f}%")
+
+    report = "\n".join(lines)
+    print(report)
+    with open(results_dir / 'cascade_calibration.txt', 'w') as f:
+        f.write(report + "\n")
+
+    if args.write_settings:
+        settings_path = BACKEND_DIR / 'api' / 'cascade_thresholds.json'
+        with open(settings_path, 'w') as f:
+            json.dump(thresholds, f, indent=2)
+        print(f"\nWrote cascade thresholds to {settings_path}")
+
+
+if __name__ == "__main__":
+    main()
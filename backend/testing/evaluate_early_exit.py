@@ -0,0 +1,147 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from raw_data import CROPS, RawCropDataset, create_model_service
+
+
+class MacCounter:
+    """Counts multiply-accumulates of Conv2d/Linear layers via forward hooks"""
+
+    def __init__(self, module):
+        self.total = 0
+        self.handles = [m.register_forward_hook(self.hook) for m in module.modules()
+                        if isinstance(m, (nn.Conv2d, nn.Linear))]
+
+    def hook(self, module, inputs, output):
+        if isinstance(module, nn.Conv2d):
+            kernel = module.kernel_size[0] * module.kernel_size[1]
+            self.total += output.numel() * (module.in_channels // module.groups) * kernel
+        else:
+            self.total += output.numel() * module.in_features
+
+    def close(self):
+        for handle in self.handles:
+            handle.remove()
+
+
+def exit_costs(wrapper, input_size=240):
+    """MACs spent when a sample leaves at each exit, and for the plain model"""
+    backbone = wrapper.base.backbone
+    counter = MacCounter(wrapper)
+    head_cost = {}
+    trunk_after = {}
+    with torch.no_grad():
+        x = backbone.bn1(backbone.conv_stem(
+            torch.zeros(1, 3, input_size, input_size)))
+        for idx, block in enumerate(backbone.blocks):
+            x = block(x)
+            trunk_after[idx] = counter.total
+            if idx in wrapper.exit_blocks:
+                wrapper.heads[str(idx)](x)
+                head_cost[idx] = counter.total - trunk_after[idx]
+                counter.total = trunk_after[idx]
+        last = len(backbone.blocks) - 1
+        backbone.forward_head(backbone.bn2(backbone.conv_head(x)))
+        tail_cost = counter.total - trunk_after[last]
+    counter.close()
+
+    costs = {}
+    for idx in wrapper.exit_blocks:
+        costs[f"blocks.{idx}"] = trunk_after[idx] + \
+            sum(head_cost[j] for j in wrapper.exit_blocks if j <= idx)
+    costs["final"] = trunk_after[last] + sum(head_cost.values()) + tail_cost
+    baseline = trunk_after[last] + tail_cost
+    return costs, baseline
+
+
+def collect_outputs(service, crop_name, data_dir, batch_size, max_per_class):
+    """Softmax output of every exit head and the final classifier"""
+    wrapper = service.models[crop_name]
+    dataset = RawCropDataset(data_dir, crop_name,
+                             transform=service.build_image_transforms()[crop_name],
+                             max_per_class=max_per_class)
+    loader = DataLoader(dataset, batch_size=batch_size,
+                        shuffle=False, num_workers=4)
+    outputs = {}
+    targets = []
+    with torch.no_grad():
+        for data, target in loader:
+            for name, logits in wrapper.forward_all(data).items():
+                outputs.setdefault(name, []).append(logits.softmax(dim=1))
+            targets.append(target)
+    return ({name: torch.cat(probs).numpy() for name, probs in outputs.items()},
+            torch.cat(targets).numpy())
+
+
+def simulate(outputs, targets, exit_names, threshold):
+    """Apply the serving exit rule offline; returns predictions and exit points"""
+    exit_at = np.full(len(targets), "final", dtype=object)
+    predictions = outputs["final"].argmax(axis=1)
+    undecided = np.ones(len(targets), dtype=bool)
+    for name in exit_names:
+        confident = undecided & (outputs[name].max(axis=1) >= threshold)
+        predictions[confident] = outputs[name][confident].argmax(axis=1)
+        exit_at[confident] = name
+        undecided &= ~confident
+    return predictions, exit_at
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Exit-depth distribution, FLOPs saved and accuracy of early-exit serving')
+    parser.add_argument('--crops', nargs='+', default=CROPS, choices=CROPS)
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--thresholds', nargs='+', type=float,
+                        default=[0.8, 0.9, 0.95, 0.99])
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-per-class', type=int)
+    args = parser.parse_args()
+
+    service = create_model_service(
+        args.models_dir, EARLY_EXIT_MODE='true', MODEL_FORMAT='pytorch')
+
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+    lines = ["EARLY-EXIT EVALUATION ON RAW DATA", "=" * 60]
+
+    for crop_name in args.crops:
+        service.models[crop_name] = service.load_model(crop_name)
+        wrapper = service.models[crop_name]
+        if not hasattr(wrapper, 'forward_all'):
+            lines.append(f"\n{crop_name}: no early-exit heads found, skipped")
+            continue
+
+        costs, baseline = exit_costs(wrapper, service.input_size)
+        outputs, targets = collect_outputs(
+            service, crop_name, args.data_dir, args.batch_size, args.max_per_class)
+        exit_names = [f"blocks.{idx}" for idx in wrapper.exit_blocks]
+        full_acc = (outputs["final"].argmax(axis=1) == targets).mean() * 100
+
+        lines.append(f"\n{crop_name.upper()} (full-depth accuracy {full_acc:.2f}%, "
+                     f"{baseline / 1e6:.0f} MMACs per image)")
+        for threshold in args.thresholds:
+            predictions, exit_at = simulate(
+                outputs, targets, exit_names, threshold)
+            accuracy = (predictions == targets).mean() * 100
+            avg_cost = np.mean([costs[name] for name in exit_at])
+            distribution = ", ".join(
+                f"{name} {np.mean(exit_at == name) * 100:.1f}%" for name in exit_names + ["final"])
+            lines.append(
+                f"  threshold {threshold:.2f}: acc {accuracy:.2f}% ({accuracy - full_acc:+.2f} pp), "
+                f"FLOPs saved {(1 - avg_cost / baseline) * 100:.1f}% | exits: {distribution}")
+        del service.models[crop_name]
+
+    report = "\n".join(lines)
+    print(report)
+    with open(results_dir / 'early_exit_report.txt', 'w') as f:
+        f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import torch
+from torch.utils.data import DataLoader
+
+from raw_data import BACKEND_DIR, CROPS, RawCropDataset, create_model_service
+
+
+def evaluate(crop_name, precision, data_dir, models_dir, batch_size, max_per_class):
+    """Accuracy, latency and peak RSS of one crop at one precision.
+
+    Runs in its own process so peak memory is not polluted by other runs.
+    """
+    service = create_model_service(models_dir)
+    transform = service.build_image_transforms()[crop_name]
+    service.models[crop_name] = service.load_model(crop_name)
+    # Force the mode under test, even on CPUs without native bf16
+    service.crop_precision[crop_name] = precision
+
+    dataset = RawCropDataset(data_dir, crop_name, transform=transform,
+                             max_per_class=max_per_class)
+    loader = DataLoader(dataset, batch_size=batch_size,
+                        shuffle=False, num_workers=2)
+
+    correct = 0
+    total = 0
+    forward_s = 0.0
+    for batch_idx, (data, target) in enumerate(loader):
+        if batch_idx == 0:
+            service.forward(crop_name, data)  # warm-up, not timed
+        started = time.perf_counter()
+        output = service.forward(crop_name, data)
+        forward_s += time.perf_counter() - started
+        correct += (output.argmax(dim=1) == target).sum().item()
+        total += target.size(0)
+
+    return {
+        "accuracy": 100.0 * correct / max(total, 1),
+        "ms_per_image": 1000.0 * forward_s / max(total, 1),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "images": total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare fp32 and bf16 inference per crop on the raw test sets')
+    parser.add_argument('--crops', nargs='+', default=CROPS, choices=CROPS)
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-per-class', type=int,
+                        help='Limit images per class for a quicker check')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.5,
+                        help='Largest accuracy loss (percentage points) that still opts a crop into bf16')
+    parser.add_argument('--write-settings', action='store_true',
+                        help='Write opt-ins to api/precision_settings.json')
+    args = parser.parse_args()
+
+    from services.runtime_config import cpu_supports_bf16
+
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    settings = {}
+    for crop_name in args.crops:
+        results[crop_name] = {}
+        for precision in ['fp32', 'bf16']:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[crop_name][precision] = pool.submit(
+                    evaluate, crop_name, precision, args.data_dir, args.models_dir,
+                    args.batch_size, args.max_per_class).result()
+
+        fp32, bf16 = results[crop_name]['fp32'], results[crop_name]['bf16']
+        delta = bf16['accuracy'] - fp32['accuracy']
+        settings[crop_name] = 'bf16' if -delta <= args.max_accuracy_drop else 'fp32'
+        results[crop_name]['accuracy_delta'] = delta
+
+    lines = [
+        "REDUCED PRECISION (bf16) vs fp32 ON RAW DATA",
+        "=" * 60,
+        f"Native bf16 support on this CPU: {cpu_supports_bf16()}",
+        f"Max accepted accuracy drop: {args.max_accuracy_drop:.2f} pp",
+        "",
+        f"{'crop':<10}{'mode':<6}{'acc %':>8}{'ms/img':>10}{'peak MB':>10}",
+    ]
+    for crop_name in args.crops:
+        for precision in ['fp32', 'bf16']:
+            r = results[crop_name][precision]
+            lines.append(f"{crop_name:<10}{precision:<6}{r['accuracy']:>8.2f}"
+                         f"{r['ms_per_image']:>10.2f}{r['peak_rss_mb']:>10.0f}")
+        lines.append(f"{'':<10}delta {results[crop_name]['accuracy_delta']:+.2f} pp "
+                     f"-> serve as {settings[crop_name]}")
+
+    report = "\n".join(lines)
+    print(report)
+    with open(results_dir / 'precision_report.txt', 'w') as f:
+        f.write(report + "\n")
+
+    if args.write_settings:
+        settings_path = BACKEND_DIR / 'api' / 'precision_settings.json'
+        with open(settings_path, 'w') as f:
+            json.dump(settings, f, indent=2)
+        print(f"\nWrote per-crop precision settings to {settings_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader
+
+from raw_data import CROPS, RawCropDataset, create_model_service
+
+
+def batch1_latency_ms(service, crop_name, tier, runs=50):
+    """Median single-image forward latency, the serving configuration"""
+    example = torch.randn(1, 3, tier, tier)
+    for _ in range(5):
+        service.forward(crop_name, example, record=False, tier=tier)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        service.forward(crop_name, example, record=False, tier=tier)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def upload_kb(sample_paths, tier, quality=90):
+    """Mean JPEG size of images a client downscales to the tier before upload"""
+    sizes = []
+    for path in sample_paths:
+        buffer = io.BytesIO()
+        Image.open(path).convert('RGB').resize((tier, tier)).save(
+            buffer, format='JPEG', quality=quality)
+        sizes.append(buffer.tell())
+    return statistics.mean(sizes) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Accuracy versus CPU latency of each resolution tier on the raw test sets')
+    parser.add_argument('--crops', nargs='+', default=CROPS, choices=CROPS)
+    parser.add_argument('--tiers', nargs='+', type=int, default=[240, 192, 160])
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='../training/models')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-per-class', type=int,
+                        help='Limit images per class for a quicker check')
+    args = parser.parse_args()
+
+    service = create_model_service(args.models_dir, MODEL_FORMAT='pytorch')
+
+    results_dir = Path('test_results')
+    results_dir.mkdir(exist_ok=True)
+    lines = ["RESOLUTION TIERS ON RAW DATA", "=" * 60]
+
+    for crop_name in args.crops:
+        lines.append(f"\n{crop_name.upper()}")
+        baseline = None
+        for tier in args.tiers:
+            try:
+                model = service.load_model(crop_name, tier)
+            except Exception as e:
+                lines.append(f"  {tier}px: no model ({e})")
+                continue
+            if tier == service.input_size:
+                service.models[crop_name] = model
+            else:
+                service.tier_models.setdefault(crop_name, {})[tier] = model
+
+            dataset = RawCropDataset(args.data_dir, crop_name,
+                                     transform=service.build_resized_transform(tier),
+                                     max_per_class=args.max_per_class)
+            loader = DataLoader(dataset, batch_size=args.batch_size,
+                                shuffle=False, num_workers=4)
+            correct = 0
+            with torch.no_grad():
+                for data, target in loader:
+                    output = service.forward(crop_name, data, record=False, tier=tier)
+                    correct += (output.argmax(dim=1) == target).sum().item()
+            accuracy = 100.0 * correct / max(len(dataset), 1)
+            latency = batch1_latency_ms(service, crop_name, tier)
+            upload = upload_kb([path for path, _ in dataset.samples[:20]], tier)
+
+            if baseline is None:
+                baseline = (accuracy, latency)
+            lines.append(
+                f"  {tier}px: acc {accuracy:6.2f}% ({accuracy - baseline[0]:+.2f} pp), "
+                f"CPU {latency:6.1f} ms/img ({latency / baseline[1] * 100:.0f}%), "
+                f"upload ~{upload:.0f} KB")
+
+        service.models.pop(crop_name, None)
+        service.tier_models.pop(crop_name, None)
+
+    report = "\n".join(lines)
+    print(report)
+    with open(results_dir / 'resolution_tiers_report.txt', 'w') as f:
+        f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+from PIL import Image
+from torch.utils.data import Dataset
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Make the API services and training helpers importable from the evaluation scripts
+sys.path.insert(0, str(BACKEND_DIR / 'api'))
+sys.path.insert(0, str(BACKEND_DIR / 'training'))
+
+from manifest import load_samples  # noqa: E402
+
+CROPS = ['cashew', 'cassava', 'maize', 'tomato']
+
+
+class RawCropDataset(Dataset):
+    """Raw CCMT images of one crop, labelled with the training class order"""
+
+    def __init__(self, data_dir, crop_name, transform=None, max_per_class=None):
+        self.data_dir = Path(data_dir)
+        self.transform = transform
+
+        # Load tree.json to get class names
+        with open(self.data_dir / 'tree.json', 'r') as f:
+            tree_data = json.load(f)
+
+        # Get class names from augmented data (to maintain same order)
+        self.classes = tree_data['Combined']['Augmented'][crop_name.capitalize()]['train_set']
+        self.class_to_idx = {cls: idx for idx, cls in enumerate(self.classes)}
+
+        # Build file paths from the cached raw data manifest
+        raw_path = self.data_dir / 'Combined' / 'Raw' / 'CCMT' / crop_name.capitalize()
+        self.samples = load_samples(self.data_dir, raw_path, self.classes,
+                                    max_per_class=max_per_class)
+
+        print(f"Found {len(self.samples)} images in raw {crop_name} dataset")
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        img_path, label = self.samples[idx]
+        image = Image.open(img_path).convert('RGB')
+
+        if self.transform:
+            image = self.transform(image)
+
+        return image, label
+
+
+def create_model_service(models_dir, **env):
+    """ModelService reading models from a local directory instead of S3"""
+    os.environ['MODEL_DIR'] = str(Path(models_dir).resolve())
+    os.environ.update({key: str(value) for key, value in env.items()})
+    from services.model_service import ModelService
+
+    return ModelService()
@@ -1,4 +1,6 @@
 from training.train_cashew import EfficientNetClassifier, get_transforms
+from training.manifest import load_samples
+from training.precision import Precision
 import os
 import json
 import torch
@@ -7,7 +9,6 @@ from PIL import Image
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import numpy as np
 from pathlib import Path
-from torch.cuda.amp import autocast
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
@@ -29,17 +30,9 @@ class CashewRawDataset(Dataset):
         self.classes = tree_data['Combined']['Augmented']['Cashew']['train_set']
         self.class_to_idx = {cls: idx for idx, cls in enumerate(self.classes)}
 
-        # Build file paths from raw data
-        self.samples = []
+        # Build file paths from the cached raw data manifest
         raw_path = self.data_dir / 'Combined' / 'Raw' / 'CCMT' / 'Cashew'
-
-        for class_name in self.classes:
-            class_dir = raw_path / class_name
-            if class_dir.exists():
-                for img_path in class_dir.glob('*'):
-                    if img_path.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                        self.samples.append(
-                            (str(img_path), self.class_to_idx[class_name]))
+        self.samples = load_samples(self.data_dir, raw_path, self.classes)
 
         print(f"Found {len(self.samples)} images in raw cashew dataset")
 
@@ -68,6 +61,8 @@ class CashewRawDataset(Dataset):
 
 def test_on_raw_data(model, dataloader, device, class_names):
     """Test the model on raw data and return detailed results"""
+    # fp16 on CUDA, bf16 on CPUs with native support, fp32 otherwise
+    precision = Precision(device)
     model.eval()
     all_predictions = []
     all_targets = []
@@ -78,9 +73,9 @@ def test_on_raw_data(model, dataloader, device, class_names):
         for batch_idx, (data, target, paths) in enumerate(dataloader):
             data, target = data.to(device), target.to(device)
 
-            with autocast():
+            with precision.autocast():
                 output = model(data)
-                probs = torch.softmax(output, dim=1)
+                probs = torch.softmax(output.float(), dim=1)
 
             _, predicted = torch.max(output.data, 1)
 
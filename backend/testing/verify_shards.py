@@ -0,0 +1,95 @@
+import argparse
+import io
+import random
+import sys
+import tarfile
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from PIL import Image
+
+import raw_data  # noqa: F401  (puts training/ on sys.path)
+from shards import ShardedImageDataset, iter_shard, open_url, join_url, write_shards
+
+
+def build_tree(root, classes, per_class, seed):
+    """Tiny class-folder tree of small JPEG and PNG images"""
+    rng = random.Random(seed)
+    samples = []
+    for label, class_name in enumerate(classes):
+        class_dir = root / class_name
+        class_dir.mkdir(parents=True)
+        for idx in range(per_class):
+            ext = '.png' if idx % 3 == 0 else '.jpg'
+            color = tuple(rng.randrange(256) for _ in range(3))
+            path = class_dir / f'{class_name}_{idx}{ext}'
+            Image.new('RGB', (rng.randint(8, 32), rng.randint(8, 32)), color).save(path)
+            samples.append((str(path), label))
+    return samples
+
+
+def directory_store(samples):
+    """(bytes, label) multiset read straight from the local files"""
+    return Counter((Path(path).read_bytes(), label) for path, label in samples)
+
+
+def shard_store(url):
+    """(bytes, label) multiset read back through the shard reader"""
+    reader = ShardedImageDataset(url, shuffle=False)
+    return Counter(reader.samples()), reader
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Round-trip a tiny image tree through write_shards and the shard reader')
+    parser.add_argument('--classes', type=int, default=3)
+    parser.add_argument('--per-class', type=int, default=7)
+    parser.add_argument('--shard-size', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    classes = [f'class_{idx}' for idx in range(args.classes)]
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        samples = build_tree(Path(tmp) / 'tree', classes, args.per_class, args.seed)
+        expected = directory_store(samples)
+
+        # Plain directory path and file:// URL both stand in for the object store
+        for url in [str(Path(tmp) / 'shards'), (Path(tmp) / 'shards_url').as_uri()]:
+            index = write_shards(samples, classes, url, args.shard_size, seed=args.seed)
+            actual, reader = shard_store(url)
+
+            if actual != expected:
+                failures.append(f"{url}: read back {sum(actual.values())} samples, "
+                                f"{len(actual - expected)} not in the source tree")
+            if len(reader) != len(samples) or reader.classes != classes:
+                failures.append(f"{url}: index lists {len(reader)} samples / {reader.classes}")
+
+            # Shuffled iteration decodes the same number of samples
+            decoded = sum(1 for _ in ShardedImageDataset(url, shuffle=True, shuffle_buffer=5))
+            if decoded != len(samples):
+                failures.append(f"{url}: shuffled reader yielded {decoded} of {len(samples)}")
+            print(f"{url}: {len(index['shards'])} shards, {sum(actual.values())} samples read back")
+
+        # A stray member without an extension is skipped, not fatal
+        stray = Path(tmp) / 'stray.tar'
+        with open_url(join_url(str(Path(tmp) / 'shards'), 'shard-000000.tar')) as f:
+            stray.write_bytes(f.read())
+        with tarfile.open(stray, 'a') as tar:
+            info = tarfile.TarInfo('README')
+            info.size = 2
+            tar.addfile(info, io.BytesIO(b'hi'))
+        with open(stray, 'rb') as f:
+            read = sum(1 for _ in iter_shard(f))
+        if read != min(args.shard_size, len(samples)):
+            failures.append(f"stray member: read {read} samples from the first shard")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print('Shard round trip ok' if not failures else f'{len(failures)} shard check(s) failed')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
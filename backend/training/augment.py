@@ -0,0 +1,174 @@
+import argparse
+import math
+import time
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from torchvision import transforms
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class BatchAugment:
+    """Random augmentation of a whole normalized batch with a few tensor ops.
+
+    Runs after collation, on the training device. Colour jitter (brightness,
+    contrast, saturation) is applied per image in pixel space. Horizontal and
+    vertical flips, a random crop of `scale` of the image area and a
+    rotation of up to `rotation` degrees are folded into one affine matrix per
+    image, so the geometry costs a single grid_sample for the batch.
+    """
+
+    def __init__(self, hflip=0.5, vflip=0.0, scale=(0.7, 1.0), rotation=15.0,
+                 brightness=0.2, contrast=0.2, saturation=0.2,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.hflip = hflip
+        self.vflip = vflip
+        self.scale = tuple(scale)
+        self.rotation = rotation
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.mean = torch.tensor(mean).view(1, 3, 1, 1)
+        self.std = torch.tensor(std).view(1, 3, 1, 1)
+
+    @classmethod
+    def from_config(cls, options):
+        """BatchAugment from the `augmentation` section of training_config.yaml"""
+        options = {key: value for key, value in options.items() if key != 'enabled'}
+        return cls(**options)
+
+    def __repr__(self):
+        return (f"BatchAugment(hflip={self.hflip}, vflip={self.vflip}, scale={self.scale}, "
+                f"rotation={self.rotation}, brightness={self.brightness}, "
+                f"contrast={self.contrast}, saturation={self.saturation})")
+
+    def factors(self, amount, batch, device):
+        return 1 + (torch.rand(batch, 1, 1, 1, device=device) * 2 - 1) * amount
+
+    def jitter(self, images):
+        batch, device = images.shape[0], images.device
+        mean, std = self.mean.to(device), self.std.to(device)
+        pixels = images * std + mean
+        if self.brightness:
+            pixels = pixels * self.factors(self.brightness, batch, device)
+        if self.contrast or self.saturation:
+            gray = (0.299 * pixels[:, 0:1] + 0.587 * pixels[:, 1:2] + 0.114 * pixels[:, 2:3])
+            if self.contrast:
+                level = gray.mean(dim=(2, 3), keepdim=True)
+                pixels = torch.lerp(level, pixels, self.factors(self.contrast, batch, device))
+            if self.saturation:
+                pixels = torch.lerp(gray, pixels, self.factors(self.saturation, batch, device))
+        return (pixels.clamp_(0, 1) - mean) / std
+
+    def affine(self, batch, device):
+        """[batch, 2, 3] output->input sampling matrices in normalized coordinates"""
+        low, high = self.scale
+        side = torch.empty(batch, device=device).uniform_(low, high).sqrt()
+        angle = torch.empty(batch, device=device).uniform_(-1, 1) * math.radians(self.rotation)
+        cos, sin = torch.cos(angle) * side, torch.sin(angle) * side
+        flip_x = 1 - 2 * (torch.rand(batch, device=device) < self.hflip).float()
+        flip_y = 1 - 2 * (torch.rand(batch, device=device) < self.vflip).float()
+        # Crop window centre, kept inside the image
+        shift = (torch.rand(batch, 2, device=device) * 2 - 1) * (1 - side).unsqueeze(1)
+
+        theta = torch.empty(batch, 2, 3, device=device)
+        theta[:, 0, 0] = cos * flip_x
+        theta[:, 0, 1] = -sin * flip_y
+        theta[:, 1, 0] = sin * flip_x
+        theta[:, 1, 1] = cos * flip_y
+        theta[:, :, 2] = shift
+        return theta
+
+    @torch.no_grad()
+    def __call__(self, images):
+        images = self.jitter(images.float())
+        theta = self.affine(images.shape[0], images.device)
+        grid = F.affine_grid(theta, list(images.shape), align_corners=False)
+        return F.grid_sample(images, grid, mode='bilinear', padding_mode='reflection',
+                             align_corners=False)
+
+
+def pil_augment_transform(input_size=240):
+    """Per-sample PIL augmentation equivalent to BatchAugment's defaults"""
+    return transforms.Compose([
+        transforms.Resize((input_size, input_size)),
+        transforms.RandomResizedCrop(input_size, scale=(0.7, 1.0), ratio=(1.0, 1.0)),
+        transforms.RandomHorizontalFlip(),
+        transforms.RandomRotation(15),
+        transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=list(IMAGENET_MEAN), std=list(IMAGENET_STD))
+    ])
+
+
+def images_per_second(loader, device, augment=None, max_batches=50):
+    images = 0
+    started = None
+    for batch_idx, (data, _) in enumerate(loader):
+        data = data.to(device)
+        if augment is not None:
+            data = augment(data)
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+        if batch_idx == 0:
+            # Exclude worker start-up from the measurement
+            started = time.perf_counter()
+            continue
+        images += len(data)
+        if batch_idx >= max_batches:
+            break
+    return images / (time.perf_counter() - started)
+
+
+def augment_only_per_second(augment, batch_size, input_size, device, batches=50):
+    data = torch.randn(batch_size, 3, input_size, input_size, device=device)
+    augment(data)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    started = time.perf_counter()
+    for _ in range(batches):
+        augment(data)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    return batch_size * batches / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare per-sample PIL augmentation with batched tensor augmentation')
+    parser.add_argument('--crop', default='maize', choices=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--input-size', type=int, default=240)
+    parser.add_argument('--batch-size', type=int, default=48)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-batches', type=int, default=50)
+    args = parser.parse_args()
+
+    from train import CropDataset, get_transforms
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    _, plain_transform = get_transforms(args.input_size)
+    augment = BatchAugment()
+
+    def loader(transform):
+        dataset = CropDataset(args.data_dir, args.crop, split='train_set', transform=transform)
+        return DataLoader(dataset, batch_size=args.batch_size, shuffle=True,
+                          num_workers=args.workers, pin_memory=device.type == 'cuda')
+
+    pil = images_per_second(
+        loader(pil_augment_transform(args.input_size)), device, max_batches=args.max_batches)
+    batched = images_per_second(
+        loader(plain_transform), device, augment, max_batches=args.max_batches)
+    engine = augment_only_per_second(augment, args.batch_size, args.input_size, device)
+
+    print(f"{args.crop} train_set, {args.workers} loader workers, batch {args.batch_size}, {device}:")
+    print(f"  per-sample PIL augmentation:      {pil:8.0f} images/s")
+    print(f"  decode + batched augmentation:    {batched:8.0f} images/s ({batched / pil:.1f}x)")
+    print(f"  batched augmentation alone:       {engine:8.0f} images/s")
+
+
+if __name__ == "__main__":
+    main()
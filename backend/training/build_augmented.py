@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageEnhance, ImageOps
+
+from manifest import scan_class_dir
+
+SPLITS = ['train_set', 'test_set']
+BUILD_INFO = 'build.json'
+
+
+def stable_fraction(key):
+    """Deterministic value in [0, 1) for a string, independent of PYTHONHASHSEED"""
+    return int(hashlib.sha1(key.encode()).hexdigest()[:12], 16) / 16 ** 12
+
+
+def split_for(relative, seed, test_fraction):
+    """Split of one raw image, fixed by its path so adding images never moves others"""
+    return 'test_set' if stable_fraction(f'{seed}:{relative}') < test_fraction else 'train_set'
+
+
+def augment_image(image, rng):
+    """One random variant: flip, rotation, crop and colour jitter"""
+    if rng.random() < 0.5:
+        image = ImageOps.mirror(image)
+    image = image.rotate(rng.uniform(-20, 20), resample=Image.BILINEAR)
+
+    width, height = image.size
+    side = rng.uniform(0.75, 1.0) ** 0.5
+    crop_w, crop_h = int(width * side), int(height * side)
+    left = rng.randint(0, width - crop_w)
+    top = rng.randint(0, height - crop_h)
+    image = image.crop((left, top, left + crop_w, top + crop_h)).resize((width, height), Image.BILINEAR)
+
+    for enhance in (ImageEnhance.Brightness, ImageEnhance.Contrast, ImageEnhance.Color):
+        image = enhance(image).enhance(rng.uniform(0.8, 1.2))
+    return image
+
+
+def save_atomic(image, path, quality):
+    # Write under a temporary name so an interrupted run never leaves a
+    # truncated file that a resumed run would take as done
+    tmp = path.with_name(f'.{path.name}.tmp')
+    image.save(tmp, 'JPEG', quality=quality)
+    os.replace(tmp, path)
+
+
+def output_paths(target_dir, stem, variants):
+    return [target_dir / f'{stem}.jpg'] + [target_dir / f'{stem}_aug{k}.jpg'
+                                           for k in range(1, variants + 1)]
+
+
+def build_one(task):
+    """Write the copy and augmented variants of one raw image (runs in a worker process)"""
+    source, outputs, seed, size, quality = task
+    try:
+        image = Image.open(source).convert('RGB')
+        if size:
+            image = image.resize((size, size), Image.BILINEAR)
+        for index, path in enumerate(outputs):
+            if path.exists():
+                continue
+            if index == 0:
+                save_atomic(image, path, quality)
+            else:
+                rng = random.Random(f'{seed}:{source}:{index}')
+                save_atomic(augment_image(image, rng), path, quality)
+        return None
+    except Exception as e:
+        return f'{source}: {e}'
+
+
+def check_build_info(crop_dir, settings):
+    """Refuse to mix outputs of different split/variant settings in one tree"""
+    info_path = crop_dir / BUILD_INFO
+    if info_path.exists():
+        with open(info_path, 'r') as f:
+            previous = json.load(f)
+        if previous != settings:
+            raise ValueError(f"{crop_dir} was built with {previous}, not {settings}; "
+                             f"delete it or keep the original settings")
+    crop_dir.mkdir(parents=True, exist_ok=True)
+    with open(info_path, 'w') as f:
+        json.dump(settings, f, indent=2)
+
+
+def build_crop(data_dir, folder, test_fraction, variants, seed, size, quality, workers):
+    """Split and augment Combined/Raw/CCMT/{folder} into Combined/Augmented/{folder}.
+
+    Returns the class list. Images whose outputs already exist are skipped,
+    so an interrupted build resumes where it stopped.
+    """
+    raw_dir = data_dir / 'Combined' / 'Raw' / 'CCMT' / folder
+    crop_dir = data_dir / 'Combined' / 'Augmented' / folder
+    check_build_info(crop_dir, {'test_fraction': test_fraction, 'variants': variants,
+                                'seed': seed, 'size': size})
+    classes = sorted(entry.name for entry in os.scandir(raw_dir) if entry.is_dir())
+
+    tasks = []
+    counts = {split: 0 for split in SPLITS}
+    for class_name in classes:
+        for split in SPLITS:
+            (crop_dir / split / class_name).mkdir(parents=True, exist_ok=True)
+        for name, _, _ in scan_class_dir(raw_dir / class_name):
+            split = split_for(f'{folder}/{class_name}/{name}', seed, test_fraction)
+            # Only training images get augmented variants
+            outputs = output_paths(crop_dir / split / class_name, Path(name).stem,
+                                   variants if split == 'train_set' else 0)
+            counts[split] += 1
+            if not all(path.exists() for path in outputs):
+                tasks.append((str(raw_dir / class_name / name), outputs, seed, size, quality))
+
+    print(f"{folder}: {counts['train_set']} train / {counts['test_set']} test raw images, "
+          f"{len(tasks)} still to build")
+    started = time.perf_counter()
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, error in enumerate(pool.map(build_one, tasks, chunksize=16), 1):
+            if error:
+                errors.append(error)
+            if done % 1000 == 0:
+                print(f"  {done}/{len(tasks)} images ({done / (time.perf_counter() - started):.0f}/s)")
+
+    for error in errors:
+        print(f"Warning: Skipping unreadable image {error}")
+    print(f"{folder}: built {len(tasks) - len(errors)} images in {time.perf_counter() - started:.0f}s")
+    return classes
+
+
+def update_tree(data_dir, built):
+    """Rewrite tree.json's entries for the crops that were built"""
+    tree_path = data_dir / 'tree.json'
+    tree_data = {}
+    if tree_path.exists():
+        with open(tree_path, 'r') as f:
+            tree_data = json.load(f)
+    combined = tree_data.setdefault('Combined', {})
+    for folder, classes in built.items():
+        combined.setdefault('Augmented', {})[folder] = {split: classes for split in sorted(SPLITS)}
+        combined.setdefault('Raw', {}).setdefault('CCMT', {})[folder] = classes
+    with open(tree_path, 'w') as f:
+        json.dump(tree_data, f, indent=2)
+    print(f"Updated {tree_path} for {', '.join(built)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build Combined/Augmented train/test splits from Combined/Raw/CCMT')
+    parser.add_argument('--crops', nargs='+', default=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--variants', type=int, default=3,
+                        help='Augmented copies written per training image')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--size', type=int, default=None,
+                        help='Resize outputs to size x size (default: keep raw resolution)')
+    parser.add_argument('--quality', type=int, default=90, help='JPEG quality')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    built = {}
+    for crop_name in args.crops:
+        folder = crop_name.capitalize()
+        built[folder] = build_crop(data_dir, folder, args.test_fraction, args.variants,
+                                   args.seed, args.size, args.quality, args.workers)
+    update_tree(data_dir, built)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from export_serving_models import CROPS, load_checkpoint_model, load_class_names, upload_to_s3
+from train import CropDataset, get_transforms
+
+# Share the index implementation with the API so it loads exactly as built
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.vector_index import VectorIndex, VECTOR_INDEX_SUFFIX  # noqa: E402
+
+
+def embed_dataset(model, dataset, data_dir, batch_size, device):
+    """Yield (embeddings, labels, ids) batches; ids are paths relative to data_dir"""
+    samples = dataset.dataset.samples if isinstance(dataset, Subset) else dataset.samples
+    indices = dataset.indices if isinstance(dataset, Subset) else range(len(samples))
+    paths = [str(Path(samples[i][0]).relative_to(data_dir)) for i in indices]
+
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=4)
+    offset = 0
+    with torch.no_grad():
+        for data, target in loader:
+            embeddings = model.embed(data.to(device)).float().cpu().numpy()
+            yield embeddings, target.numpy(), paths[offset:offset + len(target)]
+            offset += len(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build per-crop similar-case vector indexes from training-set embeddings')
+    parser.add_argument('--crops', nargs='+', default=CROPS, choices=CROPS)
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--variant', default='b1', choices=['b1', 'student'])
+    parser.add_argument('--dtype', default='float16', choices=['float16', 'int8'])
+    parser.add_argument('--n-lists', type=int,
+                        help='IVF lists (default: about sqrt(N) for large indexes, else flat)')
+    parser.add_argument('--n-probe', type=int, default=4)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--ood-percentile', type=float, default=5.0,
+                        help='Held-out similarity percentile used as the OOD threshold')
+    parser.add_argument('--max-queries', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--upload', action='store_true')
+    parser.add_argument('--bucket', default='ghana-ai-hackathon')
+    parser.add_argument('--prefix', default='models/')
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    data_dir = Path(args.data_dir)
+    models_dir = Path(args.models_dir)
+    _, val_transform = get_transforms()
+
+    for crop_name in args.crops:
+        stem = crop_name if args.variant == 'b1' else f'{crop_name}_{args.variant}'
+        checkpoint_path = models_dir / f'best_{stem}_model.pth'
+        if not checkpoint_path.exists():
+            print(f"Skipping {crop_name}: {checkpoint_path} not found")
+            continue
+
+        class_names = load_class_names(data_dir, crop_name)
+        model = load_checkpoint_model(
+            checkpoint_path, len(class_names), args.variant).to(device)
+
+        # 1. Index every training image, added batch by batch
+        started = time.perf_counter()
+        train_dataset = CropDataset(data_dir, crop_name, split='train_set', transform=val_transform)
+        index = None
+        for embeddings, labels, ids in embed_dataset(
+                model, train_dataset, data_dir, args.batch_size, device):
+            if index is None:
+                index = VectorIndex(embeddings.shape[1], args.dtype, args.n_probe)
+            index.add(embeddings, labels, ids)
+
+        n_lists = args.n_lists
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(index))) if len(index) >= 5000 else 1
+        if n_lists > 1:
+            index.train_ivf(n_lists)
+        build_s = time.perf_counter() - started
+
+        # 2. Held-out queries: OOD threshold, latency and IVF recall vs exact
+        test_dataset = CropDataset(data_dir, crop_name, split='test_set', transform=val_transform)
+        step = max(1, len(test_dataset) // args.max_queries)
+        queries = Subset(test_dataset, list(range(0, len(test_dataset), step)))
+        similarities, latencies, recalls = [], [], []
+        for embeddings, _, _ in embed_dataset(model, queries, data_dir, args.batch_size, device):
+            for embedding in embeddings:
+                t0 = time.perf_counter()
+                matches = index.search(embedding, args.k)
+                latencies.append(time.perf_counter() - t0)
+                similarities.append(np.mean([m["similarity"] for m in matches]))
+                if index.n_lists > 1:
+                    n_probe, index.n_probe = index.n_probe, index.n_lists
+                    exact = {m["row"] for m in index.search(embedding, args.k)}
+                    index.n_probe = n_probe
+                    recalls.append(len(exact & {m["row"] for m in matches}) / len(exact))
+
+        ood_threshold = float(np.percentile(similarities, args.ood_percentile))
+        index.metadata.update({
+            "crop": crop_name,
+            "class_names": class_names,
+            "model_variant": args.variant,
+            "k": args.k,
+            "ood_threshold": round(ood_threshold, 4),
+            "ood_percentile": args.ood_percentile,
+        })
+
+        index_path = models_dir / f'best_{stem}_model{VECTOR_INDEX_SUFFIX}'
+        index.save(index_path)
+
+        lines = [
+            f"VECTOR INDEX - {crop_name.upper()}",
+            "=" * 60,
+            f"Vectors: {len(index)} x {index.dim} ({args.dtype}), lists: {index.n_lists}, "
+            f"probe: {index.n_probe}, file {index_path.stat().st_size / 1e6:.1f} MB, "
+            f"built in {build_s:.1f}s",
+            f"Query latency (top-{args.k}, {len(latencies)} held-out queries): "
+            f"median {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p95 {np.percentile(latencies, 95) * 1000:.2f} ms",
+            f"OOD threshold (p{args.ood_percentile:g} of held-out mean top-{args.k} similarity): "
+            f"{ood_threshold:.4f}",
+        ]
+        if recalls:
+            lines.append(f"IVF recall@{args.k} vs exact search: {np.mean(recalls) * 100:.1f}%")
+        report = "\n".join(lines)
+        print(report)
+        with open(models_dir / f'{crop_name}_vector_index_report.txt', 'w') as f:
+            f.write(report + "\n")
+
+        if args.upload:
+            upload_to_s3(index_path, args.bucket, f'{args.prefix}{index_path.name}')
+
+
+if __name__ == "__main__":
+    main()
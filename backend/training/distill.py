@@ -0,0 +1,234 @@
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.utils.data import DataLoader
+import wandb
+
+from train import CropDataset, get_transforms, save_model_as_onnx
+from precision import Precision
+
+# Share architectures with the API so the student is served exactly as trained
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.architectures import (  # noqa: E402
+    EfficientNetClassifier, StudentClassifier, STUDENT_MODEL_NAME)
+
+
+def distillation_loss(student_logits, teacher_logits, target, temperature, alpha):
+    """Hinton-style KD: softened KL to the teacher plus hard-label cross entropy"""
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction='batchmean') * (temperature ** 2)
+    hard = F.cross_entropy(student_logits, target)
+    return alpha * soft + (1 - alpha) * hard
+
+
+def distill_epoch(student, teacher, dataloader, optimizer, precision, temperature, alpha):
+    student.train()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+
+    for batch_idx, (data, target) in enumerate(dataloader):
+        data, target = precision.to_device(data), target.to(precision.device)
+
+        optimizer.zero_grad()
+
+        with precision.autocast():
+            with torch.no_grad():
+                teacher_logits = teacher(data)
+            output = student(data)
+            loss = distillation_loss(
+                output.float(), teacher_logits.float(), target, temperature, alpha)
+
+        precision.backward_step(loss, optimizer)
+
+        running_loss += loss.item()
+        _, predicted = torch.max(output.data, 1)
+        total += target.size(0)
+        correct += (predicted == target).sum().item()
+
+        if batch_idx % 100 == 0:
+            print(
+                f'Batch {batch_idx}/{len(dataloader)}, Loss: {loss.item():.4f}')
+
+    return running_loss / len(dataloader), 100. * correct / total
+
+
+def evaluate(model, dataloader, precision):
+    model.eval()
+    correct = 0
+    total = 0
+    with torch.no_grad():
+        for data, target in dataloader:
+            data, target = precision.to_device(data), target.to(precision.device)
+            with precision.autocast():
+                output = model(data)
+            correct += (output.argmax(dim=1) == target).sum().item()
+            total += target.size(0)
+    return 100. * correct / total
+
+
+def cpu_latency_ms(model, input_size=240, runs=50):
+    """Median batch-1 CPU latency, the serving tier's configuration"""
+    model = model.to('cpu').eval()
+    example = torch.randn(1, 3, input_size, input_size)
+    with torch.no_grad():
+        for _ in range(5):
+            model(example)
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            model(example)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Distill a trained EfficientNet-B1 crop model into a CPU-friendly student')
+    parser.add_argument('--crop', required=True,
+                        choices=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--student', default=STUDENT_MODEL_NAME,
+                        help='timm model name of the student')
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=48)
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.7,
+                        help='Weight of the distillation term vs hard labels')
+    parser.add_argument('--patience', type=int, default=10)
+    args = parser.parse_args()
+
+    config = {
+        'teacher_model_name': 'efficientnet_b1',
+        'student_model_name': args.student,
+        'batch_size': args.batch_size,
+        'num_epochs': args.epochs,
+        'learning_rate': args.learning_rate,
+        'weight_decay': 1e-5,
+        'temperature': args.temperature,
+        'alpha': args.alpha,
+        'patience': args.patience,
+        'crop_name': args.crop
+    }
+
+    wandb.init(
+        project="crop-classifier",
+        name=f"{config['crop_name']}_distill_{config['student_model_name']}",
+        config=config
+    )
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    precision = Precision(device)
+    print(f"Using device: {device} ({precision})")
+
+    data_dir = Path('../data')
+    models_dir = Path('models')
+    models_dir.mkdir(exist_ok=True)
+
+    train_transform, val_transform = get_transforms()
+    train_dataset = CropDataset(
+        data_dir, config['crop_name'], split='train_set', transform=train_transform)
+    val_dataset = CropDataset(
+        data_dir, config['crop_name'], split='test_set', transform=val_transform)
+    num_classes = len(train_dataset.classes)
+
+    train_loader = DataLoader(train_dataset, batch_size=config['batch_size'],
+                              shuffle=True, num_workers=4, pin_memory=True)
+    val_loader = DataLoader(val_dataset, batch_size=config['batch_size'],
+                            shuffle=False, num_workers=4, pin_memory=True)
+
+    # Teacher: the trained best_{crop}_model.pth, frozen
+    teacher_path = models_dir / f'best_{config["crop_name"]}_model.pth'
+    teacher = EfficientNetClassifier(num_classes=num_classes)
+    teacher.load_state_dict(torch.load(teacher_path, map_location='cpu'))
+    teacher = teacher.to(device).eval()
+    for param in teacher.parameters():
+        param.requires_grad = False
+
+    student = StudentClassifier(
+        num_classes=num_classes, model_name=config['student_model_name'], pretrained=True).to(device)
+
+    optimizer = optim.AdamW(student.parameters(), lr=config['learning_rate'],
+                            weight_decay=config['weight_decay'])
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(
+        optimizer, T_max=config['num_epochs'])
+
+    student_path = models_dir / f'best_{config["crop_name"]}_student_model.pth'
+    best_val_acc = 0.0
+    patience_counter = 0
+
+    for epoch in range(config['num_epochs']):
+        print(f"\nEpoch {epoch+1}/{config['num_epochs']}")
+        print("-" * 50)
+
+        train_loss, train_acc = distill_epoch(
+            student, teacher, train_loader, optimizer, precision,
+            config['temperature'], config['alpha'])
+        val_acc = evaluate(student, val_loader, precision)
+        scheduler.step()
+
+        wandb.log({
+            'epoch': epoch + 1,
+            'train_loss': train_loss,
+            'train_accuracy': train_acc,
+            'val_accuracy': val_acc,
+            'learning_rate': optimizer.param_groups[0]['lr']
+        })
+        print(f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%")
+        print(f"Val Acc: {val_acc:.2f}%")
+
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            patience_counter = 0
+            # Record the timm name so serving and export rebuild the same student
+            torch.save({'model_state_dict': student.state_dict(),
+                        'model_name': config['student_model_name']}, student_path)
+            save_model_as_onnx(student, models_dir /
+                               f'best_{config["crop_name"]}_student_model.onnx', device)
+        else:
+            patience_counter += 1
+
+        if patience_counter >= config['patience']:
+            print(
+                f"Early stopping triggered after {config['patience']} epochs without improvement")
+            break
+
+    # Size / latency / accuracy comparison of teacher and best student
+    student.load_state_dict(torch.load(student_path, map_location='cpu')['model_state_dict'])
+    student = student.to(device)
+    rows = []
+    for name, model, path in [('teacher (efficientnet_b1)', teacher, teacher_path),
+                              (f'student ({config["student_model_name"]})', student, student_path)]:
+        rows.append({
+            'model': name,
+            'params_m': sum(p.numel() for p in model.parameters()) / 1e6,
+            'size_mb': path.stat().st_size / 1e6,
+            'val_accuracy': evaluate(model, val_loader, precision),
+            'cpu_latency_ms': cpu_latency_ms(model),
+        })
+        model.to(device)
+
+    lines = [f"DISTILLATION REPORT - {config['crop_name'].upper()}", "=" * 60]
+    for row in rows:
+        lines.append(
+            f"{row['model']:<40} {row['params_m']:6.2f}M params  {row['size_mb']:7.1f} MB  "
+            f"acc {row['val_accuracy']:6.2f}%  CPU {row['cpu_latency_ms']:7.1f} ms/img")
+    report = "\n".join(lines)
+    print(report)
+    with open(models_dir / f'{config["crop_name"]}_distillation_report.txt', 'w') as f:
+        f.write(report + "\n")
+
+    wandb.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+# Share the exit-head architecture with the API so heads load as trained
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.architectures import EarlyExitClassifier, EXIT_BLOCKS  # noqa: E402
+
+
+def evaluate_exit_heads(wrapper, dataloader, device):
+    """Validation accuracy of every exit head"""
+    wrapper.eval()
+    correct = {idx: 0 for idx in wrapper.exit_blocks}
+    total = 0
+    with torch.no_grad():
+        for data, target in dataloader:
+            data, target = data.to(device), target.to(device)
+            features = wrapper.exit_features(data)
+            for idx, feature in features.items():
+                output = wrapper.heads[str(idx)](feature)
+                correct[idx] += (output.argmax(dim=1) == target).sum().item()
+            total += target.size(0)
+    return {idx: 100. * count / total for idx, count in correct.items()}
+
+
+def train_exit_heads(model, train_loader, val_loader, device, num_classes, save_path,
+                     exit_blocks=EXIT_BLOCKS, num_epochs=5, learning_rate=1e-3):
+    """Train auxiliary exit heads on a trained model whose weights stay frozen.
+
+    Saves {'exit_blocks', 'heads'} for the best mean head accuracy to save_path.
+    """
+    wrapper = EarlyExitClassifier(model, num_classes, exit_blocks).to(device)
+    for param in wrapper.base.parameters():
+        param.requires_grad = False
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.AdamW(wrapper.heads.parameters(), lr=learning_rate)
+    best_mean_acc = 0.0
+
+    for epoch in range(num_epochs):
+        # Backbone stays in eval mode so its BatchNorm statistics don't move
+        wrapper.base.eval()
+        wrapper.heads.train()
+        running_loss = 0.0
+
+        for data, target in train_loader:
+            data, target = data.to(device), target.to(device)
+            with torch.no_grad():
+                features = wrapper.exit_features(data)
+
+            optimizer.zero_grad()
+            loss = sum(criterion(wrapper.heads[str(idx)](feature), target)
+                       for idx, feature in features.items())
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item()
+
+        head_acc = evaluate_exit_heads(wrapper, val_loader, device)
+        mean_acc = sum(head_acc.values()) / len(head_acc)
+        print(f"Exit heads epoch {epoch+1}/{num_epochs}, "
+              f"Loss: {running_loss / len(train_loader):.4f}, "
+              + ", ".join(f"blocks.{idx}: {acc:.2f}%" for idx, acc in head_acc.items()))
+
+        if mean_acc > best_mean_acc:
+            best_mean_acc = mean_acc
+            torch.save({
+                'exit_blocks': list(wrapper.exit_blocks),
+                'heads': wrapper.heads.state_dict()
+            }, save_path)
+
+    print(f"Early-exit heads saved to {save_path}")
+    return wrapper
@@ -0,0 +1,189 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+# Reuse the exact serving architecture so the traced graph matches the API
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.architectures import (  # noqa: E402
+    EfficientNetClassifier, StudentClassifier, STUDENT_MODEL_NAME, checkpoint_model_name,
+    SHARED_TRUNK_NAME, TAIL_ARTIFACT_SUFFIX, TRUNK_ARTIFACT_SUFFIX, TailModule, TrunkModule,
+    shared_trunk_depth)
+from services.model_service import SERVING_ARTIFACT_SUFFIX  # noqa: E402
+
+CROPS = ['cashew', 'cassava', 'maize', 'tomato']
+
+
+def load_class_names(data_dir, crop_name):
+    """Read class names for a crop from tree.json (same order as training)"""
+    with open(Path(data_dir) / 'tree.json', 'r') as f:
+        tree_data = json.load(f)
+    return tree_data['Combined']['Augmented'][crop_name.capitalize()]['train_set']
+
+
+def load_checkpoint_model(checkpoint_path, num_classes, variant='b1'):
+    """Rebuild the serving architecture and load a best_{crop}[_variant]_model.pth"""
+    checkpoint = torch.load(checkpoint_path, map_location='cpu')
+    if variant == 'student':
+        model = StudentClassifier(
+            num_classes=num_classes,
+            model_name=checkpoint_model_name(checkpoint, STUDENT_MODEL_NAME))
+    else:
+        model = EfficientNetClassifier(
+            num_classes=num_classes, model_name='efficientnet_b1')
+
+    if 'model_state_dict' in checkpoint:
+        model.load_state_dict(checkpoint['model_state_dict'])
+    elif 'state_dict' in checkpoint:
+        model.load_state_dict(checkpoint['state_dict'])
+    else:
+        model.load_state_dict(checkpoint)
+
+    model.eval()
+    return model
+
+
+def build_serving_artifact(model, input_size=240):
+    """Trace and freeze a model into a self-contained TorchScript module.
+
+    torch.jit.freeze inlines parameters as constants and folds BatchNorm into
+    the preceding convolutions, so the artifact needs neither timm nor the
+    Python class definitions to run. The embed and forward_with_embedding
+    methods are traced and preserved alongside forward for similar-case search.
+    """
+    example = torch.randn(1, 3, input_size, input_size)
+    methods = ['forward'] + [name for name in ('embed', 'forward_with_embedding')
+                             if hasattr(model, name)]
+    with torch.no_grad():
+        traced = torch.jit.trace_module(model, {name: example for name in methods})
+    frozen = torch.jit.freeze(traced, preserved_attrs=methods[1:])
+
+    # Sanity check against eager outputs, including a batch size that was
+    # not seen during tracing
+    check = torch.randn(2, 3, input_size, input_size)
+    with torch.no_grad():
+        max_diff = (frozen(check) - model(check)).abs().max().item()
+        if 'embed' in methods:
+            max_diff = max(max_diff, (frozen.embed(check) -
+                                      model.embed(check)).abs().max().item())
+    if max_diff > 1e-3:
+        raise RuntimeError(
+            f"Frozen artifact deviates from eager model (max diff {max_diff:.6f})")
+
+    return frozen, max_diff
+
+
+def build_shared_trunk_artifacts(models, input_size=240):
+    """Freeze the trunk shared by every crop model once, plus a tail per crop.
+
+    Returns (trunk, {crop: tail}, depth). Auto crop mode runs the trunk once
+    per image and each crop's tail on its output.
+    """
+    backbones = [model.backbone for model in models.values()]
+    depth = shared_trunk_depth(backbones)
+    if depth == 0:
+        raise RuntimeError("Crop models share no trunk stages; retrain them so the frozen "
+                           "trunk keeps its pretrained BatchNorm statistics")
+
+    example = torch.randn(1, 3, input_size, input_size)
+    check = torch.randn(2, 3, input_size, input_size)
+    with torch.no_grad():
+        trunk = TrunkModule(backbones[0], depth).eval()
+        frozen_trunk = torch.jit.freeze(torch.jit.trace(trunk, example))
+        features = trunk(example)
+
+        tails = {}
+        for crop_name, model in models.items():
+            tail = TailModule(model.backbone, depth).eval()
+            tails[crop_name] = torch.jit.freeze(torch.jit.trace(tail, features))
+            max_diff = (tails[crop_name](frozen_trunk(check)) - model(check)).abs().max().item()
+            if max_diff > 1e-3:
+                raise RuntimeError(
+                    f"Shared trunk + {crop_name} tail deviates from the eager model "
+                    f"(max diff {max_diff:.6f})")
+    return frozen_trunk, tails, depth
+
+
+def upload_to_s3(local_path, bucket_name, s3_key):
+    """Upload an artifact next to the checkpoints used by ModelService"""
+    import boto3
+
+    boto3.client('s3').upload_file(str(local_path), bucket_name, s3_key)
+    print(f"Uploaded {local_path} to s3://{bucket_name}/{s3_key}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build pre-frozen TorchScript serving artifacts from trained checkpoints')
+    parser.add_argument('--crops', nargs='+', default=CROPS, choices=CROPS)
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--input-size', type=int, default=240)
+    parser.add_argument('--tiers', nargs='*', type=int, default=[],
+                        help='Also export lower-resolution tiers, e.g. --tiers 192 160')
+    parser.add_argument('--variant', default='b1', choices=['b1', 'student'],
+                        help='Which trained model to export (student = distilled model)')
+    parser.add_argument('--shared-trunk', action='store_true',
+                        help='Also export the trunk shared by all crops plus per-crop tails '
+                             'for crop_type=auto (b1 variant, all crops)')
+    parser.add_argument('--upload', action='store_true',
+                        help='Upload artifacts to the S3 bucket used by the API')
+    parser.add_argument('--bucket', default='ghana-ai-hackathon')
+    parser.add_argument('--prefix', default='models/')
+    args = parser.parse_args()
+
+    models_dir = Path(args.models_dir)
+    if args.shared_trunk and (args.variant != 'b1' or set(args.crops) != set(CROPS)):
+        parser.error("--shared-trunk needs --variant b1 and every crop")
+    shared_models = {}
+
+    for crop_name in args.crops:
+        stem = crop_name if args.variant == 'b1' else f'{crop_name}_{args.variant}'
+        class_names = None
+
+        # (checkpoint/artifact suffix, input size) for the full model and each tier
+        for tier_suffix, input_size in [('', args.input_size)] + [
+                (f'_{tier}', tier) for tier in args.tiers if tier != args.input_size]:
+            checkpoint_path = models_dir / f'best_{stem}_model{tier_suffix}.pth'
+            if not checkpoint_path.exists():
+                print(f"Skipping {crop_name} @ {input_size}px: {checkpoint_path} not found")
+                continue
+
+            if class_names is None:
+                class_names = load_class_names(args.data_dir, crop_name)
+            start = time.perf_counter()
+            model = load_checkpoint_model(
+                checkpoint_path, len(class_names), args.variant)
+            artifact, max_diff = build_serving_artifact(model, input_size)
+            if tier_suffix == '':
+                shared_models[crop_name] = model
+
+            artifact_name = f'best_{stem}_model{tier_suffix}{SERVING_ARTIFACT_SUFFIX}'
+            artifact_path = models_dir / artifact_name
+            torch.jit.save(artifact, str(artifact_path))
+            print(f"{crop_name} @ {input_size}px: saved {artifact_path} "
+                  f"(max diff {max_diff:.2e}, {time.perf_counter() - start:.1f}s)")
+
+            if args.upload:
+                upload_to_s3(artifact_path, args.bucket,
+                             f'{args.prefix}{artifact_name}')
+
+    if args.shared_trunk:
+        trunk, tails, depth = build_shared_trunk_artifacts(shared_models, args.input_size)
+        artifacts = [(f'best_{SHARED_TRUNK_NAME}_model{TRUNK_ARTIFACT_SUFFIX}', trunk)] + [
+            (f'best_{crop_name}_model{TAIL_ARTIFACT_SUFFIX}', tail)
+            for crop_name, tail in tails.items()]
+        for artifact_name, artifact in artifacts:
+            artifact_path = models_dir / artifact_name
+            # The tail input shape depends on the depth, so it travels with the trunk
+            torch.jit.save(artifact, str(artifact_path), _extra_files={'depth': str(depth)})
+            if args.upload:
+                upload_to_s3(artifact_path, args.bucket, f'{args.prefix}{artifact_name}')
+        print(f"Shared trunk: {depth} stages, saved {len(artifacts)} artifacts to {models_dir}")
+
+
+if __name__ == "__main__":
+    main()
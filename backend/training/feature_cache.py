@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+# Bump when the on-disk layout or the trunk computation changes
+CACHE_VERSION = 1
+
+
+def trunk_depth(freeze_exceptions):
+    """Number of leading EfficientNet blocks that are fully frozen.
+
+    The stem plus blocks[:depth] never receive gradients, so their output
+    for a fixed input transform can be computed once and cached.
+    """
+    if not freeze_exceptions:
+        raise ValueError("Feature caching needs a frozen backbone (freeze_exceptions)")
+    depths = []
+    for exception in freeze_exceptions:
+        match = re.match(r'blocks\.(\d+)', exception)
+        if match:
+            depths.append(int(match.group(1)))
+        elif exception in ('conv_stem', 'bn1'):
+            depths.append(0)
+    if not depths or min(depths) == 0:
+        raise ValueError(f"No frozen trunk to cache with freeze_exceptions={freeze_exceptions}")
+    return min(depths)
+
+
+def trunk_modules(backbone, depth):
+    return [backbone.conv_stem, backbone.bn1] + list(backbone.blocks[:depth])
+
+
+def trunk_forward(backbone, x, depth):
+    x = backbone.bn1(backbone.conv_stem(x))
+    for block in backbone.blocks[:depth]:
+        x = block(x)
+    return x
+
+
+class TailClassifier(nn.Module):
+    """The trainable tail of an EfficientNetClassifier, fed cached trunk features.
+
+    Shares its parameters with the wrapped model, so checkpoints and exports
+    of the full model include everything the tail learned.
+    """
+
+    def __init__(self, model, depth):
+        super(TailClassifier, self).__init__()
+        self.model = model
+        self.depth = depth
+
+    def forward(self, features):
+        backbone = self.model.backbone
+        x = features
+        for block in backbone.blocks[self.depth:]:
+            x = block(x)
+        return backbone.forward_head(backbone.bn2(backbone.conv_head(x)))
+
+    def train(self, mode=True):
+        # The trunk is represented by the cache; keep its BatchNorm layers in
+        # eval mode so the full model stays consistent with the cached values
+        super(TailClassifier, self).train(mode)
+        for module in trunk_modules(self.model.backbone, self.depth):
+            module.eval()
+        return self
+
+
+def cache_key(backbone, depth, transform, dataset):
+    """Fingerprint of everything the cached activations depend on"""
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}|depth={depth}|{transform!r}".encode())
+    for module in trunk_modules(backbone, depth):
+        for name, tensor in module.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    for path, label in dataset.samples:
+        stat = os.stat(path)
+        digest.update(f"{path}|{label}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def build_feature_cache(model, dataset, depth, cache_dir, name, device,
+                        batch_size=64, num_workers=4):
+    """Compute (or reuse) the fp16 trunk activations of every image in a dataset.
+
+    Returns the cache's file prefix. An existing cache is reused only when
+    its fingerprint (trunk weights, transform, file list) still matches.
+    """
+    if len(dataset) == 0:
+        raise ValueError(f"No samples in {name}; cannot build a feature cache")
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    prefix = cache_dir / name
+    meta_path = prefix.with_suffix('.json')
+
+    backbone = model.backbone
+    key = cache_key(backbone, depth, dataset.transform, dataset)
+    if meta_path.exists():
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('key') == key and meta.get('complete'):
+            print(f"Feature cache hit: {prefix} ({meta['shape']})")
+            return prefix
+        print(f"Feature cache for {name} is stale or incomplete; rebuilding")
+
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False,
+                        num_workers=num_workers, pin_memory=device.type == 'cuda')
+    started = time.perf_counter()
+    was_training = model.training
+    model.eval()
+
+    features = labels = None
+    offset = 0
+    with torch.no_grad():
+        for data, target in loader:
+            with torch.autocast(device.type, enabled=device.type == 'cuda'):
+                activations = trunk_forward(backbone, data.to(device), depth)
+            if features is None:
+                shape = (len(dataset),) + tuple(activations.shape[1:])
+                # Mark incomplete before writing so an interrupted build is redone
+                with open(meta_path, 'w') as f:
+                    json.dump({'key': key, 'complete': False, 'shape': shape}, f)
+                features = np.lib.format.open_memmap(
+                    f'{prefix}.features.npy', mode='w+', dtype=np.float16, shape=shape)
+                labels = np.zeros(len(dataset), dtype=np.int64)
+            features[offset:offset + len(target)] = activations.half().cpu().numpy()
+            labels[offset:offset + len(target)] = target.numpy()
+            offset += len(target)
+
+    features.flush()
+    np.save(f'{prefix}.labels.npy', labels)
+    with open(meta_path, 'w') as f:
+        json.dump({'key': key, 'complete': True, 'shape': list(features.shape)}, f)
+    model.train(was_training)
+
+    size_gb = features.nbytes / 1024 ** 3
+    print(f"Cached {name} trunk features {tuple(features.shape)} "
+          f"({size_gb:.2f} GB fp16) in {time.perf_counter() - started:.0f}s")
+    return prefix
+
+
+class CachedFeatureDataset(Dataset):
+    """(trunk features, label) pairs read from a memory-mapped cache"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.labels = np.load(f'{prefix}.labels.npy')
+        # Opened lazily so every DataLoader worker maps the file itself
+        self.features = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        if self.features is None:
+            self.features = np.load(f'{self.prefix}.features.npy', mmap_mode='r')
+        return torch.from_numpy(self.features[idx].astype(np.float32)), int(self.labels[idx])
@@ -0,0 +1,181 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+from torchvision import transforms
+from PIL import Image
+
+CACHE_VERSION = 1
+CHUNK_SIZE = 256
+
+
+def samples_fingerprint(samples, size):
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|size={size}".encode())
+    for path, label in samples:
+        stat = os.stat(path)
+        digest.update(f"{path}|{label}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def decode_chunk(images_path, paths, start, size):
+    """Decode and resize paths into rows start.. of the cache (runs in a worker process)"""
+    images = np.load(images_path, mmap_mode='r+')
+    for offset, path in enumerate(paths):
+        # Same resize as transforms.Resize((size, size)) applies to PIL images
+        image = Image.open(path).convert('RGB').resize((size, size), Image.BILINEAR)
+        images[start + offset] = np.asarray(image, dtype=np.uint8)
+    images.flush()
+    return len(paths)
+
+
+def build_image_cache(dataset, cache_dir, name, size=240, workers=None):
+    """Decode every image of a crop dataset once into a size x size uint8 array.
+
+    Writes {name}.images.npy ([N, size, size, 3] uint8, memory-mappable),
+    {name}.labels.npy and {name}.json. A cache is reused while the image
+    files are unchanged. Returns the file prefix.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    prefix = cache_dir / name
+    meta_path = prefix.with_suffix('.json')
+    images_path = f'{prefix}.images.npy'
+
+    key = samples_fingerprint(dataset.samples, size)
+    if meta_path.exists():
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('key') == key and meta.get('complete'):
+            print(f"Image cache hit: {prefix} ({len(dataset.samples)} images)")
+            return prefix
+        print(f"Image cache for {name} is stale or incomplete; rebuilding")
+
+    started = time.perf_counter()
+    with open(meta_path, 'w') as f:
+        json.dump({'key': key, 'complete': False}, f)
+    np.lib.format.open_memmap(
+        images_path, mode='w+', dtype=np.uint8,
+        shape=(len(dataset.samples), size, size, 3)).flush()
+
+    paths = [path for path, _ in dataset.samples]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(decode_chunk, images_path, paths[start:start + CHUNK_SIZE], start, size)
+                   for start in range(0, len(paths), CHUNK_SIZE)]
+        for future in futures:
+            future.result()
+
+    np.save(f'{prefix}.labels.npy', np.array([label for _, label in dataset.samples], dtype=np.int64))
+    with open(meta_path, 'w') as f:
+        json.dump({
+            'key': key,
+            'complete': True,
+            'size': size,
+            'classes': dataset.classes,
+            'paths': paths,
+        }, f)
+    print(f"Cached {len(paths)} {name} images at {size}x{size} "
+          f"({os.path.getsize(images_path) / 1024 ** 3:.2f} GB) in {time.perf_counter() - started:.0f}s")
+    return prefix
+
+
+class CachedImageDataset(Dataset):
+    """Normalized image tensors read straight from a decoded uint8 cache.
+
+    Equivalent to Resize + ToTensor + Normalize on the original files. The
+    memory map is copy-on-write, so each sample is a zero-copy view until it
+    is converted to float.
+    """
+
+    def __init__(self, prefix, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+        self.prefix = prefix
+        with open(Path(f'{prefix}.json'), 'r') as f:
+            meta = json.load(f)
+        self.classes = meta['classes']
+        self.labels = np.load(f'{prefix}.labels.npy')
+        self.samples = list(zip(meta['paths'], self.labels.tolist()))
+        self.transform = transforms.Normalize(mean=list(mean), std=list(std))
+        self.mean = torch.tensor(mean).view(3, 1, 1)
+        self.std = torch.tensor(std).view(3, 1, 1)
+        # Opened lazily so every DataLoader worker maps the file itself
+        self.images = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        if self.images is None:
+            self.images = np.load(f'{self.prefix}.images.npy', mmap_mode='c')
+        pixels = torch.from_numpy(self.images[idx])
+        image = pixels.permute(2, 0, 1).float().div_(255)
+        return image.sub_(self.mean).div_(self.std), int(self.labels[idx])
+
+
+def images_per_second(dataset, batch_size, num_workers, max_batches):
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers)
+    loader_started = time.perf_counter()
+    images = total_images = timed_batches = 0
+    started = None
+    for batch_idx, (data, _) in enumerate(loader):
+        total_images += len(data)
+        if batch_idx == 0:
+            # Exclude worker start-up from the measurement
+            started = time.perf_counter()
+            continue
+        images += len(data)
+        timed_batches += 1
+        if batch_idx >= max_batches:
+            break
+    if total_images == 0:
+        return 0.0
+    if timed_batches < 2:
+        # Too few batches to skip the first one; time everything, start-up included
+        print(f"Warning: only {timed_batches + 1} batches; throughput includes loader start-up")
+        return total_images / (time.perf_counter() - loader_started)
+    return images / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build decoded uint8 image caches and compare loader throughput')
+    parser.add_argument('--crops', nargs='+', default=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--splits', nargs='+', default=['train_set', 'test_set'])
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--cache-dir', default='image_cache')
+    parser.add_argument('--size', type=int, default=240)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare DataLoader throughput of the PIL path and the cache')
+    parser.add_argument('--batch-size', type=int, default=48)
+    parser.add_argument('--loader-workers', type=int, default=4)
+    parser.add_argument('--max-batches', type=int, default=50)
+    args = parser.parse_args()
+
+    from train import CropDataset, get_transforms
+
+    _, val_transform = get_transforms(args.size)
+    for crop_name in args.crops:
+        for split in args.splits:
+            dataset = CropDataset(args.data_dir, crop_name, split=split, transform=val_transform)
+            prefix = build_image_cache(
+                dataset, args.cache_dir, f'{crop_name}_{split}_{args.size}', args.size, args.workers)
+
+            if args.benchmark:
+                pil = images_per_second(
+                    dataset, args.batch_size, args.loader_workers, args.max_batches)
+                cached = images_per_second(
+                    CachedImageDataset(prefix), args.batch_size, args.loader_workers,
+                    args.max_batches)
+                print(f"{crop_name}/{split} with {args.loader_workers} workers: "
+                      f"PIL decode {pil:.0f} images/s, cache {cached:.0f} images/s "
+                      f"({cached / pil:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Manifest entries are rows of
+# [path, label, size, mtime_ns, width, height, verified, error]
+
+
+def manifest_path(data_dir, root):
+    """data/manifests/{root relative to data_dir, with / as _}.json"""
+    relative = Path(root).resolve().relative_to(Path(data_dir).resolve())
+    return Path(data_dir) / 'manifests' / f"{'_'.join(relative.parts)}.json"
+
+
+def probe_image(args):
+    """(width, height, verified, error) for one file; runs in a worker process"""
+    path, verify = args
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if verify:
+                img.verify()
+        return width, height, True if verify else None, None
+    except Exception as e:
+        return None, None, False, str(e)
+
+
+def scan_class_dir(class_dir):
+    """(name, size, mtime_ns) of every image in a class directory via os.scandir"""
+    files = []
+    with os.scandir(class_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                stat = entry.stat()
+                files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return sorted(files)
+
+
+def refresh_manifest(data_dir, root, classes, verify=False, workers=None, rescan=False):
+    """Bring the manifest of one class-folder tree up to date and return it.
+
+    A class directory whose mtime is unchanged keeps its cached entries
+    without being listed again; adding, removing or renaming files changes
+    the directory mtime. Otherwise the directory is listed with os.scandir,
+    and only new or changed files (size or mtime differs) are opened in a
+    process pool to read their dimensions and, with `verify`, to check
+    them with PIL's verify(). `rescan` lists every directory regardless.
+    """
+    root = Path(root)
+    path = manifest_path(data_dir, root)
+    manifest = {'version': MANIFEST_VERSION, 'classes': classes, 'dirs': {}, 'entries': []}
+    if path.exists():
+        with open(path, 'r') as f:
+            cached = json.load(f)
+        if cached.get('version') == MANIFEST_VERSION and cached.get('classes') == classes:
+            manifest = cached
+
+    previous = {row[0]: row for row in manifest['entries']}
+    entries, to_probe = [], []
+    changed = False
+    for label, class_name in enumerate(classes):
+        class_dir = root / class_name
+        if not class_dir.is_dir():
+            continue
+        dir_mtime = class_dir.stat().st_mtime_ns
+        cached_rows = [row for name, row in previous.items() if name.startswith(f'{class_name}/')]
+        needs_verify = verify and any(row[6] is None for row in cached_rows)
+        if not rescan and manifest['dirs'].get(class_name) == dir_mtime and not needs_verify:
+            entries.extend(cached_rows)
+            continue
+
+        changed = True
+        manifest['dirs'][class_name] = dir_mtime
+        for name, size, mtime_ns in scan_class_dir(class_dir):
+            relative = f'{class_name}/{name}'
+            row = previous.get(relative)
+            if row is not None and row[1] == label and row[2] == size and row[3] == mtime_ns \
+                    and not (verify and row[6] is None):
+                entries.append(row)
+            else:
+                row = [relative, label, size, mtime_ns, None, None, None, None]
+                entries.append(row)
+                to_probe.append(row)
+
+    if to_probe:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(probe_image, [(str(root / row[0]), verify) for row in to_probe],
+                               chunksize=64)
+            for row, (width, height, verified, error) in zip(to_probe, results):
+                row[4:8] = [width, height, verified, error]
+        print(f"Manifest {path.name}: probed {len(to_probe)} new or changed images "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    if changed or len(entries) != len(manifest['entries']):
+        manifest['entries'] = sorted(entries)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+    return manifest
+
+
+def load_samples(data_dir, root, classes, verify=False, max_per_class=None):
+    """(absolute path, label) for every usable image under root/{class}/.
+
+    Files that failed to open, or failed verification when `verify` is set,
+    are skipped with a warning.
+    """
+    root = Path(root)
+    manifest = refresh_manifest(data_dir, root, classes, verify=verify)
+    samples, skipped = [], []
+    per_class = {}
+    for name, label, _, _, _, _, verified, error in manifest['entries']:
+        if error is not None or (verify and not verified):
+            skipped.append((name, error))
+            continue
+        if max_per_class is not None and per_class.get(label, 0) >= max_per_class:
+            continue
+        per_class[label] = per_class.get(label, 0) + 1
+        samples.append((str(root / name), label))
+
+    if skipped:
+        print(f"Skipped {len(skipped)} corrupted images under {root}")
+        for name, error in skipped[:10]:
+            print(f"  - {root / name}: {error}")
+        if len(skipped) > 10:
+            print(f"  ... and {len(skipped) - 10} more")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build or refresh dataset manifests (paths, labels, sizes, dimensions)')
+    parser.add_argument('--crops', nargs='+', default=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--verify', action='store_true',
+                        help='Also check every new or changed image with PIL verify()')
+    parser.add_argument('--rescan', action='store_true',
+                        help='List every class directory even if its mtime is unchanged')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    with open(data_dir / 'tree.json', 'r') as f:
+        tree_data = json.load(f)
+
+    for crop_name in args.crops:
+        folder = crop_name.capitalize()
+        augmented = tree_data['Combined']['Augmented'][folder]
+        roots = [(data_dir / 'Combined' / 'Augmented' / folder / split, augmented[split])
+                 for split in augmented]
+        # Raw images are labelled with the augmented class order, as in testing/
+        roots.append((data_dir / 'Combined' / 'Raw' / 'CCMT' / folder, augmented['train_set']))
+
+        for root, classes in roots:
+            started = time.perf_counter()
+            manifest = refresh_manifest(
+                data_dir, root, classes, args.verify, args.workers, args.rescan)
+            invalid = sum(row[7] is not None or row[6] is False for row in manifest['entries'])
+            print(f"{root}: {len(manifest['entries'])} images, {invalid} unreadable "
+                  f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
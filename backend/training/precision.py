@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import torch
+
+# Share the CPU capability probe with the API's inference path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from services.runtime_config import cpu_supports_bf16  # noqa: E402
+
+
+class Precision:
+    """Autocast dtype, loss scaling and memory format for one device.
+
+    fp16 autocast with a GradScaler on CUDA, bf16 autocast (no scaler
+    needed) on CPUs with native bf16 instructions, plain fp32 otherwise.
+    """
+
+    def __init__(self, device, mixed_precision=True, channels_last=False):
+        self.device = torch.device(device)
+        self.dtype = None
+        if mixed_precision and self.device.type == 'cuda':
+            self.dtype = torch.float16
+        elif mixed_precision and self.device.type == 'cpu' and cpu_supports_bf16():
+            self.dtype = torch.bfloat16
+        self.channels_last = channels_last
+        self.scaler = torch.amp.GradScaler(self.device.type, enabled=self.dtype == torch.float16)
+
+    def __str__(self):
+        dtype = {torch.float16: 'fp16', torch.bfloat16: 'bf16'}.get(self.dtype, 'fp32')
+        layout = ', channels_last' if self.channels_last else ''
+        return f"{dtype} on {self.device.type}{layout}"
+
+    def autocast(self):
+        return torch.autocast(self.device.type, dtype=self.dtype, enabled=self.dtype is not None)
+
+    def prepare_model(self, model):
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        return model
+
+    def to_device(self, data):
+        if self.channels_last and data.dim() == 4:
+            return data.to(self.device, non_blocking=True, memory_format=torch.channels_last)
+        return data.to(self.device, non_blocking=True)
+
+    def backward_step(self, loss, optimizer):
+        # The scaler is a pass-through when disabled (bf16 and fp32)
+        self.scaler.scale(loss).backward()
+        self.scaler.step(optimizer)
+        self.scaler.update()
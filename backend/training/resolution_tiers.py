@@ -0,0 +1,60 @@
+import copy
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from train import get_transforms, save_model_as_onnx, train_epoch, validate_epoch
+
+
+def with_transform(dataset, transform):
+    """Shallow copy of a crop dataset that resizes to a different input size"""
+    dataset = copy.copy(dataset)
+    dataset.transform = transform
+    return dataset
+
+
+def train_resolution_tier(model, train_dataset, val_dataset, precision, input_size, models_dir,
+                          crop_name, batch_size=48, num_epochs=5, learning_rate=5e-5,
+                          weight_decay=1e-5):
+    """Fine-tune a copy of the trained 240px model at a lower input resolution.
+
+    The same layers as the full-resolution run are trainable. The best epoch is
+    saved as best_{crop}_model_{input_size}.pth/.onnx, the files ModelService
+    loads for that tier. `precision` is the full-resolution run's Precision.
+    """
+    device = precision.device
+    tier_model = copy.deepcopy(model).to(device)
+    train_transform, val_transform = get_transforms(input_size)
+    train_loader = DataLoader(with_transform(train_dataset, train_transform),
+                              batch_size=batch_size, shuffle=True, num_workers=4, pin_memory=True)
+    val_loader = DataLoader(with_transform(val_dataset, val_transform),
+                            batch_size=batch_size, shuffle=False, num_workers=4, pin_memory=True)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.AdamW(
+        [param for param in tier_model.parameters() if param.requires_grad],
+        lr=learning_rate, weight_decay=weight_decay)
+
+    stem = f'best_{crop_name}_model_{input_size}'
+    _, best_val_acc, _, _ = validate_epoch(tier_model, val_loader, criterion, precision)
+    print(f"{input_size}px tier before fine-tuning: Val Acc {best_val_acc:.2f}%")
+    torch.save(tier_model.state_dict(), models_dir / f'{stem}.pth')
+
+    for epoch in range(num_epochs):
+        train_loss, train_acc = train_epoch(
+            tier_model, train_loader, criterion, optimizer, precision)
+        _, val_acc, _, _ = validate_epoch(tier_model, val_loader, criterion, precision)
+        print(f"{input_size}px tier epoch {epoch+1}/{num_epochs}, "
+              f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, Val Acc: {val_acc:.2f}%")
+
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            torch.save(tier_model.state_dict(), models_dir / f'{stem}.pth')
+
+    tier_model.load_state_dict(torch.load(models_dir / f'{stem}.pth', map_location=device))
+    save_model_as_onnx(tier_model, models_dir / f'{stem}.onnx', device, input_size)
+    print(f"{input_size}px tier saved to {models_dir / stem}.pth "
+          f"(best validation accuracy {best_val_acc:.2f}%)")
+    return tier_model
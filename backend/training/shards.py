@@ -0,0 +1,212 @@
+import argparse
+import io
+import json
+import random
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+from urllib.parse import urlparse
+
+from torch.utils.data import IterableDataset, get_worker_info
+from PIL import Image
+
+INDEX_NAME = 'index.json'
+
+
+# Storage: local paths / file:// URLs, or s3://bucket/prefix
+
+def join_url(base, name):
+    return f"{base.rstrip('/')}/{name}"
+
+
+def open_url(url):
+    """Readable binary stream for a shard or index, read front to back"""
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        import boto3
+
+        response = boto3.client('s3').get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip('/'))
+        return response['Body']
+    return open(parsed.path if parsed.scheme == 'file' else url, 'rb')
+
+
+def put_file(local_path, url):
+    """Store a finished local file at a destination URL"""
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        import boto3
+
+        boto3.client('s3').upload_file(str(local_path), parsed.netloc, parsed.path.lstrip('/'))
+        return
+    destination = Path(parsed.path if parsed.scheme == 'file' else url)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(local_path), destination)
+
+
+def read_index(url):
+    with open_url(join_url(url, INDEX_NAME)) as f:
+        return json.loads(f.read())
+
+
+# Writer
+
+def write_shards(samples, classes, output_url, shard_size=1000, seed=0):
+    """Pack (path, label) samples into tar shards of `shard_size` samples.
+
+    Samples are shuffled once before packing so every shard mixes classes.
+    Each sample is stored as {key}.{ext} (the original encoded bytes) plus
+    {key}.cls (the label index), the layout WebDataset also reads. An
+    index.json lists the shards, their sample counts and the class names.
+    """
+    samples = list(samples)
+    random.Random(seed).shuffle(samples)
+
+    shards = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for shard_idx, start in enumerate(range(0, len(samples), shard_size)):
+            name = f'shard-{shard_idx:06d}.tar'
+            local_path = Path(tmp) / name
+            chunk = samples[start:start + shard_size]
+            with tarfile.open(local_path, 'w') as tar:
+                for offset, (path, label) in enumerate(chunk):
+                    key = f'{start + offset:08d}'
+                    tar.add(path, arcname=f'{key}{Path(path).suffix.lower()}')
+                    data = str(label).encode()
+                    info = tarfile.TarInfo(f'{key}.cls')
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+            put_file(local_path, join_url(output_url, name))
+            shards.append({'name': name, 'samples': len(chunk)})
+            print(f"Wrote {name} ({len(chunk)} samples)")
+
+        index = {'classes': classes, 'samples': len(samples), 'shards': shards}
+        index_path = Path(tmp) / INDEX_NAME
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        put_file(index_path, join_url(output_url, INDEX_NAME))
+    return index
+
+
+# Reader
+
+def iter_shard(stream):
+    """(image bytes, label) pairs from a tar stream, read sequentially"""
+    with tarfile.open(fileobj=stream, mode='r|') as tar:
+        key, image_bytes, label = None, None, None
+        for member in tar:
+            # Skip directories and stray files without a {key}.{ext} name
+            if not member.isfile() or '.' not in member.name:
+                continue
+            member_key, ext = member.name.rsplit('.', 1)
+            if member_key != key:
+                if image_bytes is not None and label is not None:
+                    yield image_bytes, label
+                key, image_bytes, label = member_key, None, None
+            data = tar.extractfile(member).read()
+            if ext == 'cls':
+                label = int(data)
+            else:
+                image_bytes = data
+        if image_bytes is not None and label is not None:
+            yield image_bytes, label
+
+
+class ShardedImageDataset(IterableDataset):
+    """Streams (image, label) samples from tar shards written by write_shards.
+
+    Every epoch the shard order is reshuffled with the same seed in all
+    workers, and each DataLoader worker reads a disjoint slice of the
+    shards front to back. Samples are then mixed through a shuffle buffer.
+    Call set_epoch() before each epoch to get a new order.
+    """
+
+    def __init__(self, url, transform=None, shuffle=True, shuffle_buffer=1000, seed=0):
+        self.url = url
+        self.transform = transform
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+        index = read_index(url)
+        self.classes = index['classes']
+        self.shards = index['shards']
+        self.num_samples = index['samples']
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def worker_shards(self):
+        shards = [shard['name'] for shard in self.shards]
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(shards)
+        worker = get_worker_info()
+        if worker is None:
+            return shards
+        if worker.num_workers > len(shards) and worker.id == 0:
+            print(f"Warning: {worker.num_workers} workers but only {len(shards)} shards; "
+                  f"some workers will be idle")
+        return shards[worker.id::worker.num_workers]
+
+    def samples(self):
+        for name in self.worker_shards():
+            with open_url(join_url(self.url, name)) as stream:
+                yield from iter_shard(stream)
+
+    def __iter__(self):
+        worker = get_worker_info()
+        rng = random.Random(self.seed + self.epoch * 1000 + (worker.id if worker else 0))
+        buffer = []
+        for image_bytes, label in self.samples():
+            if not self.shuffle:
+                yield self.decode(image_bytes, label)
+                continue
+            buffer.append((image_bytes, label))
+            if len(buffer) >= self.shuffle_buffer:
+                yield self.decode(*buffer.pop(rng.randrange(len(buffer))))
+        rng.shuffle(buffer)
+        for image_bytes, label in buffer:
+            yield self.decode(image_bytes, label)
+
+    def decode(self, image_bytes, label):
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        if self.transform:
+            image = self.transform(image)
+        return image, label
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack Combined/Augmented class folders into tar shards')
+    parser.add_argument('output', help='Destination: local directory, file:// or s3:// URL')
+    parser.add_argument('--crops', nargs='+', default=['cashew', 'cassava', 'maize', 'tomato'])
+    parser.add_argument('--splits', nargs='+', default=['train_set', 'test_set'])
+    parser.add_argument('--data-dir', default='../data')
+    parser.add_argument('--shard-size', type=int, default=1000)
+    parser.add_argument('--verify', action='store_true',
+                        help='Read every written shard back and check the sample counts')
+    args = parser.parse_args()
+
+    from train import CropDataset
+
+    for crop_name in args.crops:
+        for split in args.splits:
+            dataset = CropDataset(args.data_dir, crop_name, split=split)
+            url = join_url(join_url(args.output, crop_name), split)
+            index = write_shards(dataset.samples, dataset.classes, url, args.shard_size)
+            print(f"{crop_name}/{split}: {index['samples']} samples in "
+                  f"{len(index['shards'])} shards at {url}")
+
+            if args.verify:
+                reader = ShardedImageDataset(url, shuffle=False)
+                labels = [label for _, label in reader.samples()]
+                expected = sorted(label for _, label in dataset.samples)
+                status = 'ok' if sorted(labels) == expected else 'MISMATCH'
+                print(f"  verify: read {len(labels)} samples back ({status})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,624 @@
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, Dataset, IterableDataset
+from torchvision import transforms
+from PIL import Image
+import timm
+import wandb
+import yaml
+from sklearn.metrics import classification_report, confusion_matrix
+import numpy as np
+import torch.onnx
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from feature_cache import trunk_depth, trunk_modules
+from manifest import load_samples
+from precision import Precision
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG_PATH = BACKEND_DIR / 'training_config.yaml'
+FREEZE_EXCEPTIONS = ['blocks.6', 'blocks.5', 'classifier']
+
+
+class CropDataset(Dataset):
+    def __init__(self, data_dir, crop_name, split='train_set', transform=None):
+        self.data_dir = Path(data_dir)
+        self.transform = transform
+
+        # Load tree.json to get class names
+        with open(self.data_dir / 'tree.json', 'r') as f:
+            tree_data = json.load(f)
+
+        folder = crop_name.capitalize()
+        self.classes = tree_data['Combined']['Augmented'][folder][split]
+        self.class_to_idx = {cls: idx for idx, cls in enumerate(self.classes)}
+
+        # File paths come from the cached manifest; only changed class
+        # folders are listed again
+        augmented_path = self.data_dir / 'Combined' / 'Augmented' / folder / split
+        self.samples = load_samples(self.data_dir, augmented_path, self.classes)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        img_path, label = self.samples[idx]
+        image = Image.open(img_path).convert('RGB')
+
+        if self.transform:
+            image = self.transform(image)
+
+        return image, label
+
+
+class EfficientNetClassifier(nn.Module):
+    def __init__(self, num_classes=7, model_name='efficientnet_b1', backbone_state=None,
+                 freeze_exceptions=FREEZE_EXCEPTIONS):
+        super(EfficientNetClassifier, self).__init__()
+        # Load pretrained EfficientNet-B1, or copy already-loaded pretrained
+        # weights so several crops don't each re-initialize timm weights
+        if backbone_state is None:
+            self.backbone = timm.create_model(model_name, pretrained=True)
+        else:
+            self.backbone = timm.create_model(model_name, pretrained=False)
+            self.backbone.load_state_dict(backbone_state)
+
+        # Freeze backbone except for the last few blocks
+        self.frozen_depth = 0
+        if freeze_exceptions is not None:
+            for name, param in self.backbone.named_parameters():
+                if not any(exception in name for exception in freeze_exceptions):
+                    param.requires_grad = False
+            try:
+                self.frozen_depth = trunk_depth(freeze_exceptions)
+            except ValueError:
+                pass
+
+        # Replace classifier
+        in_features = self.backbone.classifier.in_features
+        self.backbone.classifier = nn.Sequential(
+            nn.Dropout(0.3),
+            nn.Linear(in_features, 512),
+            nn.ReLU(),
+            nn.Dropout(0.2),
+            nn.Linear(512, num_classes)
+        )
+
+    def forward(self, x):
+        return self.backbone(x)
+
+    def train(self, mode=True):
+        # Keep the frozen trunk's BatchNorm statistics at their pretrained
+        # values, so every crop model shares a bit-identical trunk that the
+        # API's auto crop mode computes once per image
+        super(EfficientNetClassifier, self).train(mode)
+        if self.frozen_depth:
+            for module in trunk_modules(self.backbone, self.frozen_depth):
+                module.eval()
+        return self
+
+
+def get_transforms(input_size=240):
+    # EfficientNet-B1 input size is 240x240; smaller sizes train resolution tiers
+    train_transform = transforms.Compose([
+        transforms.Resize((input_size, input_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[
+                             0.229, 0.224, 0.225])
+    ])
+
+    val_transform = transforms.Compose([
+        transforms.Resize((input_size, input_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[
+                             0.229, 0.224, 0.225])
+    ])
+
+    return train_transform, val_transform
+
+
+def train_epoch(model, dataloader, criterion, optimizer, precision, print_every=100,
+                augment=None):
+    model.train()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+
+    for batch_idx, (data, target) in enumerate(dataloader):
+        data = precision.to_device(data)
+        target = target.to(precision.device, non_blocking=True)
+        if augment is not None:
+            # Batched on-device augmentation of the collated batch
+            data = precision.to_device(augment(data))
+
+        optimizer.zero_grad(set_to_none=True)
+
+        # Mixed precision training
+        with precision.autocast():
+            output = model(data)
+            loss = criterion(output, target)
+
+        precision.backward_step(loss, optimizer)
+
+        running_loss += loss.item()
+        _, predicted = torch.max(output.data, 1)
+        total += target.size(0)
+        correct += (predicted == target).sum().item()
+
+        if batch_idx % print_every == 0:
+            print(
+                f'Batch {batch_idx}/{len(dataloader)}, Loss: {loss.item():.4f}')
+
+    epoch_loss = running_loss / len(dataloader)
+    epoch_acc = 100. * correct / total
+
+    return epoch_loss, epoch_acc
+
+
+def validate_epoch(model, dataloader, criterion, precision):
+    model.eval()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+    all_predictions = []
+    all_targets = []
+
+    with torch.no_grad():
+        for data, target in dataloader:
+            data = precision.to_device(data)
+            target = target.to(precision.device, non_blocking=True)
+
+            with precision.autocast():
+                output = model(data)
+                loss = criterion(output, target)
+
+            running_loss += loss.item()
+            _, predicted = torch.max(output.data, 1)
+            total += target.size(0)
+            correct += (predicted == target).sum().item()
+
+            all_predictions.extend(predicted.cpu().numpy())
+            all_targets.extend(target.cpu().numpy())
+
+    epoch_loss = running_loss / len(dataloader)
+    epoch_acc = 100. * correct / total
+
+    return epoch_loss, epoch_acc, all_predictions, all_targets
+
+
+def save_model_as_onnx(model, save_path, device, input_size=240, opset_version=11):
+    """Save the trained model as ONNX format"""
+    model.eval()
+    dummy_input = torch.randn(1, 3, input_size, input_size).to(device)
+
+    torch.onnx.export(
+        model,
+        dummy_input,
+        save_path,
+        export_params=True,
+        opset_version=opset_version,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes={
+            'input': {0: 'batch_size'},
+            'output': {0: 'batch_size'}
+        }
+    )
+    print(f"Model saved as ONNX: {save_path}")
+
+
+def plot_confusion_matrix(y_true, y_pred, class_names, save_path, crop_name):
+    """Plot and save confusion matrix"""
+    cm = confusion_matrix(y_true, y_pred)
+    large = len(class_names) > 5
+    plt.figure(figsize=(12, 10) if large else (10, 8))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
+                xticklabels=class_names, yticklabels=class_names)
+    plt.title(f'Confusion Matrix - {crop_name.capitalize()} Disease Classification')
+    plt.ylabel('True Label')
+    plt.xlabel('Predicted Label')
+    if large:
+        plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.savefig(save_path)
+    plt.close()
+
+
+def load_config(config_path=DEFAULT_CONFIG_PATH):
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def crop_config(raw, crop_name, config_dir=BACKEND_DIR):
+    """Flat training settings for one crop: global sections plus its `crops` overrides.
+
+    Data paths in the YAML are relative to the backend directory.
+    """
+    model = raw.get('model', {})
+    training = raw.get('training', {})
+    data = raw.get('data', {})
+    advanced = raw.get('advanced', {})
+    loader_opts = advanced.get('dataloader_optimizations', {})
+    reproducibility = raw.get('reproducibility', {})
+    wandb_opts = raw.get('logging', {}).get('wandb', {})
+    scheduler = training.get('scheduler', {})
+
+    config = {
+        'model_name': model.get('architecture', 'efficientnet_b1'),
+        'input_size': model.get('input_size', 240),
+        'freeze_exceptions': model.get('freeze_exceptions', FREEZE_EXCEPTIONS)
+        if model.get('freeze_backbone', True) else None,
+        'batch_size': training.get('batch_size', 48),
+        'num_epochs': training.get('num_epochs', 50),
+        'learning_rate': float(training.get('learning_rate', 1e-4)),
+        'weight_decay': float(training.get('weight_decay', 1e-5)),
+        'scheduler_factor': scheduler.get('factor', 0.5),
+        'scheduler_patience': scheduler.get('patience', 5),
+        'patience': training.get('early_stopping', {}).get('patience', 10),
+        'mixed_precision': training.get('mixed_precision', True),
+        'data_dir': str(Path(config_dir) / data.get('data_dir', 'data')),
+        'shards_url': data.get('shards_url'),
+        'models_dir': str(Path(config_dir) / data.get('models_dir', 'training/models')),
+        'num_workers': data.get('num_workers', 4),
+        'pin_memory': data.get('pin_memory', True),
+        'persistent_workers': loader_opts.get('persistent_workers', False),
+        'prefetch_factor': loader_opts.get('prefetch_factor', 2),
+        'compile_model': advanced.get('compile_model', False),
+        'channels_last': advanced.get('channels_last', True),
+        'image_cache': advanced.get('image_cache', False),
+        'image_cache_dir': str(Path(config_dir) / advanced.get(
+            'image_cache_dir', 'training/image_cache')),
+        'feature_cache': advanced.get('feature_cache', False),
+        'feature_cache_dir': str(Path(config_dir) / advanced.get(
+            'feature_cache_dir', 'training/feature_cache')),
+        'seed': reproducibility.get('random_seed'),
+        'torch_deterministic': reproducibility.get('torch_deterministic', False),
+        'torch_benchmark': reproducibility.get('torch_benchmark', False),
+        'save_onnx': 'onnx' in raw.get('output', {}).get('save_formats', ['pytorch', 'onnx']),
+        'onnx_opset': raw.get('output', {}).get('onnx', {}).get('opset_version', 11),
+        'generate_plots': raw.get('output', {}).get('generate_plots', True),
+        'print_every': raw.get('logging', {}).get('console', {}).get('print_frequency', 100),
+        'wandb': wandb_opts.get('enabled', True),
+        'wandb_project': raw.get('project', {}).get('wandb_project', 'crop-classifier'),
+        'early_exit_heads': False,  # Train auxiliary exit heads after training
+        'resolution_tiers': [],  # e.g. [192, 160]: fine-tune lower-resolution serving tiers
+        'augment': raw.get('augmentation', {}).get('enabled', False),
+        'augmentation': raw.get('augmentation', {}),
+        'crop_name': crop_name,
+    }
+    config.update(raw.get('crops', {}).get(crop_name, {}))
+    return config
+
+
+def configure_backends(config):
+    """Seed and cuDNN settings from the reproducibility section"""
+    if config['seed'] is not None:
+        random.seed(config['seed'])
+        np.random.seed(config['seed'])
+        torch.manual_seed(config['seed'])
+    torch.backends.cudnn.benchmark = bool(config['torch_benchmark'])
+    torch.backends.cudnn.deterministic = bool(config['torch_deterministic'])
+
+
+def make_loader(dataset, config, shuffle):
+    workers = config['num_workers']
+    # Streaming datasets shuffle themselves, and need fresh workers each
+    # epoch to see the epoch number set by set_epoch()
+    streaming = isinstance(dataset, IterableDataset)
+    return DataLoader(
+        dataset,
+        batch_size=config['batch_size'],
+        shuffle=shuffle and not streaming,
+        num_workers=workers,
+        pin_memory=config['pin_memory'],
+        # Keep decode workers alive across epochs instead of re-forking them
+        persistent_workers=bool(config['persistent_workers']) and workers > 0 and not streaming,
+        prefetch_factor=config['prefetch_factor'] if workers > 0 else None
+    )
+
+
+def load_backbone_state(model_name):
+    """Pretrained timm weights, loaded once and shared by every crop in a run"""
+    return timm.create_model(model_name, pretrained=True).state_dict()
+
+
+def train_crop(config, device, backbone_state=None):
+    """Train one crop from its flat config; returns the best validation accuracy"""
+    crop_name = config['crop_name']
+    configure_backends(config)
+    precision = Precision(device, bool(config['mixed_precision']), bool(config['channels_last']))
+    print(f"Precision: {precision}")
+
+    if config['wandb']:
+        wandb.init(
+            project=config['wandb_project'],
+            name=f"{crop_name}_{config['model_name']}",
+            config=config,
+            reinit=True
+        )
+
+    # Data paths
+    data_dir = Path(config['data_dir'])
+    models_dir = Path(config['models_dir'])
+    models_dir.mkdir(parents=True, exist_ok=True)
+
+    # Transforms
+    train_transform, val_transform = get_transforms(config['input_size'])
+
+    # Datasets
+    if config['shards_url']:
+        from shards import ShardedImageDataset, join_url
+
+        if config['image_cache'] or config['feature_cache'] or config['resolution_tiers']:
+            raise ValueError("shards_url cannot be combined with image_cache, "
+                             "feature_cache or resolution_tiers")
+        crop_url = join_url(config['shards_url'], crop_name)
+        train_dataset = ShardedImageDataset(
+            join_url(crop_url, 'train_set'), train_transform, seed=config['seed'] or 0)
+        val_dataset = ShardedImageDataset(
+            join_url(crop_url, 'test_set'), val_transform, shuffle=False)
+    else:
+        train_dataset = CropDataset(
+            data_dir, crop_name, split='train_set', transform=train_transform)
+        val_dataset = CropDataset(
+            data_dir, crop_name, split='test_set', transform=val_transform)
+    class_names = train_dataset.classes
+    print(f"Classes: {class_names}")
+    if 'classes' in config and list(config['classes']) != list(class_names):
+        print(f"Warning: training_config.yaml lists {config['classes']} for {crop_name}, "
+              f"tree.json has {class_names}; using tree.json")
+
+    print(f"Train dataset size: {len(train_dataset)}")
+    print(f"Validation dataset size: {len(val_dataset)}")
+
+    # Image-cache mode: read pre-decoded uint8 arrays instead of JPEG files
+    if config['image_cache']:
+        from image_cache import CachedImageDataset, build_image_cache
+
+        loader_train_dataset, loader_val_dataset = [
+            CachedImageDataset(build_image_cache(
+                dataset, config['image_cache_dir'],
+                f"{crop_name}_{split}_{config['input_size']}", config['input_size']))
+            for split, dataset in [('train_set', train_dataset), ('test_set', val_dataset)]
+        ]
+    else:
+        loader_train_dataset, loader_val_dataset = train_dataset, val_dataset
+
+    # On-the-fly batched augmentation of the training batches
+    augment = None
+    if config['augment']:
+        from augment import BatchAugment
+
+        if config['feature_cache']:
+            raise ValueError("augmentation cannot be combined with feature_cache, "
+                             "which caches activations of unaugmented images")
+        augment = BatchAugment.from_config(config['augmentation'])
+        print(f"Augmentation: {augment}")
+
+    # Data loaders
+    train_loader = make_loader(loader_train_dataset, config, shuffle=True)
+    val_loader = make_loader(loader_val_dataset, config, shuffle=False)
+
+    # Model
+    model = EfficientNetClassifier(
+        num_classes=len(class_names),
+        model_name=config['model_name'],
+        backbone_state=backbone_state,
+        freeze_exceptions=config['freeze_exceptions']
+    ).to(device)
+    model = precision.prepare_model(model)
+    fit_model, fit_train_loader, fit_val_loader = model, train_loader, val_loader
+
+    # Feature-cache mode: the frozen trunk runs once per image, and epochs
+    # train only the unfrozen tail from the cached activations
+    if config['feature_cache']:
+        from feature_cache import (
+            CachedFeatureDataset, TailClassifier, build_feature_cache, trunk_depth)
+
+        depth = trunk_depth(config['freeze_exceptions'])
+        caches = {
+            split: build_feature_cache(
+                model, dataset, depth, config['feature_cache_dir'],
+                f'{crop_name}_{split}', device, config['batch_size'], config['num_workers'])
+            for split, dataset in [('train_set', loader_train_dataset),
+                                   ('test_set', loader_val_dataset)]
+        }
+        fit_model = TailClassifier(model, depth)
+        fit_train_loader = make_loader(
+            CachedFeatureDataset(caches['train_set']), config, shuffle=True)
+        fit_val_loader = make_loader(
+            CachedFeatureDataset(caches['test_set']), config, shuffle=False)
+
+    # Compiled module for the training loop; checkpoints and exports use the
+    # eager model so state_dict keys stay unprefixed
+    train_model = torch.compile(fit_model) if config['compile_model'] else fit_model
+
+    # Loss and optimizer
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.AdamW(
+        [param for param in model.parameters() if param.requires_grad],
+        lr=config['learning_rate'],
+        weight_decay=config['weight_decay']
+    )
+
+    # Learning rate scheduler
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(
+        optimizer, mode='min', factor=config['scheduler_factor'],
+        patience=config['scheduler_patience']
+    )
+
+    # Training loop
+    best_val_acc = 0.0
+    patience_counter = 0
+    checkpoint_path = models_dir / f'best_{crop_name}_model.pth'
+
+    for epoch in range(config['num_epochs']):
+        print(f"\nEpoch {epoch+1}/{config['num_epochs']}")
+        print("-" * 50)
+        epoch_start = time.perf_counter()
+        if hasattr(train_dataset, 'set_epoch'):
+            train_dataset.set_epoch(epoch)
+
+        # Training
+        train_loss, train_acc = train_epoch(
+            train_model, fit_train_loader, criterion, optimizer, precision,
+            print_every=config['print_every'], augment=augment)
+        train_s = time.perf_counter() - epoch_start
+
+        # Validation
+        val_loss, val_acc, val_predictions, val_targets = validate_epoch(
+            train_model, fit_val_loader, criterion, precision)
+
+        # Scheduler step
+        scheduler.step(val_loss)
+        epoch_s = time.perf_counter() - epoch_start
+        train_ips = len(fit_train_loader.dataset) / train_s
+        val_ips = len(fit_val_loader.dataset) / (epoch_s - train_s)
+
+        if config['wandb']:
+            wandb.log({
+                'epoch': epoch + 1,
+                'train_loss': train_loss,
+                'train_accuracy': train_acc,
+                'val_loss': val_loss,
+                'val_accuracy': val_acc,
+                'learning_rate': optimizer.param_groups[0]['lr'],
+                'epoch_seconds': epoch_s,
+                'train_images_per_sec': train_ips,
+                'val_images_per_sec': val_ips
+            })
+
+        print(f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%")
+        print(f"Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}% ({epoch_s:.0f}s)")
+        print(f"Throughput ({precision}): train {train_ips:.0f} images/s, "
+              f"val {val_ips:.0f} images/s")
+
+        # Save best model
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            patience_counter = 0
+
+            # Save PyTorch model
+            torch.save(model.state_dict(), checkpoint_path)
+
+            # Save as ONNX
+            if config['save_onnx']:
+                save_model_as_onnx(model, models_dir / f'best_{crop_name}_model.onnx', device,
+                                   config['input_size'], config['onnx_opset'])
+
+            # Generate classification report
+            report = classification_report(
+                val_targets, val_predictions, target_names=class_names)
+            print(f"\nBest validation accuracy: {best_val_acc:.2f}%")
+            print("Classification Report:")
+            print(report)
+
+            # Save confusion matrix
+            if config['generate_plots']:
+                plot_confusion_matrix(
+                    val_targets, val_predictions, class_names,
+                    models_dir / f'{crop_name}_confusion_matrix.png', crop_name
+                )
+
+        else:
+            patience_counter += 1
+
+        # Early stopping
+        if patience_counter >= config['patience']:
+            print(
+                f"Early stopping triggered after {config['patience']} epochs without improvement")
+            break
+
+    # Optional early-exit heads on the frozen best model
+    if config['early_exit_heads']:
+        from early_exit import train_exit_heads
+
+        model.load_state_dict(torch.load(checkpoint_path, map_location=device))
+        train_exit_heads(
+            model, train_loader, val_loader, device, len(class_names),
+            models_dir / f'best_{crop_name}_model.exits.pth')
+
+    # Optional lower-resolution tiers fine-tuned from the best model
+    if config['resolution_tiers']:
+        from resolution_tiers import train_resolution_tier
+
+        model.load_state_dict(torch.load(checkpoint_path, map_location=device))
+        for input_size in config['resolution_tiers']:
+            train_resolution_tier(
+                model, train_dataset, val_dataset, precision, input_size,
+                models_dir, crop_name, batch_size=config['batch_size'])
+
+    print(
+        f"\nTraining completed! Best validation accuracy: {best_val_acc:.2f}%")
+    if config['wandb']:
+        wandb.finish()
+    return best_val_acc
+
+
+def run(crops=None, config_path=DEFAULT_CONFIG_PATH, overrides=None):
+    """Train several crops in one process, sharing the pretrained backbone weights"""
+    raw = load_config(config_path)
+    crops = crops or list(raw.get('crops', {}))
+    configs = [dict(crop_config(raw, crop, Path(config_path).resolve().parent), **(overrides or {}))
+               for crop in crops]
+
+    # Set device
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}")
+
+    backbone_states = {}
+    results = {}
+    for config in configs:
+        print(f"\n{'=' * 60}\nTraining {config['crop_name']}\n{'=' * 60}")
+        if config['model_name'] not in backbone_states:
+            backbone_states[config['model_name']] = load_backbone_state(config['model_name'])
+        results[config['crop_name']] = train_crop(
+            config, device, backbone_states[config['model_name']])
+
+    print("\nBest validation accuracy per crop:")
+    for crop_name, best_val_acc in results.items():
+        print(f"  {crop_name}: {best_val_acc:.2f}%")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Train crop disease classifiers from training_config.yaml')
+    parser.add_argument('--crops', nargs='+',
+                        help='Crops to train (default: every crop in the config)')
+    parser.add_argument('--config', default=str(DEFAULT_CONFIG_PATH))
+    parser.add_argument('--epochs', type=int, help='Override num_epochs for every crop')
+    parser.add_argument('--no-wandb', action='store_true')
+    parser.add_argument('--image-cache', action='store_true',
+                        help='Load images from decoded uint8 caches instead of JPEG files')
+    parser.add_argument('--feature-cache', action='store_true',
+                        help='Train the unfrozen tail from cached trunk features')
+    parser.add_argument('--augment', action='store_true',
+                        help='Augment training batches on the fly (augmentation.enabled)')
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.epochs is not None:
+        overrides['num_epochs'] = args.epochs
+    if args.no_wandb:
+        overrides['wandb'] = False
+    if args.image_cache:
+        overrides['image_cache'] = True
+    if args.feature_cache:
+        overrides['feature_cache'] = True
+    if args.augment:
+        overrides['augment'] = True
+    run(args.crops, args.config, overrides)
+
+
+if __name__ == "__main__":
+    main()